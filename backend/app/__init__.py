@@ -30,9 +30,38 @@ def create_app():
     )
     
     configure_logging(app)
+
+    # Request ids, latency metrics and the slow-request profiler
+    from app.services.metrics import init_metrics
+    init_metrics(app)
     
     # Initialize application components
     Config.init_app(app)
+
+    # Start the ingestion workers that process uploaded documents
+    from app.services.ingestion_jobs import init_job_queue
+    init_job_queue(app)
+
+    # Heavy resources (spaCy, GCP clients, Mongo) load on first use or in the
+    # warm-up hook, never at import time; indexes are created on first Mongo use
+    from app.services.warmup import init_warm_up
+    init_warm_up(app)
+
+    # Every request carries a deadline for the upstream calls it makes
+    from app.services.call_governor import init_call_governor
+    init_call_governor(app)
+
+    # flask search-reindex backfills the search index
+    from app.services.search_index import init_search
+    init_search(app)
+
+    # flask risk-backfill evaluates changed risk rules on stored documents
+    from app.services.risk_rules import init_risk_rules
+    init_risk_rules(app)
+
+    # flask reanalyze re-runs analysis stages over stored documents
+    from app.services.reanalysis import init_reanalysis
+    init_reanalysis(app)
     
     # Import and register blueprints
     from app.routes.document_routes import bp as documents_bp
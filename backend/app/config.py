@@ -1,9 +1,8 @@
 import os
+import threading
 from pathlib import Path
 from pymongo import MongoClient
-import vertexai
-from vertexai.preview.language_models import TextGenerationModel
-from google.cloud import language_v1
+from gcp.clients import registry as gcp_clients
 import logging
 
 # Configure logging for better debugging and monitoring
@@ -15,53 +14,110 @@ logging.basicConfig(level=logging.INFO)
 # Path to service-account.json (ensure it's in .gitignore to avoid exposing credentials)
 GCP_CREDENTIALS = Path(__file__).resolve().parent.parent / 'gcp' / 'service-account.json'
 
-# Set the environment variable for GCP credentials if the file exists
+# Set the environment variable for GCP credentials if the file exists. Without
+# it, clients fall back to Application Default Credentials when first used,
+# so importing the app never requires credentials.
 if GCP_CREDENTIALS.exists():
     os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = str(GCP_CREDENTIALS)
 else:
-    logging.error(f"GCP credentials file not found at {GCP_CREDENTIALS}. Please ensure it exists.")
-    raise FileNotFoundError("GCP credentials file is missing.")
+    logging.warning(f"GCP credentials file not found at {GCP_CREDENTIALS}; using default credentials.")
 
 # Load environment variables for GCP settings with validation
 PROJECT_ID = os.getenv('GCP_PROJECT_ID', 'practical-now-456807-u9')
 LOCATION = os.getenv('GCP_LOCATION', 'us-central1')
 
+VERTEX_MODEL_NAME = os.getenv('VERTEX_MODEL_NAME', 'text-bison@001')
+DOC_AI_PROCESSOR_ID = os.getenv('DOC_AI_PROCESSOR_ID', '77c5199ac4ed9e8a')
+
 # Ensure PROJECT_ID is set (critical for GCP services)
 if not PROJECT_ID:
     logging.error("GCP_PROJECT_ID environment variable is not set. Please provide a valid project ID.")
     raise EnvironmentError("GCP_PROJECT_ID is required for GCP services.")
 
 # --------------------------------------------------
-# Initialize GCP Clients with Error Handling
+# Lazy GCP Clients
 # --------------------------------------------------
-try:
-    # Vertex AI for text generation (summarization)
-    vertexai.init(project=PROJECT_ID, location=LOCATION)
-    VERTEX_SUMMARY_MODEL = TextGenerationModel.from_pretrained('text-bison@001')
-except Exception as e:
-    logging.error(f"Failed to initialize Vertex AI: {e}")
-    raise
-
-try:
-    # Natural Language API for entity extraction
-    NLP_CLIENT = language_v1.LanguageServiceClient()
-except Exception as e:
-    logging.error(f"Failed to initialize Natural Language API client: {e}")
-    raise
+class _RegistryClient:
+    """
+    Stand-in for a GCP client that is created through the registry on first
+    use. Every attribute access resolves the current process's client, so
+    nothing is built at import time and nothing survives a fork.
+    """
+
+    def __init__(self, getter):
+        self._getter = getter
+
+    def __getattr__(self, name):
+        return getattr(self._getter(), name)
+
+    def resolve(self):
+        return self._getter()
+
 
 # --------------------------------------------------
 # MongoDB Configuration
 # --------------------------------------------------
 MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
 MONGODB_DB = os.getenv('MONGODB_DB', 'legalmate_db')
+# Fail fast instead of pymongo's 30s default so /ready answers promptly
+MONGODB_TIMEOUT_MS = int(os.getenv('MONGODB_TIMEOUT_MS', 5000))
+
+_mongo_client = None
+_mongo_pid = None
+_indexes_pid = None
+_mongo_lock = threading.Lock()
+
+
+def get_database():
+    """
+    Database handle; the MongoClient is created on first use in each process,
+    which also makes sure the indexes exist, whatever the warm-up mode
+    """
+    global _mongo_client, _mongo_pid
+    if _mongo_client is None or _mongo_pid != os.getpid():
+        with _mongo_lock:
+            if _mongo_client is None or _mongo_pid != os.getpid():
+                try:
+                    _mongo_client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=MONGODB_TIMEOUT_MS)
+                    _mongo_pid = os.getpid()
+                except Exception as e:
+                    logging.error(f"Failed to connect to MongoDB: {e}")
+                    raise
+    database = _mongo_client[MONGODB_DB]
+    if _indexes_pid != os.getpid():
+        _ensure_indexes()
+    return database
+
+
+def _ensure_indexes():
+    global _indexes_pid
+    with _mongo_lock:
+        if _indexes_pid == os.getpid():
+            return
+        # Claimed first: creating the indexes goes through get_database again
+        _indexes_pid = os.getpid()
+    if not Config.create_indexes():
+        # Mongo unreachable: try again on the next use
+        _indexes_pid = None
+
+
+class LazyCollection:
+    """Collection proxy resolved through get_database() on every use"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_database()[self.name], attr)
+
+
+documents_collection = LazyCollection('documents')
+analysis_cache_collection = LazyCollection('analysis_cache')
+batches_collection = LazyCollection('batches')
+search_index_collection = LazyCollection('search_index')
+families_collection = LazyCollection('families')
+reanalysis_runs_collection = LazyCollection('reanalysis_runs')
 
-try:
-    client = MongoClient(MONGODB_URI)
-    db = client[MONGODB_DB]
-    documents_collection = db['documents']
-except Exception as e:
-    logging.error(f"Failed to connect to MongoDB: {e}")
-    raise
 
 class Config:
     # File upload settings
@@ -69,9 +125,152 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB limit for uploads
     JSON_SORT_KEYS = False
 
-    # Expose GCP clients as class attributes
-    NLP_CLIENT = NLP_CLIENT
-    VERTEX_MODEL = VERTEX_SUMMARY_MODEL
+    # PDF extraction: worker processes (1 = stream pages in-process), the page
+    # count from which ranges are split across processes, and hard caps
+    PDF_EXTRACT_PROCESSES = int(os.getenv('PDF_EXTRACT_PROCESSES', 1))
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 32))
+    PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', 2000))
+    PDF_MAX_CHARS = int(os.getenv('PDF_MAX_CHARS', 5_000_000))
+
+    # Text normalization: 'legal' keeps letters, digits and legal punctuation
+    # ($ % § ( ) ; ...), 'alnum' only letters, digits, '.' and ','.
+    # NORMALIZATION_KEEP adds characters to the profile
+    NORMALIZATION_PROFILE = os.getenv('NORMALIZATION_PROFILE', 'legal')
+    NORMALIZATION_KEEP = os.getenv('NORMALIZATION_KEEP', '')
+
+    # Ingestion job workers ('local' thread pool, or 'eager' to run inline)
+    JOB_BACKEND = os.getenv('JOB_BACKEND', 'local')
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+
+    # Batch uploads: files per batch, per-file size inside archives, and how
+    # many documents of one batch may be queued or running at once
+    BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', 2000))
+    BATCH_MAX_FILE_SIZE = int(os.getenv('BATCH_MAX_FILE_SIZE', 16 * 1024 * 1024))
+    BATCH_MAX_IN_FLIGHT = int(os.getenv('BATCH_MAX_IN_FLIGHT', 8))
+    BATCH_MAX_CONTENT_LENGTH = int(os.getenv('BATCH_MAX_CONTENT_LENGTH', 1024 * 1024 * 1024))
+
+    # Extracted text and large analysis payloads live outside the documents
+    # collection: 'filesystem' (content-addressed files under BLOB_STORE_PATH)
+    # or 'gridfs'; 'zlib' or 'zstd' (needs the zstandard package) compression,
+    # and the JSON size above which entities/risks are moved out of the record
+    BLOB_BACKEND = os.getenv('BLOB_BACKEND', 'filesystem')
+    BLOB_STORE_PATH = os.getenv('BLOB_STORE_PATH', 'blobs/')
+    BLOB_CODEC = os.getenv('BLOB_CODEC', 'zlib')
+    BLOB_FRAME_SIZE = int(os.getenv('BLOB_FRAME_SIZE', 1024 * 1024))
+    BLOB_INLINE_LIMIT = int(os.getenv('BLOB_INLINE_LIMIT', 64 * 1024))
+
+    # Seconds the estimated document total of GET /documents is reused
+    LISTING_TOTAL_TTL = float(os.getenv('LISTING_TOTAL_TTL', 30))
+
+    # Concurrent analysis stages: shared pool size and per-stage timeouts (seconds)
+    ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 8))
+    ANALYSIS_STAGE_TIMEOUTS = {
+        "entities": float(os.getenv('ENTITIES_TIMEOUT', 30)),
+        "summary": float(os.getenv('SUMMARY_TIMEOUT', 60)),
+        "risks": float(os.getenv('RISKS_TIMEOUT', 30)),
+        "clauses": float(os.getenv('CLAUSES_TIMEOUT', 60))
+    }
+
+    # Expose GCP clients as class attributes (created on first use)
+    NLP_CLIENT = _RegistryClient(gcp_clients.language)
+    VERTEX_MODEL = _RegistryClient(lambda: gcp_clients.vertex_model(VERTEX_MODEL_NAME))
+
+    # Optional JSON file of risk/ambiguous/clause terms; edits are picked up
+    # without a restart (see app.utils.keyword_engine)
+    KEYWORDS_FILE = os.getenv('KEYWORDS_FILE')
+
+    # Optional JSON file of risk rules (see app.services.risk_rules), reloaded
+    # like KEYWORDS_FILE. With RISK_BACKFILL=auto, stored documents are
+    # re-evaluated in the background against new or changed rules; 'manual'
+    # leaves that to flask risk-backfill
+    RISK_RULES_FILE = os.getenv('RISK_RULES_FILE')
+    RISK_BACKFILL = os.getenv('RISK_BACKFILL', 'auto')
+
+    # flask reanalyze: documents per batch (and checkpoint), pool processes
+    # for the CPU stages (0 runs them in-process) and documents analysed
+    # concurrently; GCP calls stay under the governor's limits below
+    REANALYSIS_BATCH_SIZE = int(os.getenv('REANALYSIS_BATCH_SIZE', 100))
+    REANALYSIS_PROCESSES = int(os.getenv('REANALYSIS_PROCESSES', os.cpu_count() or 1))
+    REANALYSIS_CONCURRENCY = int(os.getenv('REANALYSIS_CONCURRENCY', 8))
+
+    # Content-addressed analysis cache: in-process LRU size, and a version
+    # prefix that can be bumped to invalidate every stored entry
+    ANALYSIS_CACHE_SIZE = int(os.getenv('ANALYSIS_CACHE_SIZE', 1024))
+    ANALYSIS_CACHE_VERSION = os.getenv('ANALYSIS_CACHE_VERSION', '1')
+    VERTEX_MODEL_NAME = VERTEX_MODEL_NAME
+    DOC_AI_PROCESSOR_ID = DOC_AI_PROCESSOR_ID
+
+    # Map-reduce summarization: 'vertex' or the offline 'fake' backend,
+    # per-prompt token budget and concurrent chunk calls per document
+    SUMMARY_BACKEND = os.getenv('SUMMARY_BACKEND', 'vertex')
+    SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', 6000))
+    SUMMARY_MAX_PARALLEL = int(os.getenv('SUMMARY_MAX_PARALLEL', 4))
+
+    # Entity extraction runs per content-defined chunk of this many tokens;
+    # chunk results are cached, so revisions only re-analyze changed passages
+    ENTITY_CHUNK_TOKENS = int(os.getenv('ENTITY_CHUNK_TOKENS', 4000))
+    ENTITY_MAX_PARALLEL = int(os.getenv('ENTITY_MAX_PARALLEL', 4))
+
+    # Named entities come from the Natural Language API ('remote'), local
+    # spaCy NER ('local', no API calls), or one with the other as fallback
+    # ('local-first', 'remote-first'); see app.services.entity_backends.
+    # LOCAL_NER_PROCESSES > 1 runs nlp.pipe in worker processes, which only
+    # pays off for documents with many chunks
+    ENTITY_BACKEND = os.getenv('ENTITY_BACKEND', 'remote')
+    LOCAL_NER_MODEL = os.getenv('LOCAL_NER_MODEL', 'en_core_web_sm')
+    LOCAL_NER_BATCH_SIZE = int(os.getenv('LOCAL_NER_BATCH_SIZE', 8))
+    LOCAL_NER_PROCESSES = int(os.getenv('LOCAL_NER_PROCESSES', 1))
+
+    # Outbound GCP calls (see app.services.call_governor): per API, calls per
+    # second, burst size and calls in flight per process
+    GCP_CALL_LIMITS = {
+        "documentai": {
+            "rate": float(os.getenv('DOCUMENTAI_RATE', 2)),
+            "burst": int(os.getenv('DOCUMENTAI_BURST', 4)),
+            "concurrency": int(os.getenv('DOCUMENTAI_CONCURRENCY', 2))
+        },
+        "language": {
+            "rate": float(os.getenv('LANGUAGE_RATE', 10)),
+            "burst": int(os.getenv('LANGUAGE_BURST', 20)),
+            "concurrency": int(os.getenv('LANGUAGE_CONCURRENCY', 8))
+        },
+        "vertex": {
+            "rate": float(os.getenv('VERTEX_RATE', 5)),
+            "burst": int(os.getenv('VERTEX_BURST', 10)),
+            "concurrency": int(os.getenv('VERTEX_CONCURRENCY', 4))
+        }
+    }
+    # Consecutive transient failures that open an API's circuit, seconds
+    # before a trial call, and retries of a transient failure
+    GCP_BREAKER_FAILURES = int(os.getenv('GCP_BREAKER_FAILURES', 5))
+    GCP_BREAKER_RESET = float(os.getenv('GCP_BREAKER_RESET', 30))
+    GCP_CALL_RETRIES = int(os.getenv('GCP_CALL_RETRIES', 2))
+    # Deadlines (seconds) for upstream calls made by a request and by an
+    # ingestion job; clients may ask for less with an X-Request-Timeout header
+    REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', 60))
+    JOB_DEADLINE = float(os.getenv('JOB_DEADLINE', 300))
+
+    # Requests slower than this many seconds log their hottest stacks,
+    # sampled every PROFILE_SAMPLE_INTERVAL seconds (0 disables profiling)
+    PROFILE_SLOW_REQUESTS = float(os.getenv('PROFILE_SLOW_REQUESTS', 0))
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', 0.01))
+
+    # Loading of spaCy, GCP clients and the Mongo connection: 'background' (default,
+    # /ready turns 200 when done), 'sync' (inside create_app), 'preload'
+    # (fork-safe models only, for a preforking server; see gunicorn.conf.py)
+    # or 'off' (on first use)
+    WARM_UP = os.getenv('WARM_UP', 'background')
+
+    # Seconds a stopping worker waits for queued and running ingestion jobs
+    JOB_DRAIN_TIMEOUT = float(os.getenv('JOB_DRAIN_TIMEOUT', 60))
+
+    # Documents left queued, extracting or analyzing by a crashed or stopped
+    # process are requeued when a server starts (JOB_RECOVERY=auto) once their
+    # job has not been updated for JOB_STALE_AFTER seconds, and failed after
+    # JOB_MAX_RECOVERIES requeues
+    JOB_RECOVERY = os.getenv('JOB_RECOVERY', 'auto')
+    JOB_STALE_AFTER = float(os.getenv('JOB_STALE_AFTER', 900))
+    JOB_MAX_RECOVERIES = int(os.getenv('JOB_MAX_RECOVERIES', 3))
 
     @classmethod
     def init_app(cls, app):
@@ -81,10 +280,44 @@ class Config:
             os.makedirs(upload_folder)
             app.logger.info(f'Created upload directory: {upload_folder}')
 
-        # Create MongoDB indexes for efficient querying
+        # Compile the keyword dictionaries once per process
+        from app.utils.keyword_engine import configure_keyword_source
+        configure_keyword_source(app.config.get('KEYWORDS_FILE'))
+
+        # Risk rules are compiled from the dictionaries and the rules file
+        from app.services.risk_rules import configure_rule_source
+        configure_rule_source(app.config.get('RISK_RULES_FILE'))
+
+    @staticmethod
+    def create_indexes():
+        # Create MongoDB indexes for efficient querying (see get_database)
         try:
             documents_collection.create_index('filename')
             documents_collection.create_index('upload_time')
-            app.logger.info('Created database indexes for filename and upload_time')
+            # Keyset pagination walks (sort field, _id) in either direction
+            documents_collection.create_index([('upload_time', -1), ('_id', -1)])
+            documents_collection.create_index([('filename', 1), ('_id', 1)])
+            documents_collection.create_index('text_hash')
+            documents_collection.create_index('batch_id', sparse=True)
+            # Reference checks before a shared text blob is deleted
+            documents_collection.create_index('text_blob.key', sparse=True)
+            # Versions of one contract, newest first
+            documents_collection.create_index([('family_id', 1), ('version', -1)], sparse=True)
+
+            # Search entries: one weighted text index plus the filter fields
+            from app.services.search_index import TEXT_INDEX_WEIGHTS
+            search_index_collection.create_index(
+                [(field, 'text') for field in TEXT_INDEX_WEIGHTS],
+                weights=TEXT_INDEX_WEIGHTS,
+                default_language='english',
+                name='search_text'
+            )
+            search_index_collection.create_index('entity_keys')
+            search_index_collection.create_index('risk_tags')
+            search_index_collection.create_index([('upload_time', -1), ('_id', -1)])
+            search_index_collection.create_index([('filename', 1), ('_id', 1)])
+            logging.info('Created database indexes for documents and search entries')
+            return True
         except Exception as e:
-            app.logger.error(f'Index creation failed: {e}')
\ No newline at end of file
+            logging.error(f'Index creation failed: {e}')
+            return False
\ No newline at end of file
@@ -1,89 +1,101 @@
-from flask import Blueprint, request, jsonify, current_app
-from werkzeug.utils import secure_filename
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from bson import ObjectId
 from datetime import datetime
 from app.services import (
     DocumentProcessingError,
-    extract_text_from_pdf,
-    extract_text_from_docx,
-    preprocess_text,
     extract_legal_entities,
-    generate_summary,
-    identify_legal_risks
+    generate_summary
+)
+from app.services.ingestion_jobs import get_job_queue, new_job_state
+from app.services.metrics import BYTES_PROCESSED, span
+from app.services.result_cache import get_analysis_cache
+from app.services.batch_ingest import create_batch, batch_status
+from app.services.document_store import (
+    RAW_TEXT_FIELDS,
+    TEXT_FIELDS,
+    document_entities,
+    iter_text_bytes,
+    load_offset_map,
+    load_segment_index,
+    load_text,
+    release_blobs,
+    text_size,
+    unpack_payload
 )
 from app.config import documents_collection
-import os
+from app.utils.file_utils import UploadRejected
+from app.utils.streaming_upload import open_multipart, receive_upload
+from app.services.entity_model import ENTITY_TYPES, entity_names, top_entities
+from app.services.versioning import delta_between, family_of, family_versions, next_version
+from app.services.search_index import SearchQuery, remove_from_index, search_documents
+from app.services.risk_rules import SEVERITIES, score_findings
+from app.utils.pagination import (
+    SORT_OPTIONS,
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+    keyset_sort
+)
+import threading
 import time
 
 bp = Blueprint('documents', __name__)
 
-@bp.route('/', methods=['POST'])
-def create_document():
+def _accept_upload(**fields):
+    """Stream the upload to disk, insert it as queued and enqueue it (202)"""
+    # Stream the multipart body straight to a unique upload file,
+    # hashing it and checking its real type on the way
     try:
-        # Validate file presence
-        if 'file' not in request.files:
-            raise DocumentProcessingError("No file provided", 400)
-        
-        file = request.files['file']
-        if not file or file.filename == '':
-            raise DocumentProcessingError("Empty file submission", 400)
-
-        # Secure and validate filename
-        filename = secure_filename(file.filename)
-        if not filename.lower().endswith(('.pdf', '.docx')):
-            raise DocumentProcessingError("Unsupported file type", 400)
-
-        # Save file with unique name
-        unique_filename = f"{time.time()}_{filename}"
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(file_path)
-
-        # Extract text based on file type
-        if filename.endswith('.pdf'):
-            text = extract_text_from_pdf(file_path)
-        else:
-            text = extract_text_from_docx(file_path)
-        
-        if not text:
-            raise DocumentProcessingError("Text extraction failed", 500)
-
-        # Preprocess text
-        text = preprocess_text(text)
-
-        # NLP processing with GCP integration
-        try:
-            entities = extract_legal_entities(text)
-            summary = generate_summary(text)
-            risks = identify_legal_risks(text)
-        except AttributeError as ae:
-            current_app.logger.error(f"NLP processing error: {str(ae)}")
-            raise DocumentProcessingError(f"NLP processing failed: {str(ae)}", 500)
-
-        # Store in MongoDB
-        document_data = {
-            "filename": unique_filename,
-            "file_path": file_path,
-            "text": text,
-            "entities": entities,
-            "summary": summary,
-            "risks": risks,
-            "upload_time": datetime.utcnow(),
-            "status": "processed"
-        }
-        
+        with span("file_save"):
+            upload = receive_upload(
+                request, 'file',
+                current_app.config['UPLOAD_FOLDER'],
+                max_size=current_app.config['MAX_CONTENT_LENGTH']
+            )
+    except UploadRejected as e:
+        raise DocumentProcessingError(e.message, e.status_code)
+    BYTES_PROCESSED.inc(upload.size, kind="upload")
+
+    # Queue the document; extraction and analysis run on the job workers
+    document_data = {
+        "filename": upload.filename,
+        "file_path": upload.file_path,
+        "content_hash": upload.content_hash,
+        "mime_type": upload.mime_type,
+        "size": upload.size,
+        "upload_time": datetime.utcnow(),
+        "status": "queued",
+        "job": new_job_state()
+    }
+    document_data.update(fields)
+
+    with span("mongo_write"):
         result = documents_collection.insert_one(document_data)
-        doc_id = str(result.inserted_id)
+    doc_id = str(result.inserted_id)
+    get_job_queue().enqueue(doc_id, upload.file_path)
 
-        # Return success response
-        return jsonify({
-            "id": doc_id,
-            "filename": unique_filename,
-            "status": "processed",
-            "links": {
-                "self": f"/documents/{doc_id}",
-                "analysis": f"/analysis/{doc_id}"
-            }
-        }), 201
+    # Accepted: the client polls the job link for progress
+    return jsonify({
+        "id": doc_id,
+        "filename": upload.filename,
+        "status": "queued",
+        "family_id": str(document_data["family_id"]),
+        "version": document_data["version"],
+        "links": {
+            "self": f"/documents/{doc_id}",
+            "job": f"/documents/{doc_id}/job",
+            "versions": f"/documents/{doc_id}/versions",
+            "analysis": f"/analysis/{doc_id}"
+        }
+    }), 202
+
+@bp.route('/', methods=['POST'])
+def create_document():
+    try:
+        # A first upload starts its own family at version 1
+        doc_id = ObjectId()
+        return _accept_upload(_id=doc_id, family_id=doc_id, version=1)
 
     except DocumentProcessingError:
         raise
@@ -91,6 +103,127 @@ def create_document():
         current_app.logger.error(f"Unexpected error in create_document: {str(e)}")
         raise DocumentProcessingError("Internal server error", 500)
 
+@bp.route('/<string:doc_id>/versions', methods=['POST'])
+def create_document_version(doc_id):
+    """
+    Upload a new revision of a contract. It joins the document's family, and
+    once processed stores a delta against the previous processed version.
+    """
+    try:
+        parent = _find_document(doc_id, {"family_id": 1, "version": 1})
+        family_id, version = next_version(parent)
+        return _accept_upload(family_id=family_id, version=version)
+
+    except DocumentProcessingError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"Unexpected error in create_document_version: {str(e)}")
+        raise DocumentProcessingError("Internal server error", 500)
+
+@bp.route('/<string:doc_id>/versions', methods=['GET'])
+def list_document_versions(doc_id):
+    """Every version in the document's family, newest first"""
+    document = _find_document(doc_id, {"family_id": 1})
+    versions = [
+        {
+            "id": str(doc['_id']),
+            "version": doc.get('version', 1),
+            "filename": doc.get('filename', ''),
+            "upload_date": doc['upload_time'].isoformat() if doc.get('upload_time') else None,
+            "status": doc.get('status', 'unknown'),
+            "previous_id": str(doc['previous_id']) if doc.get('previous_id') else None,
+            "changes": doc.get('version_delta', {}).get('summary')
+        }
+        for doc in family_versions(document)
+    ]
+    return jsonify({"family_id": str(family_of(document)), "versions": versions}), 200
+
+@bp.route('/<string:doc_id>/delta', methods=['GET'])
+def get_document_delta(doc_id):
+    """
+    Risk, entity and segment delta of this version. Defaults to the stored
+    delta against the previous version; ?against=<id> compares any two.
+    """
+    against = request.args.get('against')
+    try:
+        if against:
+            return jsonify(delta_between(against, doc_id)), 200
+        document = _find_document(doc_id, {"version_delta": 1, "version": 1})
+    except DocumentProcessingError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"Delta error: {str(e)}")
+        raise DocumentProcessingError("Invalid document ID", 400)
+
+    if not document.get('version_delta'):
+        raise DocumentProcessingError("No previous version to compare with", 404)
+    return jsonify(document['version_delta']), 200
+
+@bp.route('/batch', methods=['POST'])
+def create_document_batch():
+    """Ingest many documents at once: multipart 'files' or a zip 'archive'"""
+    # A batch may exceed the single-upload limit (per-request limit, Flask >= 3.1)
+    max_size = current_app.config['BATCH_MAX_CONTENT_LENGTH']
+    request.max_content_length = max_size
+
+    # Parts are read off the request stream one at a time rather than
+    # through request.files, which would spool the whole batch first
+    try:
+        reader = open_multipart(request, max_size)
+    except UploadRejected as e:
+        raise DocumentProcessingError(e.message, e.status_code)
+
+    batch_id, results = create_batch(reader)
+    return jsonify({
+        "batch_id": batch_id,
+        "files": results,
+        "links": {
+            "self": f"/documents/batch/{batch_id}"
+        }
+    }), 202
+
+@bp.route('/batch/<string:batch_id>', methods=['GET'])
+def get_document_batch(batch_id):
+    """Poll the status of every file in a batch"""
+    return jsonify(batch_status(batch_id)), 200
+
+@bp.route('/<string:doc_id>/job', methods=['GET'])
+def get_document_job(doc_id):
+    """Report ingestion progress for a queued document"""
+    try:
+        document = documents_collection.find_one(
+            {"_id": ObjectId(doc_id)},
+            {"filename": 1, "status": 1, "job": 1}
+        )
+    except Exception as e:
+        current_app.logger.error(f"Job lookup error: {str(e)}")
+        raise DocumentProcessingError("Invalid document ID", 400)
+
+    if not document:
+        raise DocumentProcessingError("Document not found", 404)
+
+    job = document.get('job', {})
+    return jsonify({
+        "id": doc_id,
+        "filename": document.get('filename', ''),
+        "status": document.get('status', 'unknown'),
+        "progress": job.get('progress', 1.0),
+        "error": job.get('error'),
+        "timestamps": {
+            key[:-3]: value.isoformat()
+            for key, value in job.items()
+            if key.endswith('_at') and value is not None
+        },
+        "links": {
+            "document": f"/documents/{doc_id}"
+        }
+    }), 200
+
+@bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Analysis result cache hit/miss counters for this process"""
+    return jsonify(get_analysis_cache().stats()), 200
+
 @bp.route('/test-entities', methods=['POST'])
 def test_entities():
     """Endpoint for testing GCP entity extraction"""
@@ -117,74 +250,459 @@ def test_summary():
         current_app.logger.error(f"Test summary error: {str(e)}")
         raise DocumentProcessingError("Summary test failed", 500)
 
+# Only the fields the listing returns are fetched from Mongo
+LISTING_PROJECTION = {"filename": 1, "upload_time": 1, "status": 1}
+MAX_PAGE_SIZE = 100
+
+_total_cache = {"value": None, "expires": 0.0}
+_total_lock = threading.Lock()
+
+
+def _estimated_total():
+    # Metadata-based count, refreshed at most every LISTING_TOTAL_TTL seconds
+    now = time.monotonic()
+    with _total_lock:
+        if _total_cache["value"] is None or now >= _total_cache["expires"]:
+            _total_cache["value"] = documents_collection.estimated_document_count()
+            _total_cache["expires"] = now + current_app.config['LISTING_TOTAL_TTL']
+        return _total_cache["value"]
+
+
+def _listing_entry(doc):
+    return {
+        "id": str(doc['_id']),
+        "filename": doc.get('filename', ''),
+        "upload_date": doc.get('upload_time', '').isoformat(),
+        "status": doc.get('status', 'unknown')
+    }
+
+
 @bp.route('/', methods=['GET'])
 def list_documents():
+    """
+    List documents with keyset pagination on (sort field, _id).
+
+    Pass the returned next_cursor as ?cursor= to fetch the following page.
+    ?page= is still accepted for existing clients but costs a skip.
+    """
     try:
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 10))
-        skip = (page - 1) * limit
-
-        total = documents_collection.count_documents({})
-        cursor = documents_collection.find().skip(skip).limit(limit)
-        
-        documents = [
-            {
-                "id": str(doc['_id']),
-                "filename": doc.get('filename', ''),
-                "upload_date": doc.get('upload_time', '').isoformat(),
-                "status": doc.get('status', 'unknown')
-            }
-            for doc in cursor
+        limit = min(max(int(request.args.get('limit', 10)), 1), MAX_PAGE_SIZE)
+        sort = request.args.get('sort', '-upload_time')
+        if sort not in SORT_OPTIONS:
+            raise DocumentProcessingError(f"Unsupported sort: {sort}", 400)
+        field, direction = SORT_OPTIONS[sort]
+
+        query = {}
+        token = request.args.get('cursor')
+        if token:
+            value, last_id = decode_cursor(token, sort)
+            query = keyset_filter(field, direction, value, last_id)
+
+        cursor = documents_collection.find(query, LISTING_PROJECTION).sort(keyset_sort(field, direction))
+        page = None
+        if not token and 'page' in request.args:
+            page = max(int(request.args['page']), 1)
+            cursor = cursor.skip((page - 1) * limit)
+
+        # One extra row tells whether another page exists
+        docs = list(cursor.limit(limit + 1))
+        has_more = len(docs) > limit
+        docs = docs[:limit]
+
+        next_cursor = None
+        if has_more:
+            last = docs[-1]
+            next_cursor = encode_cursor(sort, last.get(field), last['_id'])
+
+        pagination = {
+            "total": _estimated_total(),
+            "total_is_estimate": True,
+            "limit": limit,
+            "sort": sort,
+            "next_cursor": next_cursor,
+            "next": f"/documents?cursor={next_cursor}&limit={limit}&sort={sort}" if next_cursor else None
+        }
+        if page is not None:
+            pagination["page"] = page
+            pagination["next"] = f"/documents?page={page+1}&limit={limit}&sort={sort}" if has_more else None
+
+        return jsonify({
+            "data": [_listing_entry(doc) for doc in docs],
+            "pagination": pagination
+        }), 200
+
+    except DocumentProcessingError:
+        raise
+    except InvalidCursor as e:
+        raise DocumentProcessingError(str(e), 400)
+    except Exception as e:
+        current_app.logger.error(f"Document listing error: {str(e)}")
+        raise DocumentProcessingError("Failed to retrieve documents", 500)
+
+# Entity filter shortcuts of GET /documents/search
+ENTITY_PARAMS = {
+    "organization": "ORGANIZATION",
+    "person": "PERSON",
+    "date": "DATE",
+    "law": "LAW",
+    "clause": "CLAUSES"
+}
+
+
+def _parse_date(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise DocumentProcessingError(f"Invalid {name}: expected an ISO date", 400)
+
+
+@bp.route('/search', methods=['GET'])
+def search():
+    """
+    Search processed documents.
+
+    q              text query (Mongo text syntax: "exact phrase", -excluded)
+    organization=, person=, date=, law=, clause=, entity=TYPE:name
+                   entity filters, repeatable, all must match
+    risk=          risk tag, repeatable (e.g. indemnification, ambiguous)
+    uploaded_after=, uploaded_before=
+                   ISO dates
+    sort           relevance (default with q) or a listing sort
+    cursor, limit  keyset pagination as in GET /documents
+    """
+    try:
+        entities = [
+            (entity_type, value)
+            for param, entity_type in ENTITY_PARAMS.items()
+            for value in request.args.getlist(param)
         ]
+        for value in request.args.getlist('entity'):
+            entity_type, sep, name = value.partition(':')
+            if not sep or not name:
+                raise DocumentProcessingError("entity filters look like TYPE:name", 400)
+            entities.append((entity_type, name))
+
+        sort = request.args.get('sort')
+        if sort is not None and sort != 'relevance' and sort not in SORT_OPTIONS:
+            raise DocumentProcessingError(f"Unsupported sort: {sort}", 400)
+
+        query = SearchQuery(
+            text=request.args.get('q'),
+            entities=entities,
+            risks=request.args.getlist('risk'),
+            uploaded_after=_parse_date('uploaded_after'),
+            uploaded_before=_parse_date('uploaded_before'),
+            limit=min(max(int(request.args.get('limit', 10)), 1), MAX_PAGE_SIZE),
+            cursor=request.args.get('cursor'),
+            sort=sort
+        )
+        if query.sort == 'relevance' and not query.text:
+            raise DocumentProcessingError("sort=relevance needs a q parameter", 400)
 
+        results, next_cursor = search_documents(query)
         return jsonify({
-            "data": documents,
+            "data": results,
             "pagination": {
-                "total": total,
-                "page": page,
-                "limit": limit,
-                "next": f"/documents?page={page+1}&limit={limit}" if (page * limit) < total else None
+                "limit": query.limit,
+                "sort": query.sort,
+                "next_cursor": next_cursor
             }
         }), 200
 
+    except DocumentProcessingError:
+        raise
+    except InvalidCursor as e:
+        raise DocumentProcessingError(str(e), 400)
+    except ValueError as e:
+        raise DocumentProcessingError(str(e), 400)
     except Exception as e:
-        current_app.logger.error(f"Document listing error: {str(e)}")
-        raise DocumentProcessingError("Failed to retrieve documents", 500)
+        current_app.logger.error(f"Document search error: {str(e)}")
+        raise DocumentProcessingError("Search failed", 500)
+
+# fields= names for GET /documents/<id> and the record fields each one reads
+DOCUMENT_FIELDS = {
+    "id": {},
+    "filename": {"filename": 1},
+    "upload_date": {"upload_time": 1},
+    "status": {"status": 1},
+    "analysis": {"entity_index": 1, "entities": 1, "risks": 1, "summary": 1, "analysis_degraded": 1},
+    "text": TEXT_FIELDS,
+    "text_size": TEXT_FIELDS,
+    "page_offsets": {"page_offsets": 1},
+    "links": {}
+}
+DEFAULT_DOCUMENT_FIELDS = ("id", "filename", "upload_date", "status", "analysis", "text", "links")
+
+
+def _requested_fields():
+    raw = request.args.get('fields')
+    if not raw:
+        return DEFAULT_DOCUMENT_FIELDS
+    fields = tuple(f.strip() for f in raw.split(',') if f.strip())
+    unknown = [f for f in fields if f not in DOCUMENT_FIELDS]
+    if unknown:
+        raise DocumentProcessingError(f"Unknown fields: {', '.join(unknown)}", 400)
+    return fields
+
+
+def _find_document(doc_id, projection):
+    try:
+        object_id = ObjectId(doc_id)
+    except Exception:
+        raise DocumentProcessingError("Invalid document ID", 400)
+    document = documents_collection.find_one({"_id": object_id}, projection or {"_id": 1})
+    if not document:
+        raise DocumentProcessingError("Document not found", 404)
+    return document
+
 
 @bp.route('/<string:doc_id>', methods=['GET'])
 def get_document(doc_id):
+    """
+    Document metadata, analysis and text. ?fields=filename,status,... limits
+    the response (and what is read from Mongo and the blob store) to those keys.
+    """
     try:
-        document = documents_collection.find_one({"_id": ObjectId(doc_id)})
-        if not document:
-            raise DocumentProcessingError("Document not found", 404)
+        fields = _requested_fields()
+        projection = {}
+        for field in fields:
+            projection.update(DOCUMENT_FIELDS[field])
+        document = _find_document(doc_id, projection)
 
-        return jsonify({
-            "id": str(document['_id']),
-            "filename": document.get('filename', ''),
-            "upload_date": document.get('upload_time', '').isoformat(),
-            "analysis": {
-                "entities": document.get('entities', {}),
-                "risks": document.get('risks', []),
-                "summary": document.get('summary', '')
+        values = {
+            "id": lambda: str(document['_id']),
+            "filename": lambda: document.get('filename', ''),
+            "upload_date": lambda: document.get('upload_time', '').isoformat(),
+            "status": lambda: document.get('status', 'unknown'),
+            "analysis": lambda: {
+                "entities": entity_names(document_entities(document)),
+                "risks": unpack_payload(document.get('risks', [])),
+                "summary": document.get('summary', ''),
+                # Stages that fell back because an upstream API was unavailable
+                "degraded": document.get('analysis_degraded', [])
             },
-            "text": document.get('text', ''),
-            "links": {
+            "text": lambda: load_text(document),
+            "text_size": lambda: text_size(document),
+            "page_offsets": lambda: document.get('page_offsets', []),
+            "links": lambda: {
                 "download": f"/documents/{doc_id}/file",
+                "text": f"/documents/{doc_id}/text",
+                "entities": f"/documents/{doc_id}/entities",
                 "delete": f"/documents/{doc_id}"
             }
-        }), 200
+        }
+        return jsonify({field: values[field]() for field in fields}), 200
 
+    except DocumentProcessingError:
+        raise
     except Exception as e:
         current_app.logger.error(f"Document retrieval error: {str(e)}")
-        raise DocumentProcessingError("Invalid document ID", 400)
+        raise DocumentProcessingError("Failed to retrieve document", 500)
+
+MAX_ENTITY_RESULTS = 500
+
+@bp.route('/<string:doc_id>/entities', methods=['GET'])
+def get_document_entities(doc_id):
+    """
+    Deduplicated entities with mention counts, salience and pages.
+
+    type=        restrict to entity types (repeatable)
+    top=         most salient entities to return (default 20)
+    group=type   top entities per type instead of overall
+    offsets=1    include character offsets of the mentions
+    offsets=raw  the same offsets in the raw extracted text (/text?source=raw)
+    """
+    try:
+        types = [t.upper() for t in request.args.getlist('type')]
+        unknown = [t for t in types if t not in ENTITY_TYPES]
+        if unknown:
+            raise DocumentProcessingError(f"Unknown entity types: {', '.join(unknown)}", 400)
+        top = min(max(int(request.args.get('top', 20)), 1), MAX_ENTITY_RESULTS)
+        include_offsets = request.args.get('offsets') in ('1', 'true', 'raw')
+        raw_offsets = request.args.get('offsets') == 'raw'
+        group = request.args.get('group')
+        if group not in (None, 'type'):
+            raise DocumentProcessingError("group must be 'type'", 400)
+    except ValueError:
+        raise DocumentProcessingError("top must be an integer", 400)
+
+    document = _find_document(doc_id, {"entity_index": 1, "entities": 1, "offset_map": 1})
+    records = document_entities(document)
+    offset_map = load_offset_map(document) if raw_offsets else None
+    if raw_offsets and offset_map is None:
+        raise DocumentProcessingError("Raw offsets are not available for this document", 404)
+
+    def view(record):
+        entry = {k: v for k, v in record.items() if k != "offsets"}
+        if include_offsets:
+            offsets = record.get("offsets", [])
+            pairs = [offsets[i:i + 2] for i in range(0, len(offsets) - 1, 2)]
+            if offset_map is not None:
+                pairs = [list(offset_map.raw_span(start, end)) for start, end in pairs]
+            entry["offsets"] = pairs
+        return entry
+
+    if group == 'type':
+        by_type = {}
+        for entity_type in types or ENTITY_TYPES:
+            selected = top_entities(records, [entity_type])
+            if selected:
+                by_type[entity_type] = {
+                    "total": len(selected),
+                    "entities": [view(r) for r in selected[:top]]
+                }
+        return jsonify({"id": doc_id, "by_type": by_type}), 200
+
+    selected = top_entities(records, types)
+    return jsonify({
+        "id": doc_id,
+        "total": len(selected),
+        "entities": [view(r) for r in selected[:top]]
+    }), 200
+
+def _segment_index_of(document):
+    segment_index = load_segment_index(document)
+    if segment_index is None:
+        raise DocumentProcessingError("Clause index is not available for this document", 404)
+    return segment_index
+
+@bp.route('/<string:doc_id>/clauses', methods=['GET'])
+def get_document_clauses(doc_id):
+    """
+    Numbered clauses of the document in order, from its segmentation index.
+
+    level=1   sections only (level=2 adds their sub-clauses, ...)
+    """
+    try:
+        max_level = int(request.args['level']) if 'level' in request.args else None
+    except ValueError:
+        raise DocumentProcessingError("level must be an integer", 400)
+
+    segment_index = _segment_index_of(_find_document(doc_id, {"segment_index": 1}))
+    clauses = segment_index.outline(max_level)
+    return jsonify({
+        "id": doc_id,
+        "total": len(clauses),
+        "sentences": segment_index.sentence_count,
+        "clauses": clauses
+    }), 200
+
+@bp.route('/<string:doc_id>/clauses/<string:clause_id>', methods=['GET'])
+def get_document_clause(doc_id, clause_id):
+    """
+    One clause by id with its text, sub-clauses and raw-text span. The id is
+    the clause number (e.g. 4.2); when numbering restarts, a repeated number
+    is qualified by its occurrence (4.2~2 is the second clause 4.2).
+    """
+    document = _find_document(doc_id, dict(TEXT_FIELDS, segment_index=1, offset_map=1))
+    segment_index = _segment_index_of(document)
+    index = segment_index.find_clause(clause_id)
+    if index is None:
+        raise DocumentProcessingError(f"Clause {clause_id} not found", 404)
+
+    clause = segment_index.clause(index)
+    clause["text"] = load_text(document)[clause["start"]:clause["end"]].strip()
+    clause["subclauses"] = [segment_index.clause_ids[i] for i in segment_index.children(index)]
+    offset_map = load_offset_map(document)
+    if offset_map is not None:
+        clause["raw_span"] = list(offset_map.raw_span(clause["start"], clause["end"]))
+    return jsonify({"id": doc_id, "clause": clause}), 200
+
+@bp.route('/<string:doc_id>/risks', methods=['GET'])
+def get_document_risks(doc_id):
+    """
+    Risk rule findings with a score per clause and for the whole document.
+
+    min_severity=  low | medium | high | critical, or a number in 0..1
+    """
+    raw_severity = request.args.get('min_severity', '0')
+    try:
+        min_severity = SEVERITIES[raw_severity] if raw_severity in SEVERITIES else float(raw_severity)
+    except ValueError:
+        raise DocumentProcessingError(
+            f"min_severity must be one of {', '.join(SEVERITIES)} or a number", 400
+        )
+
+    document = _find_document(doc_id, {"risk_findings": 1, "risk_ruleset": 1, "segment_index": 1})
+    if 'risk_findings' not in document:
+        raise DocumentProcessingError("Risk findings are not available for this document", 404)
+    findings = [f for f in unpack_payload(document['risk_findings']) if f["severity"] >= min_severity]
+
+    scores = score_findings(findings)
+    segment_index = load_segment_index(document)
+    for entry in scores["clauses"]:
+        index = segment_index.find_clause(entry["clause"]) if segment_index and entry["clause"] else None
+        entry["heading"] = segment_index.clause_headings[index] if index is not None else None
+    return jsonify({
+        "id": doc_id,
+        "ruleset": document.get('risk_ruleset'),
+        "score": scores["score"],
+        "clauses": scores["clauses"],
+        "total": len(findings),
+        "findings": findings
+    }), 200
+
+@bp.route('/<string:doc_id>/text', methods=['GET'])
+def get_document_text(doc_id):
+    """
+    Stream the normalized text as UTF-8; honours a single-range Range header (bytes).
+    source=raw streams the text as extracted, before normalization.
+    """
+    source = request.args.get('source', 'normalized')
+    if source not in ('normalized', 'raw'):
+        raise DocumentProcessingError("source must be 'normalized' or 'raw'", 400)
+    field = 'raw_text_blob' if source == 'raw' else 'text_blob'
+    document = _find_document(doc_id, RAW_TEXT_FIELDS if source == 'raw' else TEXT_FIELDS)
+    if source == 'raw' and not document.get(field):
+        raise DocumentProcessingError("Raw text is not available for this document", 404)
+    size = text_size(document, field)
+    etag = (document.get(field) or {}).get('key')
+
+    headers = {"Accept-Ranges": "bytes"}
+    if etag:
+        headers["ETag"] = f'"{etag}"'
+
+    start, stop, status = 0, size, 200
+    byte_range = request.range
+    # A stale If-Range validator means the client gets the whole text
+    if byte_range is not None and request.if_range.etag and request.if_range.etag != etag:
+        byte_range = None
+    if byte_range is not None:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            if len(byte_range.ranges) == 1:
+                return Response(status=416, headers={"Content-Range": f"bytes */{size}"})
+        else:
+            start, stop = bounds
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+
+    headers["Content-Length"] = str(stop - start)
+    return Response(
+        stream_with_context(iter_text_bytes(document, start, stop, field)),
+        status=status,
+        headers=headers,
+        content_type="text/plain; charset=utf-8"
+    )
 
 @bp.route('/<string:doc_id>', methods=['DELETE'])
 def delete_document(doc_id):
     try:
-        result = documents_collection.delete_one({"_id": ObjectId(doc_id)})
-        if result.deleted_count == 0:
+        document = documents_collection.find_one_and_delete(
+            {"_id": ObjectId(doc_id)},
+            projection={"text_blob": 1, "raw_text_blob": 1, "offset_map": 1, "segment_index": 1,
+                        "entity_index": 1, "entities": 1, "risks": 1, "risk_findings": 1}
+        )
+        if document is None:
             raise DocumentProcessingError("Document not found", 404)
+        remove_from_index(doc_id)
+        release_blobs(document)
         return jsonify({"message": "Document deleted successfully"}), 204
+    except DocumentProcessingError:
+        raise
     except Exception as e:
         current_app.logger.error(f"Document deletion error: {str(e)}")
-        raise DocumentProcessingError("Invalid document ID", 400)
\ No newline at end of file
+        raise DocumentProcessingError("Invalid document ID", 400)
@@ -2,12 +2,14 @@ from flask import Blueprint, request, jsonify, current_app
 from app.services.document_processing import (
     extract_text_from_pdf,
     extract_text_from_docx,
-    preprocess_text,
-    extract_clauses_from_document,
-    extract_legal_entities,
-    generate_summary,
-    identify_legal_risks
+    preprocess_text
 )
+from app.services.analysis_orchestrator import run_document_analysis
+from app.services.entity_model import entity_names
+from app.utils.file_utils import MIME_TYPES, UploadRejected
+from app.utils.streaming_upload import receive_upload
+import os
+import tempfile
 
 bp = Blueprint('gcp_test', __name__, url_prefix='/gcp-test')
 
@@ -21,40 +23,41 @@ def run_gcp_pipeline():
       - Vertex summary,
       - risk list
     """
-    if 'file' not in request.files:
-        return jsonify({"error": "No file provided"}), 400
-
-    file = request.files['file']
-    filename = file.filename.lower()
-    if not filename.endswith(('.pdf', '.docx')):
-        return jsonify({"error": "Unsupported file type"}), 400
-
-    # 1) Save to temp and extract text
-    tmp_path = f"/tmp/{filename}"
-    file.save(tmp_path)
-
-    text = (extract_text_from_pdf if filename.endswith('.pdf') else extract_text_from_docx)(tmp_path)
+    # 1) Stream to a private temp file (never a shared path) and extract text
+    try:
+        upload = receive_upload(
+            request, 'file', tempfile.gettempdir(),
+            max_size=current_app.config['MAX_CONTENT_LENGTH']
+        )
+    except UploadRejected as e:
+        return jsonify({"error": e.message}), e.status_code
+
+    try:
+        return _run_pipeline(upload)
+    finally:
+        os.remove(upload.file_path)
+
+
+def _run_pipeline(upload):
+    tmp_path = upload.file_path
+    text = (extract_text_from_pdf if upload.mime_type == MIME_TYPES['.pdf'] else extract_text_from_docx)(tmp_path)
     if not text:
         return jsonify({"error": "Text extraction failed"}), 500
 
     text = preprocess_text(text)
 
-    # 2) Run GCP clause extractor
-    clauses = extract_clauses_from_document(tmp_path)
-
-    # 3) Run GCP NLP entity extractor
-    entities = extract_legal_entities(text)
-
-    # 4) Run Vertex AI summarizer
-    summary = generate_summary(text)
-
-    # 5) Run local risk identifier
-    risks = identify_legal_risks(text)
+    # 2) Run the GCP clause extractor, NLP entities, Vertex summary and
+    #    local risk identifier concurrently
+    analysis = run_document_analysis(text, file_path=tmp_path, content_hash=upload.content_hash)
 
     return jsonify({
         "text_snippet": text[:300] + ("…" if len(text) > 300 else ""),
-        "clauses": clauses,
-        "entities": entities,
-        "summary": summary,
-        "risks": risks
+        "clauses": analysis["clauses"],
+        "entities": entity_names(analysis["entities"]),
+        "summary": analysis["summary"],
+        "risks": analysis["risks"]["messages"],
+        "risk_findings": analysis["risks"]["findings"],
+        "errors": analysis["errors"],
+        "timings": analysis["timings"],
+        "cache": analysis["cache"]
     }), 200
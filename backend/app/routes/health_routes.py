@@ -1,4 +1,7 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify, current_app
+from app.services.call_governor import get_call_governor
+from app.services.metrics import registry
+from app.services.warmup import readiness_report
 
 bp = Blueprint('health', __name__)
 
@@ -7,4 +10,21 @@ def home():
     """Original root endpoint without modifications"""
     return jsonify({
         "message": "API is running. Use /documents endpoints."
-    }), 200
\ No newline at end of file
+    }), 200
+
+@bp.route('/ready')
+def ready():
+    """Readiness: 200 once models are warm and MongoDB answers, 503 before"""
+    is_ready, details = readiness_report(current_app)
+    details["status"] = "ready" if is_ready else "starting"
+    return jsonify(details), 200 if is_ready else 503
+
+@bp.route('/governor')
+def governor():
+    """Per-API outbound call stats: queueing time, in flight, rejections, circuit state"""
+    return jsonify(get_call_governor().stats()), 200
+
+@bp.route('/metrics')
+def metrics():
+    """Process metrics in the Prometheus text exposition format"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -12,11 +12,13 @@ from .error_handlers import (
 
 # Document processing utilities
 from .document_processing import (
+    extract_document,
     extract_text_from_pdf,
     extract_text_from_docx,
     preprocess_text,
     extract_legal_entities,
     generate_summary,
+    assess_legal_risks,
     identify_legal_risks
 )
 
@@ -29,11 +31,13 @@ __all__ = [
     'handle_mongo_error',
     'handle_document_processing_error',
     'handle_general_exception',
+    'extract_document',
     'extract_text_from_pdf',
     'extract_text_from_docx',
     'preprocess_text',
     'extract_legal_entities',
     'generate_summary',
+    'assess_legal_risks',
     'identify_legal_risks',
     'configure_logging'
 ]
\ No newline at end of file
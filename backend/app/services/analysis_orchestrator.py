@@ -0,0 +1,193 @@
+from flask import current_app
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import threading
+import time
+from app.services.call_governor import GovernorError, remaining_time, submit_with_context
+from app.services.error_handlers import DocumentProcessingError
+from app.services.metrics import ANALYSIS_CACHE, span
+from app.services.text_analysis import AnalysisContext
+from app.services.result_cache import get_analysis_cache, hash_text, stage_versions
+from app.services.document_processing import (
+    extract_clauses_from_document,
+    extract_legal_entities,
+    generate_summary,
+    assess_legal_risks
+)
+
+# Failure policies:
+#   "default" - record the error and fall back to the stage's default value
+#   "raise"   - abort the whole analysis with an AnalysisStageError
+POLICY_DEFAULT = "default"
+POLICY_RAISE = "raise"
+
+
+class AnalysisStageError(DocumentProcessingError):
+    """Raised when a stage with the "raise" policy fails or times out"""
+    def __init__(self, stage, message):
+        super().__init__(f"Analysis stage '{stage}' failed: {message}", 500, {"stage": stage})
+        self.stage = stage
+
+
+class AnalysisStage:
+    """One independent analysis step that can run alongside the others"""
+
+    def __init__(self, name, func, timeout, policy=POLICY_DEFAULT, default=None,
+                 uses_file=False, uses_context=False):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.policy = policy
+        self.default = default
+        self.uses_file = uses_file
+        self.uses_context = uses_context
+
+    def fallback(self):
+        # Copy mutable defaults so callers never share them
+        return type(self.default)(self.default) if isinstance(self.default, (list, dict)) else self.default
+
+
+def default_stages(include_clauses=False):
+    """Stages run for every document; timeouts come from ANALYSIS_STAGE_TIMEOUTS"""
+    timeouts = current_app.config.get('ANALYSIS_STAGE_TIMEOUTS', {})
+    stages = [
+        AnalysisStage("entities", extract_legal_entities, timeouts.get("entities", 30),
+                      default=[], uses_context=True),
+        AnalysisStage("summary", generate_summary, timeouts.get("summary", 60),
+                      default="Summary unavailable – API error", uses_context=True),
+        AnalysisStage("risks", assess_legal_risks, timeouts.get("risks", 30),
+                      default={"messages": [], "findings": [], "rules": {}, "ruleset": None},
+                      uses_context=True)
+    ]
+    if include_clauses:
+        stages.append(AnalysisStage("clauses", extract_clauses_from_document,
+                                    timeouts.get("clauses", 60), default=[], uses_file=True))
+    return stages
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    # Shared pool: a stage that overruns its timeout keeps its thread until it
+    # returns, so the pool must outlive any single request
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('ANALYSIS_WORKERS', 8),
+                thread_name_prefix="analysis"
+            )
+        return _executor
+
+
+def _run_in_context(app, stage_name, func, args, kwargs):
+    with app.app_context(), span("analysis_stage", stage=stage_name):
+        started = time.perf_counter()
+        value = func(*args, **kwargs)
+        return value, time.perf_counter() - started
+
+
+def _stage_call(stage, text, file_path, context):
+    if stage.uses_file:
+        return (file_path,), {}
+    if stage.uses_context:
+        return (text,), {"context": context}
+    return (text,), {}
+
+
+def run_document_analysis(text, file_path=None, stages=None, on_stage_complete=None,
+                          content_hash=None, use_cache=True, segment_index=None):
+    """
+    Run independent analysis stages concurrently.
+
+    Stages already cached for this upload (content_hash) or this text are not
+    run at all. Returns a dict with one key per stage plus "errors" (stage ->
+    message for stages that failed or timed out), "degraded" (stages that
+    fell back because an upstream API was shed by the call governor or the
+    deadline ran out), "timings" (stage -> seconds), "cache" (stages
+    served from / missing in the result cache) and "versions" (stage ->
+    version of each stage that did not fail).
+
+    Stage timeouts are capped by the caller's deadline (see call_governor),
+    which stage threads inherit. A stored segment_index (see segmentation)
+    supplies the sentence boundaries, so no stage parses the text again.
+    """
+    if stages is None:
+        stages = default_stages(include_clauses=file_path is not None)
+
+    text_hash = hash_text(text)
+    versions = {name: version for name, version in stage_versions().items()
+                if name in {stage.name for stage in stages}}
+    cache = get_analysis_cache() if use_cache else None
+    cached = cache.lookup(versions, content_hash=content_hash, text_hash=text_hash) if cache else {}
+    pending = [stage for stage in stages if stage.name not in cached]
+
+    results = {"errors": {}, "degraded": [], "timings": {}, "text_hash": text_hash}
+    results.update(cached)
+    results["cache"] = {"hits": sorted(cached), "misses": [stage.name for stage in pending]}
+    for name in results["cache"]["hits"]:
+        ANALYSIS_CACHE.inc(stage=name, result="hit")
+    for name in results["cache"]["misses"]:
+        ANALYSIS_CACHE.inc(stage=name, result="miss")
+
+    # One context per document: the sentence pass and lowercasing are shared
+    # by every detector instead of being repeated per stage
+    context = AnalysisContext(text, segment_index=segment_index)
+    app = current_app._get_current_object()
+    executor = _get_executor()
+    started = time.monotonic()
+    futures = [
+        (stage, submit_with_context(executor, _run_in_context, app, stage.name, stage.func,
+                                    *_stage_call(stage, text, file_path, context)))
+        for stage in pending
+    ]
+
+    for stage, future in futures:
+        remaining = max(0.0, stage.timeout - (time.monotonic() - started))
+        deadline_left = remaining_time()
+        cut_by_deadline = deadline_left is not None and deadline_left < remaining
+        if cut_by_deadline:
+            remaining = max(0.0, deadline_left)
+        try:
+            value, elapsed = future.result(timeout=remaining)
+            results[stage.name] = value
+            results["timings"][stage.name] = round(elapsed, 4)
+        except FutureTimeoutError:
+            future.cancel()
+            if cut_by_deadline:
+                results["degraded"].append(stage.name)
+                _handle_failure(stage, "deadline exceeded", results)
+            else:
+                _handle_failure(stage, f"timed out after {stage.timeout}s", results)
+        except GovernorError as e:
+            results["degraded"].append(stage.name)
+            _handle_failure(stage, str(e), results)
+        except Exception as e:
+            _handle_failure(stage, str(e) or e.__class__.__name__, results)
+
+        if on_stage_complete is not None:
+            on_stage_complete(stage.name)
+
+    results["versions"] = {name: version for name, version in versions.items()
+                           if name not in results["errors"]}
+
+    # Only successful stages are cached; failures are retried next time
+    if cache is not None:
+        cache.store(
+            versions,
+            {stage.name: results[stage.name] for stage in pending
+             if stage.name not in results["errors"]},
+            content_hash=content_hash,
+            text_hash=text_hash
+        )
+
+    return results
+
+
+def _handle_failure(stage, message, results):
+    current_app.logger.error(f"Analysis stage {stage.name} failed: {message}")
+    if stage.policy == POLICY_RAISE:
+        raise AnalysisStageError(stage.name, message)
+    results[stage.name] = stage.fallback()
+    results["errors"][stage.name] = message
@@ -0,0 +1,198 @@
+from flask import current_app
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+from werkzeug.utils import secure_filename
+import os
+import tempfile
+import zipfile
+from app.config import documents_collection, batches_collection
+from app.services.error_handlers import DocumentProcessingError
+from app.services.ingestion_jobs import get_job_queue, new_job_state
+from app.services.metrics import BYTES_PROCESSED, span
+from app.utils.file_utils import UploadRejected, iter_chunks, write_upload
+
+
+def _iter_archive(archive, max_files, max_size):
+    """Yield (name, chunks, error) for supported members of a zip upload"""
+    try:
+        bundle = zipfile.ZipFile(archive)
+    except zipfile.BadZipFile:
+        raise DocumentProcessingError("Archive is not a valid zip file", 400)
+
+    with bundle:
+        members = [m for m in bundle.infolist() if not m.is_dir()]
+        if len(members) > max_files:
+            raise DocumentProcessingError(f"Batch exceeds {max_files} files", 413)
+        for member in members:
+            name = os.path.basename(member.filename)
+            # Declared size is checked up front; write_upload enforces it again
+            # while copying in case the header lies
+            if member.file_size > max_size:
+                yield name, None, f"File exceeds {max_size} bytes"
+                continue
+            with bundle.open(member) as stream:
+                yield name, iter_chunks(stream), None
+
+
+def _part_chunks(reader):
+    try:
+        yield from reader.chunks()
+    except UploadRejected as e:
+        # A broken body fails the whole batch, not just the current member
+        raise DocumentProcessingError(e.message, e.status_code)
+
+
+def _save_member(name, chunks, error, batch_id, accepted, results):
+    """Write one batch member to disk and record it as queued or rejected"""
+    config = current_app.config
+    filename = secure_filename(name or '')
+    if error is None:
+        try:
+            with span("file_save"):
+                upload = write_upload(chunks, config['UPLOAD_FOLDER'], filename,
+                                      max_size=config['BATCH_MAX_FILE_SIZE'])
+            BYTES_PROCESSED.inc(upload.size, kind="upload")
+        except UploadRejected as e:
+            error = e.message
+    if error is not None:
+        results.append({"filename": name, "status": "rejected", "error": error})
+        return
+
+    accepted.append({
+        "filename": upload.filename,
+        "file_path": upload.file_path,
+        "content_hash": upload.content_hash,
+        "mime_type": upload.mime_type,
+        "size": upload.size,
+        "batch_id": batch_id,
+        "upload_time": datetime.utcnow(),
+        "status": "queued",
+        "job": new_job_state()
+    })
+    results.append({"filename": name, "stored_as": upload.filename, "status": "queued"})
+
+
+def _iter_members(reader, upload_folder, max_files, max_size):
+    """
+    Yield (name, chunks, error) for each 'files' part of the request body,
+    or for each member of its zip 'archive' part, as the parts arrive
+    """
+    count = 0
+    for field_name, client_filename in reader.file_parts():
+        if not client_filename:
+            continue
+        if field_name == 'files':
+            count += 1
+            if count > max_files:
+                raise DocumentProcessingError(f"Batch exceeds {max_files} files", 413)
+            yield client_filename, _part_chunks(reader), None
+        elif field_name == 'archive':
+            count += 1
+            # The zip directory sits at the end, so the archive is copied
+            # once to a seekable temporary file before its members are read
+            with tempfile.TemporaryFile(dir=upload_folder) as archive:
+                for chunk in _part_chunks(reader):
+                    archive.write(chunk)
+                archive.seek(0)
+                yield from _iter_archive(archive, max_files - count + 1, max_size)
+    if not count:
+        raise DocumentProcessingError("No files provided", 400)
+
+
+def create_batch(reader):
+    """
+    Save every member of a multipart or zip batch to disk while the request
+    body streams in, insert the queued documents with one insert_many and
+    schedule them with bounded concurrency.
+    """
+    config = current_app.config
+    max_files = config['BATCH_MAX_FILES']
+    max_size = config['BATCH_MAX_FILE_SIZE']
+    upload_folder = config['UPLOAD_FOLDER']
+
+    batch_id = ObjectId()
+    accepted, results = [], []
+    try:
+        for name, chunks, error in _iter_members(reader, upload_folder, max_files, max_size):
+            _save_member(name, chunks, error, batch_id, accepted, results)
+    except Exception:
+        # A body that fails part way (too many files, too large, malformed)
+        # leaves no orphaned uploads behind
+        for doc in accepted:
+            try:
+                os.remove(doc["file_path"])
+            except OSError:
+                pass
+        raise
+
+    if not accepted and not results:
+        raise DocumentProcessingError("Empty batch", 400)
+
+    if accepted:
+        inserted = documents_collection.insert_many(accepted, ordered=True).inserted_ids
+        queued = iter(inserted)
+        for result in results:
+            if result["status"] == "queued":
+                result["id"] = str(next(queued))
+
+    batches_collection.insert_one({
+        "_id": batch_id,
+        "created_at": datetime.utcnow(),
+        "total": len(results),
+        "accepted": len(accepted),
+        "rejected": [r for r in results if r["status"] == "rejected"]
+    })
+
+    if accepted:
+        get_job_queue().enqueue_many(
+            [(doc["_id"], doc["file_path"]) for doc in accepted],
+            max_in_flight=config['BATCH_MAX_IN_FLIGHT']
+        )
+
+    return str(batch_id), results
+
+
+def batch_status(batch_id):
+    """Per-status counts and per-file progress for a batch"""
+    try:
+        batch = batches_collection.find_one({"_id": ObjectId(batch_id)})
+    except (InvalidId, TypeError):
+        batch = None
+    if not batch:
+        raise DocumentProcessingError("Batch not found", 404)
+
+    counts = {
+        row["_id"]: row["count"]
+        for row in documents_collection.aggregate([
+            {"$match": {"batch_id": batch["_id"]}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ])
+    }
+    if batch.get("rejected"):
+        counts["rejected"] = len(batch["rejected"])
+
+    files = [
+        {
+            "id": str(doc["_id"]),
+            "filename": doc.get("filename", ""),
+            "status": doc.get("status", "unknown"),
+            "progress": doc.get("job", {}).get("progress"),
+            "error": doc.get("job", {}).get("error")
+        }
+        for doc in documents_collection.find(
+            {"batch_id": batch["_id"]},
+            {"filename": 1, "status": 1, "job.progress": 1, "job.error": 1}
+        )
+    ]
+    files += batch.get("rejected", [])
+
+    pending = sum(counts.get(status, 0) for status in ("queued", "extracting", "analyzing"))
+    return {
+        "batch_id": batch_id,
+        "created_at": batch["created_at"].isoformat(),
+        "total": batch["total"],
+        "complete": pending == 0,
+        "counts": counts,
+        "files": files
+    }
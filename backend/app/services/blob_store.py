@@ -0,0 +1,224 @@
+from flask import current_app
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is always available
+    zstandard = None
+
+# Blob layout (every blob is content-addressed by the sha256 of its raw bytes):
+#   header  MAGIC | codec name length (1 byte) | codec name | frame size (u32) | raw size (u64)
+#   frames  independently compressed slices of frame size raw bytes
+#   footer  file offset of every frame (u64 each) | frame count (u32) | MAGIC
+# Independent frames let a byte range be served by decompressing only the
+# frames it overlaps.
+MAGIC = b'LMB1'
+DEFAULT_FRAME_SIZE = 1024 * 1024
+
+
+def _codec(name):
+    """(compress, decompress) for a codec name"""
+    if name == 'zlib':
+        return (lambda data: zlib.compress(data, 6)), zlib.decompress
+    if name == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd blobs require the 'zstandard' package")
+        return zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"Unknown blob codec: {name}")
+
+
+def pack_blob(data, codec='zlib', frame_size=DEFAULT_FRAME_SIZE):
+    compress, _ = _codec(codec)
+    name = codec.encode('ascii')
+    parts = [MAGIC, bytes([len(name)]), name, struct.pack('>IQ', frame_size, len(data))]
+    position = sum(len(p) for p in parts)
+    offsets = []
+    for start in range(0, len(data), frame_size):
+        frame = compress(data[start:start + frame_size])
+        offsets.append(position)
+        parts.append(frame)
+        position += len(frame)
+    parts.append(struct.pack(f'>{len(offsets)}Q', *offsets))
+    parts.append(struct.pack('>I', len(offsets)) + MAGIC)
+    return b''.join(parts)
+
+
+class BlobReader:
+    """Random access to the raw bytes of a packed blob in a seekable file"""
+
+    def __init__(self, fileobj):
+        self.file = fileobj
+        header = fileobj.read(5)
+        if header[:4] != MAGIC:
+            raise ValueError("Not a blob")
+        self.codec = fileobj.read(header[4]).decode('ascii')
+        self.frame_size, self.size = struct.unpack('>IQ', fileobj.read(12))
+        self._decompress = _codec(self.codec)[1]
+
+        fileobj.seek(-8, os.SEEK_END)
+        end = fileobj.tell()
+        count, magic = struct.unpack('>I4s', fileobj.read(8))
+        if magic != MAGIC:
+            raise ValueError("Truncated blob")
+        fileobj.seek(end - 8 * count)
+        self.offsets = list(struct.unpack(f'>{count}Q', fileobj.read(8 * count)))
+        # Frames end where the next one (or the offset table) starts
+        self.offsets.append(end - 8 * count)
+
+    def _frame(self, index):
+        self.file.seek(self.offsets[index])
+        return self._decompress(self.file.read(self.offsets[index + 1] - self.offsets[index]))
+
+    def iter_range(self, start=0, stop=None):
+        """Yield the raw bytes in [start, stop) one frame at a time"""
+        stop = self.size if stop is None else min(stop, self.size)
+        index = start // self.frame_size
+        while start < stop:
+            frame_start = index * self.frame_size
+            frame = self._frame(index)
+            yield frame[start - frame_start:stop - frame_start]
+            start = frame_start + self.frame_size
+            index += 1
+
+    def read(self):
+        return b''.join(self.iter_range())
+
+    def close(self):
+        self.file.close()
+
+
+class FilesystemBlobBackend:
+    """Blobs as files under root/<2 hex chars>/<rest of the key>"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key[2:])
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def put(self, key, blob):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(blob)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open(self, key):
+        return open(self._path(key), 'rb')
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class GridFSBlobBackend:
+    """Blobs as GridFS files named by their key"""
+
+    def __init__(self, bucket_name='blobs'):
+        self.bucket_name = bucket_name
+
+    def _bucket(self):
+        # Resolved per call so the bucket follows get_database() across forks
+        import gridfs
+        from app.config import get_database
+        return gridfs.GridFSBucket(get_database(), bucket_name=self.bucket_name)
+
+    def exists(self, key):
+        for _ in self._bucket().find({"filename": key}).limit(1):
+            return True
+        return False
+
+    def put(self, key, blob):
+        self._bucket().upload_from_stream(key, blob)
+
+    def open(self, key):
+        import gridfs
+        try:
+            return self._bucket().open_download_stream_by_name(key)
+        except gridfs.errors.NoFile:
+            raise FileNotFoundError(key)
+
+    def delete(self, key):
+        bucket = self._bucket()
+        for grid_out in bucket.find({"filename": key}):
+            bucket.delete(grid_out._id)
+
+
+class BlobStore:
+    """Compressed, content-addressed byte storage on a pluggable backend"""
+
+    def __init__(self, backend, codec='zlib', frame_size=DEFAULT_FRAME_SIZE):
+        _codec(codec)
+        self.backend = backend
+        self.codec = codec
+        self.frame_size = frame_size
+
+    def put(self, data):
+        """Store bytes once per distinct content; returns (key, size)"""
+        key = hashlib.sha256(data).hexdigest()
+        if not self.backend.exists(key):
+            self.backend.put(key, pack_blob(data, self.codec, self.frame_size))
+        return key, len(data)
+
+    def open(self, key):
+        # Each blob records its own codec, so changing BLOB_CODEC never
+        # invalidates what is already stored
+        return BlobReader(self.backend.open(key))
+
+    def get(self, key):
+        reader = self.open(key)
+        try:
+            return reader.read()
+        finally:
+            reader.close()
+
+    def iter_range(self, key, start=0, stop=None):
+        reader = self.open(key)
+        try:
+            yield from reader.iter_range(start, stop)
+        finally:
+            reader.close()
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            config = current_app.config
+            backend_name = config.get('BLOB_BACKEND', 'filesystem')
+            if backend_name == 'filesystem':
+                backend = FilesystemBlobBackend(config.get('BLOB_STORE_PATH', 'blobs/'))
+            elif backend_name == 'gridfs':
+                backend = GridFSBlobBackend()
+            else:
+                raise ValueError(f"Unknown BLOB_BACKEND: {backend_name}")
+            _store = BlobStore(
+                backend,
+                codec=config.get('BLOB_CODEC', 'zlib'),
+                frame_size=config.get('BLOB_FRAME_SIZE', DEFAULT_FRAME_SIZE)
+            )
+        return _store
@@ -0,0 +1,439 @@
+from flask import current_app, g, request
+from concurrent.futures import Future
+import contextvars
+import random
+import threading
+import time
+from app.services.metrics import SPAN_SECONDS, registry
+
+# Every outbound Document AI, Natural Language and Vertex call goes through
+# one governor per process. Per API it applies, in order:
+#   circuit breaker  - after repeated transient failures, calls fail fast
+#                      until a cool-down has passed and a trial call succeeds
+#   coalescing       - identical concurrent calls (same key) share one result
+#   concurrency cap  - at most N calls in flight
+#   token bucket     - at most `rate` calls per second, bursts up to `burst`
+#   retries          - only for transient errors, with jittered backoff, and
+#                      never past the caller's deadline
+# Waiting for a slot or a token counts as queueing time in the stats.
+
+# Upstream errors worth retrying (matched by class name so google.api_core
+# does not have to be imported here)
+TRANSIENT_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "Aborted", "GatewayTimeout", "BadGateway",
+    "TimeoutError", "ConnectionError"
+}
+
+QUEUE_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_deadline = contextvars.ContextVar("call_deadline", default=None)
+
+
+class GovernorError(Exception):
+    """A call refused by the governor; the result of the caller is degraded"""
+
+
+class CircuitOpenError(GovernorError):
+    pass
+
+
+class CallDeadlineExceeded(GovernorError):
+    pass
+
+
+def set_deadline(seconds):
+    """Set the deadline (now + seconds) for calls made from this context; returns a reset token"""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    # A nested deadline can only shorten the outer one
+    if current is not None:
+        deadline = min(deadline, current)
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+
+def remaining_time(default=None):
+    """Seconds left before the current deadline (default when none is set)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    return deadline - time.monotonic()
+
+
+def submit_with_context(executor, func, *args, **kwargs):
+    # Worker threads do not inherit context variables; carry the deadline over
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def is_transient(error):
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = float(max(burst, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token, possibly going into debt; returns how long to wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures -> half-open after `reset_after`"""
+
+    def __init__(self, threshold=5, reset_after=30.0):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """None when the call must fail fast, else "closed" or "trial" (the half-open probe)"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return "closed"
+            # Half-open: let exactly one trial call through
+            if state == "half_open" and not self._trial:
+                self._trial = True
+                return "trial"
+            return None
+
+    def end_trial(self):
+        # A trial that ended without a verdict (deadline, shed by the limits):
+        # the circuit stays half-open and the next call probes again
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+class ApiStats:
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = {"circuit_open": 0, "deadline": 0}
+        self.coalesced = 0
+        self.in_flight = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+        self.queue_buckets = [0] * len(QUEUE_BUCKETS)
+        self.call_seconds_total = 0.0
+
+    def observe_queue(self, seconds):
+        self.queue_seconds_total += seconds
+        self.queue_seconds_max = max(self.queue_seconds_max, seconds)
+        for i, bound in enumerate(QUEUE_BUCKETS):
+            if seconds <= bound:
+                self.queue_buckets[i] += 1
+
+    def to_dict(self):
+        waited = self.calls + self.retries
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "rejected": dict(self.rejected),
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight,
+            "queue_seconds": {
+                "total": round(self.queue_seconds_total, 4),
+                "max": round(self.queue_seconds_max, 4),
+                "mean": round(self.queue_seconds_total / waited, 4) if waited else 0.0,
+                "buckets": dict(zip((str(b) for b in QUEUE_BUCKETS), self.queue_buckets))
+            },
+            "call_seconds_total": round(self.call_seconds_total, 4)
+        }
+
+
+class ApiGovernor:
+    """Limits, breaker, coalescing and stats for one upstream API"""
+
+    def __init__(self, name, rate, burst, concurrency, breaker_threshold=5, breaker_reset=30.0,
+                 retries=2, backoff_base=0.5, backoff_max=8.0):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = ApiStats()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def call(self, func, key=None):
+        """
+        Run func(timeout) under the limits. timeout is the time left before
+        the caller's deadline (None without one) for the client call itself.
+        Calls with the same non-None key made while one is running share it.
+        """
+        if key is None:
+            return self._call(func)
+
+        with self._lock:
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = Future()
+            else:
+                self.stats.coalesced += 1
+
+        if not leader:
+            try:
+                return pending.result(timeout=self._time_left())
+            except TimeoutError:
+                raise self._deadline_error("waiting for a coalesced call")
+
+        try:
+            result = self._call(func)
+            pending.set_result(result)
+            return result
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _time_left(self):
+        left = remaining_time()
+        if left is not None and left <= 0:
+            raise self._deadline_error("before the call")
+        return left
+
+    def _deadline_error(self, where):
+        with self._lock:
+            self.stats.rejected["deadline"] += 1
+        return CallDeadlineExceeded(f"{self.name}: deadline exceeded {where}")
+
+    def _call(self, func):
+        attempt = 0
+        while True:
+            admitted = self.breaker.allow()
+            if not admitted:
+                with self._lock:
+                    self.stats.rejected["circuit_open"] += 1
+                raise CircuitOpenError(f"{self.name}: circuit open, failing fast")
+            trial = admitted == "trial"
+
+            queued = time.monotonic()
+            try:
+                self._acquire()
+            except GovernorError:
+                if trial:
+                    self.breaker.end_trial()
+                raise
+            waited = time.monotonic() - queued
+            with self._lock:
+                self.stats.observe_queue(waited)
+                self.stats.in_flight += 1
+                if attempt == 0:
+                    self.stats.calls += 1
+                else:
+                    self.stats.retries += 1
+
+            started = time.monotonic()
+            try:
+                result = func(self._time_left())
+            except GovernorError:
+                if trial:
+                    self.breaker.end_trial()
+                raise
+            except Exception as e:
+                transient = is_transient(e)
+                with self._lock:
+                    self.stats.failures += 1
+                if transient:
+                    self.breaker.record_failure()
+                else:
+                    # The API answered: a bad request says nothing against
+                    # its health, and must not leave a trial pending
+                    self.breaker.record_success()
+                if not transient or attempt >= self.retries:
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+                left = remaining_time()
+                if left is not None and left <= delay:
+                    raise
+                attempt += 1
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                self.slots.release()
+                elapsed = time.monotonic() - started
+                SPAN_SECONDS.observe(elapsed, span="gcp_call", api=self.name)
+                with self._lock:
+                    self.stats.in_flight -= 1
+                    self.stats.call_seconds_total += elapsed
+
+            # Backoff holds neither a slot nor a token
+            time.sleep(delay)
+
+    def _acquire(self):
+        left = self._time_left()
+        # Without a deadline, wait for a slot as long as it takes
+        acquired = self.slots.acquire() if left is None else self.slots.acquire(timeout=left)
+        if not acquired:
+            raise self._deadline_error("waiting for a concurrency slot")
+        wait = self.bucket.reserve()
+        if wait > 0:
+            left = remaining_time()
+            if left is not None and wait >= left:
+                self.bucket.refund()
+                self.slots.release()
+                raise self._deadline_error("waiting for the rate limit")
+            time.sleep(wait)
+
+    def to_dict(self):
+        with self._lock:
+            stats = self.stats.to_dict()
+        stats["circuit"] = self.breaker.state
+        stats["limits"] = {"rate": self.bucket.rate, "burst": self.bucket.capacity}
+        return stats
+
+
+class CallGovernor:
+    def __init__(self, limits, breaker_threshold=5, breaker_reset=30.0, retries=2):
+        self.apis = {
+            name: ApiGovernor(
+                name,
+                rate=settings["rate"],
+                burst=settings["burst"],
+                concurrency=settings["concurrency"],
+                breaker_threshold=breaker_threshold,
+                breaker_reset=breaker_reset,
+                retries=retries
+            )
+            for name, settings in limits.items()
+        }
+
+    def call(self, api, func, key=None):
+        return self.apis[api].call(func, key=key)
+
+    def stats(self):
+        return {name: api.to_dict() for name, api in self.apis.items()}
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_call_governor():
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            config = current_app.config
+            _governor = CallGovernor(
+                config['GCP_CALL_LIMITS'],
+                breaker_threshold=config.get('GCP_BREAKER_FAILURES', 5),
+                breaker_reset=config.get('GCP_BREAKER_RESET', 30.0),
+                retries=config.get('GCP_CALL_RETRIES', 2)
+            )
+        return _governor
+
+
+def _prometheus_lines():
+    """Governor stats in the Prometheus text format (see app.services.metrics)"""
+    if _governor is None:
+        return []
+    stats = _governor.stats()
+    lines = [
+        "# HELP legalmate_gcp_queue_seconds Time outbound GCP calls waited for a slot and a token",
+        "# TYPE legalmate_gcp_queue_seconds histogram"
+    ]
+    for api, api_stats in sorted(stats.items()):
+        queue = api_stats["queue_seconds"]
+        waited = api_stats["calls"] + api_stats["retries"]
+        for bound, count in queue["buckets"].items():
+            lines.append(f'legalmate_gcp_queue_seconds_bucket{{api="{api}",le="{bound}"}} {count}')
+        lines.append(f'legalmate_gcp_queue_seconds_bucket{{api="{api}",le="+Inf"}} {waited}')
+        lines.append(f'legalmate_gcp_queue_seconds_sum{{api="{api}"}} {queue["total"]}')
+        lines.append(f'legalmate_gcp_queue_seconds_count{{api="{api}"}} {waited}')
+    counters = (
+        ("calls", "Outbound GCP calls"),
+        ("retries", "Retries of transient GCP failures"),
+        ("failures", "Failed GCP call attempts"),
+        ("coalesced", "Calls served by an identical call already in flight")
+    )
+    for field, help_text in counters:
+        lines += [f"# HELP legalmate_gcp_{field}_total {help_text}", f"# TYPE legalmate_gcp_{field}_total counter"]
+        lines += [f'legalmate_gcp_{field}_total{{api="{api}"}} {s[field]}' for api, s in sorted(stats.items())]
+    lines += ["# HELP legalmate_gcp_rejected_total Calls refused by the governor",
+              "# TYPE legalmate_gcp_rejected_total counter"]
+    for api, s in sorted(stats.items()):
+        lines += [f'legalmate_gcp_rejected_total{{api="{api}",reason="{reason}"}} {count}'
+                  for reason, count in sorted(s["rejected"].items())]
+    lines += ["# HELP legalmate_gcp_in_flight GCP calls currently running", "# TYPE legalmate_gcp_in_flight gauge"]
+    lines += [f'legalmate_gcp_in_flight{{api="{api}"}} {s["in_flight"]}' for api, s in sorted(stats.items())]
+    lines += ["# HELP legalmate_gcp_circuit_open 1 while an API's circuit breaker is not closed",
+              "# TYPE legalmate_gcp_circuit_open gauge"]
+    lines += [f'legalmate_gcp_circuit_open{{api="{api}"}} {int(s["circuit"] != "closed")}'
+              for api, s in sorted(stats.items())]
+    return lines
+
+
+def _request_deadline():
+    limit = current_app.config.get('REQUEST_DEADLINE', 60)
+    # A client may ask for less time, never for more
+    try:
+        asked = float(request.headers.get('X-Request-Timeout', limit))
+    except ValueError:
+        asked = limit
+    g.call_deadline = set_deadline(max(0.0, min(asked, limit)))
+
+
+def _clear_request_deadline(exc=None):
+    token = g.pop('call_deadline', None)
+    if token is not None:
+        try:
+            reset_deadline(token)
+        except (ValueError, RuntimeError):
+            # Teardown may run in a different context than before_request
+            pass
+
+
+def init_call_governor(app):
+    app.before_request(_request_deadline)
+    app.teardown_request(_clear_request_deadline)
+    registry.add_collector(_prometheus_lines)
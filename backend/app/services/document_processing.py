@@ -1,102 +1,172 @@
 from flask import current_app
-import PyPDF2
 import docx
-import spacy
-from collections import defaultdict
-from tenacity import retry, stop_after_attempt, wait_exponential
-from app.config import Config
-from app.utils.nlp_utils import RISK_KEYWORDS, AMBIGUOUS_TERMS
-from gcp.gcp_client import extract_clauses, analyze_entities, vertex_summarize
-from google.cloud import language_v1  # Added for Document and Entity Type
+import hashlib
+from app.services.pdf_extraction import ExtractedText, PageText, extract_pdf
+from app.services.call_governor import GovernorError, get_call_governor
+from app.services.entity_backends import get_entity_backend
+from app.services.metrics import span
+from app.services.normalization import get_normalizer
+from app.services.result_cache import get_analysis_cache, stage_versions
+from app.services.risk_rules import get_rule_set, schedule_backfill
+from app.services.segmentation import build_segment_index
+from app.services.entity_model import EntityAggregator
+from app.services.summarization import chunk_spans, get_summarization_engine
+from app.services.text_analysis import AnalysisContext, clause_sentences
+from gcp.gcp_client import extract_clauses
 
-# Load SpaCy model once
-_nlp = spacy.load("en_core_web_sm")
-
-def extract_text_from_pdf(file_path):
+def extract_pdf_document(file_path):
+    """Page-aware PDF extraction bounded by the PDF_* limits in Config"""
     try:
-        with open(file_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            return ''.join(p.extract_text() or "" for p in reader.pages)
+        config = current_app.config
+        with span("extract", format="pdf"):
+            extracted = extract_pdf(
+                file_path,
+                processes=config.get('PDF_EXTRACT_PROCESSES', 1),
+                max_pages=config.get('PDF_MAX_PAGES'),
+                max_chars=config.get('PDF_MAX_CHARS'),
+                parallel_min_pages=config.get('PDF_PARALLEL_MIN_PAGES', 32)
+            )
+        if extracted.truncated:
+            current_app.logger.warning(
+                f"PDF truncated to {len(extracted.pages)} of {extracted.page_count} pages: {file_path}"
+            )
+        return extracted
     except Exception as e:
         current_app.logger.error(f"PDF extraction error: {e}")
         return None
 
+def extract_text_from_pdf(file_path):
+    extracted = extract_pdf_document(file_path)
+    return extracted.text if extracted is not None else None
+
 def extract_text_from_docx(file_path):
     try:
-        doc = docx.Document(file_path)
-        return "\n".join(p.text for p in doc.paragraphs)
+        with span("extract", format="docx"):
+            doc = docx.Document(file_path)
+            return "\n".join(p.text for p in doc.paragraphs)
     except Exception as e:
         current_app.logger.error(f"DOCX extraction error: {e}")
         return None
 
-def preprocess_text(text):
-    text = " ".join(text.split())
-    return "".join(c for c in text if c.isalnum() or c in [" ", ".", ",", "\n"])
+def extract_document(file_path):
+    """ExtractedText for a PDF or DOCX upload (DOCX is a single page), None on failure"""
+    if file_path.lower().endswith('.pdf'):
+        return extract_pdf_document(file_path)
+    text = extract_text_from_docx(file_path)
+    return ExtractedText([PageText(1, text)]) if text is not None else None
+
+def _normalizer(profile=None):
+    config = current_app.config
+    return get_normalizer(
+        profile or config.get('NORMALIZATION_PROFILE', 'legal'),
+        config.get('NORMALIZATION_KEEP', '')
+    )
+
+def preprocess_text(text, profile=None):
+    """Normalized text (see app.services.normalization); profile defaults to NORMALIZATION_PROFILE"""
+    return _normalizer(profile).normalize(text)
+
+def normalize_document(extracted, profile=None):
+    """Page-wise normalized ExtractedText plus the OffsetMap back to extracted.text"""
+    return _normalizer(profile).normalize_pages(extracted)
+
+def segment_text(text, page_offsets=None):
+    """SegmentIndex of a normalized text; the one sentence pass of the document"""
+    with span("segmentation"):
+        return build_segment_index(text, AnalysisContext(text).sentence_spans, page_offsets)
+
+def _chunk_entities(chunks, version):
+    # Chunks are content-defined, so an unchanged passage of a new contract
+    # version hits the cache and skips the entity backend
+    cache = get_analysis_cache()
+    digests = [hashlib.sha256(chunk.encode('utf-8')).hexdigest() for chunk in chunks]
+    parts = [cache.get_value("entities", digest, version) for digest in digests]
+    missing = [i for i, records in enumerate(parts) if records is None]
+    if missing:
+        # All uncached chunks go to the backend at once (one nlp.pipe batch
+        # for spaCy, parallel calls for the API)
+        backend = get_entity_backend()
+        found, used = backend.route([chunks[i] for i in missing])
+        for i, records in zip(missing, found):
+            parts[i] = records
+            # Results of the fallback backend are not what this version
+            # stands for, so they are not cached
+            if used is backend.primary:
+                cache.set_value("entities", digests[i], version, records)
+    return parts
 
-def extract_legal_entities(text):
+def extract_legal_entities(text, context=None):
+    """Deduplicated entity records for the whole text, offsets into text"""
     try:
-        # Create a Document object for the Natural Language API
-        document = language_v1.Document(
-            content=text,
-            type_=language_v1.Document.Type.PLAIN_TEXT,
-            language="en"
+        context = context or AnalysisContext(text)
+        segment_index = context.segment_index
+        spans = chunk_spans(
+            text,
+            current_app.config.get('ENTITY_CHUNK_TOKENS', 4000),
+            sentence_spans=segment_index.sentence_spans() if segment_index is not None else None
         )
-        # Analyze entities using the NLP client from Config
-        response = Config.NLP_CLIENT.analyze_entities(document=document)
-
-        entities = defaultdict(list)
-        for ent in response.entities:
-            # Use the correct enum for entity type
-            ent_type = language_v1.Entity.Type(ent.type_).name
-            if ent_type in ["ORGANIZATION", "PERSON", "DATE", "LAW"]:
-                entities[ent_type].append(ent.name)
-
-        # Add clause detections using spaCy
-        doc = _nlp(text)
-        for sent in doc.sents:
-            low = sent.text.lower()
-            if "governing law" in low:
-                entities.setdefault("CLAUSES", []).append("Governing Law")
-            if "force majeure" in low:
-                entities.setdefault("CLAUSES", []).append("Force Majeure")
-
-        return dict(entities)
+        parts = _chunk_entities([text[start:end] for start, end in spans], stage_versions()["entities"])
+
+        entities = EntityAggregator()
+        for (start, _), records in zip(spans, parts):
+            entities.merge(records, shift=start)
+
+        # Add clause detections from the shared sentence pass
+        for label, clause_span in clause_sentences(context):
+            entities.add("CLAUSES", label, [clause_span])
+        return entities.records()
     except Exception as e:
+        # Propagate so the orchestrator marks the stage failed and the
+        # result cache never stores an empty result
         current_app.logger.error(f"Error analyzing entities: {e}")
-        return {}  # Return empty dict on error
+        raise
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(min=2, max=10))
-def generate_summary(text):
-    """Summarize via Vertex AI model loaded in Config."""
+def generate_summary(text, context=None):
+    """Summarize via the chunked map-reduce engine over the Vertex model."""
     try:
-        response = Config.VERTEX_MODEL.predict(
-            text,
-            max_output_tokens=150,
-            temperature=0.2
-        )
-        return response.text
+        # Chunks follow the stored sentence boundaries when there are any
+        segment_index = context.segment_index if context is not None else None
+        sentences = None
+        if segment_index is not None:
+            sentences = [text[start:end] for start, end in segment_index.sentence_spans()]
+        return get_summarization_engine().summarize(text, sentences=sentences)
     except Exception as e:
+        # Re-raise so the orchestrator marks the stage and nothing is cached
         current_app.logger.error(f"Vertex summarization error: {e}")
-        return "Summary unavailable – API error"
-
-def identify_legal_risks(text):
-    risks = []
-    doc = _nlp(text.lower())
+        raise
 
-    if not any("governing law" in s.text for s in doc.sents):
-        risks.append("Missing Governing Law clause")
+def assess_legal_risks(text, context=None):
+    """
+    Evaluate the risk rules in one pass over the text. Returns the risk
+    messages, the findings (with their clause and pages when the document
+    has a segment index) and the fingerprints of the rules that ran.
+    """
+    with span("risk_detection"):
+        rule_set = get_rule_set()
+        segment_index = context.segment_index if context is not None else None
+        findings = rule_set.evaluate(text, segment_index)
+    # Documents stored under older rules are brought up to date
+    schedule_backfill(current_app._get_current_object())
+    return {
+        "messages": rule_set.messages(findings),
+        "findings": findings,
+        "rules": rule_set.fingerprints(),
+        "ruleset": rule_set.version
+    }
 
-    risks += [f"Ambiguous term: {term}" for term in AMBIGUOUS_TERMS if term in text]
-
-    for cat, kws in RISK_KEYWORDS.items():
-        if any(kw in text.lower() for kw in kws):
-            risks.append(f"Potential risk in {cat} clause")
-    return risks
+def identify_legal_risks(text, context=None):
+    return assess_legal_risks(text, context)["messages"]
 
 def extract_clauses_from_document(file_path):
     """Extract contract clauses using Document AI via gcp.gcp_client."""
     try:
-        return extract_clauses(file_path)
+        return get_call_governor().call(
+            "documentai",
+            lambda timeout: extract_clauses(file_path, timeout=timeout)
+        )
+    except GovernorError:
+        # Refused (circuit open / out of time): let the stage be marked degraded
+        raise
     except Exception as e:
         current_app.logger.error(f"Clause extraction error: {e}")
         return []
\ No newline at end of file
@@ -0,0 +1,136 @@
+from flask import current_app
+import json
+from app.config import documents_collection
+from app.services.blob_store import get_blob_store
+from app.services.entity_model import from_legacy
+from app.services.normalization import OffsetMap
+from app.services.segmentation import SEGMENTATION_VERSION, SegmentIndex
+
+# Document records keep metadata only. Extracted text lives in the blob store
+# and is referenced as
+#   "text_blob": {"key": <sha256 of the UTF-8 text>, "size": <bytes>, "chars": <len>}
+# Entity records (see entity_model) are stored as "entity_index"; documents
+# from before that keep a {type: [name, ...]} "entities" field.
+# Analysis payloads above BLOB_INLINE_LIMIT bytes of JSON are replaced by
+#   {"_blob": {"key": ..., "size": ...}}
+# Documents written before the blob store keep an inline "text" field, which
+# every reader below still understands.
+# The text is normalized; the raw extracted text is kept as "raw_text_blob"
+# and the positions between the two as
+#   "offset_map": {"key": ..., "size": ..., "segments": <count>}
+# (see normalization.OffsetMap). Older documents have neither.
+# Sentences, numbered clauses and pages of the normalized text are kept as
+#   "segment_index": {"key": ..., "size": ..., "version": ..., "sentences": n, "clauses": n}
+# (see segmentation.SegmentIndex).
+TEXT_FIELDS = {"text_blob": 1, "text": 1}
+RAW_TEXT_FIELDS = {"raw_text_blob": 1}
+PAYLOAD_MARKER = "_blob"
+
+
+def store_text(text):
+    """Write text to the blob store; returns the reference kept on the document"""
+    key, size = get_blob_store().put(text.encode('utf-8'))
+    return {"key": key, "size": size, "chars": len(text)}
+
+
+def load_text(document):
+    ref = document.get('text_blob')
+    if ref:
+        return get_blob_store().get(ref['key']).decode('utf-8')
+    return document.get('text', '')
+
+
+def text_size(document, field='text_blob'):
+    """Size in bytes of the document's UTF-8 text (field='raw_text_blob' for the raw text)"""
+    ref = document.get(field)
+    if ref:
+        return ref['size']
+    return len(document.get('text', '').encode('utf-8'))
+
+
+def iter_text_bytes(document, start=0, stop=None, field='text_blob'):
+    """Yield the UTF-8 bytes of the text in [start, stop) without loading all of it"""
+    ref = document.get(field)
+    if ref:
+        yield from get_blob_store().iter_range(ref['key'], start, stop)
+    else:
+        yield document.get('text', '').encode('utf-8')[start:stop]
+
+
+def store_offset_map(offset_map):
+    key, size = get_blob_store().put(offset_map.to_bytes())
+    return {"key": key, "size": size, "segments": len(offset_map)}
+
+
+def load_offset_map(document):
+    """OffsetMap from the normalized text to the raw text, None for older documents"""
+    ref = document.get('offset_map')
+    if not ref:
+        return None
+    return OffsetMap.from_bytes(get_blob_store().get(ref['key']))
+
+
+def store_segment_index(segment_index):
+    key, size = get_blob_store().put(segment_index.to_bytes())
+    return {
+        "key": key,
+        "size": size,
+        "version": SEGMENTATION_VERSION,
+        "sentences": segment_index.sentence_count,
+        "clauses": segment_index.clause_count
+    }
+
+
+def load_segment_index(document):
+    """SegmentIndex of the document, None when missing or built by an older version"""
+    ref = document.get('segment_index')
+    if not ref or ref.get('version') != SEGMENTATION_VERSION:
+        return None
+    return SegmentIndex.from_bytes(get_blob_store().get(ref['key']))
+
+
+def pack_payload(value):
+    """Inline value, or a blob reference when its JSON is over BLOB_INLINE_LIMIT"""
+    encoded = json.dumps(value, separators=(',', ':')).encode('utf-8')
+    if len(encoded) <= current_app.config.get('BLOB_INLINE_LIMIT', 64 * 1024):
+        return value
+    key, size = get_blob_store().put(encoded)
+    return {PAYLOAD_MARKER: {"key": key, "size": size}}
+
+
+def unpack_payload(value):
+    if isinstance(value, dict) and PAYLOAD_MARKER in value:
+        return json.loads(get_blob_store().get(value[PAYLOAD_MARKER]['key']))
+    return value
+
+
+def document_entities(document):
+    """Entity records of a stored document, converting the legacy shape"""
+    if 'entity_index' in document:
+        return unpack_payload(document['entity_index'])
+    return from_legacy(unpack_payload(document.get('entities', {})))
+
+
+def _blob_keys(document):
+    keys = []
+    for field in ('text_blob', 'raw_text_blob', 'offset_map', 'segment_index'):
+        if document.get(field):
+            keys.append((f"{field}.key", document[field]['key']))
+    for field in ('entity_index', 'entities', 'risks', 'risk_findings'):
+        value = document.get(field)
+        if isinstance(value, dict) and PAYLOAD_MARKER in value:
+            keys.append((f"{field}.{PAYLOAD_MARKER}.key", value[PAYLOAD_MARKER]['key']))
+    return keys
+
+
+def release_blobs(document):
+    """
+    Delete the blobs of a removed document that no other document references.
+    Blobs are shared between documents with identical content.
+    """
+    for field, key in _blob_keys(document):
+        if documents_collection.count_documents({field: key}, limit=1) == 0:
+            try:
+                get_blob_store().delete(key)
+            except Exception as e:
+                current_app.logger.warning(f"Failed to delete blob {key}: {e}")
@@ -0,0 +1,228 @@
+from flask import current_app
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import threading
+from app.config import Config
+from app.services.call_governor import get_call_governor, submit_with_context
+from app.services.entity_model import EntityAggregator, canonical_key
+from gcp.clients import registry as gcp_clients
+
+# Types produced by the named-entity backends; CLAUSES come from the keyword
+# engine and are added by extract_legal_entities
+NAMED_ENTITY_TYPES = ("ORGANIZATION", "PERSON", "DATE", "LAW")
+
+# spaCy (OntoNotes) labels -> entity types
+SPACY_LABELS = {"ORG": "ORGANIZATION", "PERSON": "PERSON", "DATE": "DATE", "LAW": "LAW"}
+
+# The NER pipeline only needs tokenization and the entity recognizer
+NER_PIPELINE_EXCLUDE = ["parser", "tagger", "attribute_ruler", "lemmatizer", "senter"]
+NER_PIPELINE_MAX_LENGTH = 5_000_000
+
+# remote        - Natural Language API only
+# local         - spaCy NER only: no API calls and no per-call cost
+# local-first   - spaCy, the API when spaCy fails (e.g. model not installed)
+# remote-first  - the API, spaCy when the API fails or the governor sheds it
+ROUTING_MODES = ("remote", "local", "local-first", "remote-first")
+
+
+class EntityBackend:
+    """Named entities of several texts, as entity records with offsets into each text"""
+
+    name = None
+
+    @property
+    def version(self):
+        # Part of the entities stage version, so cached results follow the backend
+        return self.name
+
+    def analyze(self, texts):
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Load models now instead of on the first call"""
+
+
+def _in_app_context(app, func, *args):
+    with app.app_context():
+        return func(*args)
+
+
+class LanguageApiBackend(EntityBackend):
+    """Google Cloud Natural Language analyze_entities, one call per text"""
+
+    name = "language_v1"
+
+    def __init__(self, max_parallel=4):
+        self.max_parallel = max_parallel
+
+    def _analyze(self, text):
+        # The client library's types, or the stub transport's stand-ins
+        language_v1 = gcp_clients.language_types()
+
+        document = language_v1.Document(
+            content=text,
+            type_=language_v1.Document.Type.PLAIN_TEXT,
+            language="en"
+        )
+        # UTF32 offsets are code points, i.e. Python string indices
+        response = get_call_governor().call(
+            "language",
+            lambda timeout: Config.NLP_CLIENT.analyze_entities(
+                document=document,
+                encoding_type=language_v1.EncodingType.UTF32,
+                timeout=timeout
+            ),
+            key=hashlib.sha256(text.encode('utf-8')).hexdigest()
+        )
+
+        entities = EntityAggregator()
+        for ent in response.entities:
+            ent_type = language_v1.Entity.Type(ent.type_).name
+            if ent_type in NAMED_ENTITY_TYPES:
+                spans = [
+                    (m.text.begin_offset, m.text.begin_offset + len(m.text.content))
+                    for m in ent.mentions if m.text.begin_offset >= 0
+                ]
+                entities.add(ent_type, ent.name, spans, salience=ent.salience, count=len(ent.mentions) or 1)
+        return entities.records()
+
+    def analyze(self, texts):
+        if len(texts) <= 1:
+            return [self._analyze(text) for text in texts]
+        # Calls overlap; the call governor still caps them per API
+        app = current_app._get_current_object()
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel, len(texts))) as pool:
+            futures = [submit_with_context(pool, _in_app_context, app, self._analyze, text) for text in texts]
+            return [future.result() for future in futures]
+
+
+def load_ner_pipeline(model="en_core_web_sm"):
+    import spacy
+    nlp = spacy.load(model, exclude=NER_PIPELINE_EXCLUDE)
+    nlp.max_length = NER_PIPELINE_MAX_LENGTH
+    return nlp
+
+
+class SpacyEntityBackend(EntityBackend):
+    """Local spaCy NER over batches of texts (nlp.pipe, optionally multi-process)"""
+
+    def __init__(self, model="en_core_web_sm", batch_size=8, processes=1):
+        self.model = model
+        self.batch_size = batch_size
+        self.processes = processes
+        self._nlp = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        return f"spacy-{self.model}"
+
+    @property
+    def version(self):
+        # The installed package version, without loading the model
+        try:
+            from spacy.util import get_package_version
+            installed = get_package_version(self.model)
+        except ImportError:
+            installed = None
+        return f"{self.name}-{installed or 'unknown'}"
+
+    def pipeline(self):
+        if self._nlp is None:
+            with self._lock:
+                if self._nlp is None:
+                    self._nlp = load_ner_pipeline(self.model)
+        return self._nlp
+
+    def warm_up(self):
+        self.pipeline()
+
+    def analyze(self, texts):
+        docs = self.pipeline().pipe(texts, batch_size=self.batch_size, n_process=self.processes)
+        return [self.records(doc) for doc in docs]
+
+    @staticmethod
+    def records(doc):
+        mentions = [(SPACY_LABELS[ent.label_], ent.text, ent.start_char, ent.end_char)
+                    for ent in doc.ents if ent.label_ in SPACY_LABELS]
+        # spaCy reports no salience: an entity's share of the mentions stands in
+        shares = Counter((entity_type, canonical_key(name)) for entity_type, name, _, _ in mentions)
+        entities = EntityAggregator()
+        for entity_type, name, start, end in mentions:
+            salience = shares[(entity_type, canonical_key(name))] / len(mentions)
+            entities.add(entity_type, name, [(start, end)], salience=salience, count=1)
+        return entities.records()
+
+
+class RoutingEntityBackend(EntityBackend):
+    """A primary backend with an optional fallback for when it fails"""
+
+    def __init__(self, mode, primary, fallback=None):
+        self.mode = mode
+        self.primary = primary
+        self.fallback = fallback
+
+    @property
+    def name(self):
+        return self.mode
+
+    @property
+    def version(self):
+        if self.fallback is None:
+            return self.primary.version
+        return f"{self.mode}:{self.primary.version}+{self.fallback.version}"
+
+    def warm_up(self):
+        for backend in (self.primary, self.fallback):
+            if isinstance(backend, SpacyEntityBackend):
+                backend.warm_up()
+
+    def route(self, texts):
+        """(records per text, backend that produced them)"""
+        try:
+            return self.primary.analyze(texts), self.primary
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            current_app.logger.warning(
+                f"Entity backend {self.primary.name} failed ({e}); using {self.fallback.name}"
+            )
+            return self.fallback.analyze(texts), self.fallback
+
+    def analyze(self, texts):
+        return self.route(texts)[0]
+
+
+def build_entity_backend(mode, model="en_core_web_sm", batch_size=8, processes=1, max_parallel=4):
+    if mode not in ROUTING_MODES:
+        raise ValueError(f"Unknown entity backend mode: {mode}")
+    remote = LanguageApiBackend(max_parallel)
+    local = SpacyEntityBackend(model, batch_size, processes)
+    if mode == "remote":
+        return RoutingEntityBackend(mode, remote)
+    if mode == "local":
+        return RoutingEntityBackend(mode, local)
+    if mode == "local-first":
+        return RoutingEntityBackend(mode, local, remote)
+    return RoutingEntityBackend(mode, remote, local)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_entity_backend():
+    """The process-wide backend selected by ENTITY_BACKEND"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            config = current_app.config
+            _backend = build_entity_backend(
+                config.get('ENTITY_BACKEND', 'remote'),
+                model=config.get('LOCAL_NER_MODEL', 'en_core_web_sm'),
+                batch_size=config.get('LOCAL_NER_BATCH_SIZE', 8),
+                processes=config.get('LOCAL_NER_PROCESSES', 1),
+                max_parallel=config.get('ENTITY_MAX_PARALLEL', 4)
+            )
+        return _backend
@@ -0,0 +1,106 @@
+from bisect import bisect_right
+from collections import Counter
+import re
+
+# Entities are stored once per canonical (type, name) instead of once per
+# mention:
+#   {"type": "ORGANIZATION", "name": "Acme Corp", "key": "acme corp",
+#    "count": 12, "salience": 0.31, "offsets": [s0, e0, s1, e1, ...], "pages": [1, 4]}
+# "name" is the most frequent surface form, "count" the number of mentions,
+# "salience" the highest salience reported, and "offsets" a flat list of
+# character spans in the stored text, capped at MAX_OFFSETS spans.
+ENTITY_TYPES = ("ORGANIZATION", "PERSON", "DATE", "LAW", "CLAUSES")
+MAX_OFFSETS = 100
+
+# Bumped when the stored shape changes so cached stage results expire
+ENTITY_MODEL_VERSION = "2"
+
+_EDGE_PUNCTUATION = " \t\n.,;:\"'()[]"
+_LEADING_ARTICLE = re.compile(r"^the\s+", re.IGNORECASE)
+
+
+def canonical_key(name):
+    """Case, whitespace, edge punctuation and a leading "the" do not make a new entity"""
+    name = " ".join(str(name).split()).strip(_EDGE_PUNCTUATION)
+    return _LEADING_ARTICLE.sub("", name).lower()
+
+
+class EntityAggregator:
+    """Accumulates mentions into one record per canonical entity"""
+
+    def __init__(self):
+        self._entries = {}
+
+    def add(self, entity_type, name, spans=(), salience=0.0, count=None):
+        key = canonical_key(name)
+        if not key:
+            return
+        entry = self._entries.setdefault((entity_type, key), {
+            "forms": Counter(), "count": 0, "salience": 0.0, "spans": []
+        })
+        entry["forms"][" ".join(str(name).split())] += 1
+        entry["count"] += count if count is not None else max(len(spans), 1)
+        entry["salience"] = max(entry["salience"], salience or 0.0)
+        entry["spans"].extend(spans)
+
+    def merge(self, records, shift=0):
+        """Fold stored records in, moving their offsets by shift characters"""
+        for record in records:
+            offsets = record.get("offsets", [])
+            spans = [(offsets[i] + shift, offsets[i + 1] + shift) for i in range(0, len(offsets) - 1, 2)]
+            self.add(record["type"], record["name"], spans,
+                     salience=record.get("salience", 0.0), count=record.get("count", 1))
+
+    def records(self):
+        """Records ordered by type, then salience and mention count"""
+        records = []
+        for (entity_type, key), entry in self._entries.items():
+            spans = sorted(set(entry["spans"]))[:MAX_OFFSETS]
+            records.append({
+                "type": entity_type,
+                # Most frequent form; ties go to the longest
+                "name": max(entry["forms"].items(), key=lambda item: (item[1], len(item[0])))[0],
+                "key": key,
+                "count": entry["count"],
+                "salience": round(entry["salience"], 4),
+                "offsets": [offset for span in spans for offset in span]
+            })
+        return sort_records(records)
+
+
+def sort_records(records):
+    order = {entity_type: i for i, entity_type in enumerate(ENTITY_TYPES)}
+    return sorted(records, key=lambda r: (order.get(r["type"], len(order)), -r["salience"], -r["count"], r["key"]))
+
+
+def with_pages(records, page_offsets):
+    """Add the pages each entity is mentioned on, from the document's page offsets"""
+    if not page_offsets:
+        return records
+    for record in records:
+        starts = record.get("offsets", [])[::2]
+        record["pages"] = sorted({bisect_right(page_offsets, start) for start in starts})
+    return records
+
+
+def from_legacy(entities):
+    """Records from the old {type: [name, ...]} shape (one list item per mention)"""
+    aggregator = EntityAggregator()
+    for entity_type, names in (entities or {}).items():
+        for name in names:
+            aggregator.add(entity_type, name)
+    return aggregator.records()
+
+
+def entity_names(records):
+    """{type: [name, ...]} with each entity once, most salient first"""
+    names = {}
+    for record in records:
+        names.setdefault(record["type"], []).append(record["name"])
+    return names
+
+
+def top_entities(records, types=None, limit=None):
+    selected = [r for r in records if not types or r["type"] in types]
+    selected.sort(key=lambda r: (-r["salience"], -r["count"], r["key"]))
+    return selected[:limit] if limit else selected
@@ -0,0 +1,453 @@
+from flask import current_app
+from bson import ObjectId
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait
+import threading
+import time
+from pymongo import ReturnDocument
+from app.config import documents_collection
+from app.services.call_governor import reset_deadline, set_deadline
+from app.services.error_handlers import DocumentProcessingError
+from app.services.metrics import BYTES_PROCESSED, DOCUMENTS_PROCESSED, current_request_id, reset_request_id, set_request_id, span
+from app.services.document_processing import extract_document, normalize_document, segment_text
+from app.services.analysis_orchestrator import run_document_analysis
+from app.services.result_cache import get_analysis_cache
+from app.services.search_index import index_document
+from app.services.versioning import DELTA_FIELDS, compute_delta, previous_version
+from app.services.document_store import (
+    TEXT_FIELDS,
+    load_segment_index,
+    load_text,
+    pack_payload,
+    store_offset_map,
+    store_segment_index,
+    store_text
+)
+from app.services.entity_model import with_pages
+
+# Lifecycle of an uploaded document:
+#   queued -> extracting -> analyzing -> processed | failed
+# A document left in an active status by a process that went away is
+# requeued by recover_stalled_jobs
+JOB_STATUSES = ("queued", "extracting", "analyzing", "processed", "failed")
+ACTIVE_STATUSES = ("queued", "extracting", "analyzing")
+
+
+class LocalJobBackend:
+    """In-process backend running jobs on a thread pool (no external broker)"""
+
+    def __init__(self, max_workers=4, eager=False):
+        self.eager = eager
+        self._executor = None if eager else ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="ingestion"
+        )
+        self._pending = set()
+        # Jobs a batch feeder has taken on but not submitted yet
+        self._reserved = 0
+        self._changed = threading.Condition()
+
+    def reserve(self, count):
+        """Announce count jobs that will be submitted later with reserved=True"""
+        with self._changed:
+            self._reserved += count
+
+    def unreserve(self, count):
+        with self._changed:
+            self._reserved -= count
+            self._changed.notify_all()
+
+    def submit(self, func, *args, reserved=False):
+        # Eager mode runs the job inline, which keeps tests deterministic
+        if self.eager:
+            func(*args)
+            return None
+        future = self._executor.submit(func, *args)
+        # Pending before the reservation is dropped, so drain always sees the job
+        with self._changed:
+            self._pending.add(future)
+            if reserved:
+                self._reserved -= 1
+            self._changed.notify_all()
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._changed:
+            self._pending.discard(future)
+            self._changed.notify_all()
+
+    def drain(self, timeout=None):
+        """
+        Wait up to timeout seconds for queued and running jobs, including
+        those batch feeders still hold; returns how many are left
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._changed:
+                pending = set(self._pending)
+                reserved = self._reserved
+                if not pending and not reserved:
+                    return 0
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return len(pending) + reserved
+                if not pending:
+                    # A feeder is about to submit its next job
+                    self._changed.wait(remaining)
+                    continue
+            wait(pending, timeout=remaining)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+
+class IngestionQueue:
+    """Schedules document processing jobs on a backend inside an app context"""
+
+    def __init__(self, app, backend):
+        self.app = app
+        self.backend = backend
+
+    def enqueue(self, doc_id, file_path):
+        return self.backend.submit(self._run, str(doc_id), file_path, current_request_id())
+
+    def enqueue_many(self, jobs, max_in_flight):
+        """
+        Schedule (doc_id, file_path) pairs with at most max_in_flight of them
+        queued or running at once, so one large batch cannot monopolise the
+        workers ahead of single uploads.
+        """
+        jobs = [(str(doc_id), file_path) for doc_id, file_path in jobs]
+        request_id = current_request_id()
+        if self.backend.eager:
+            for doc_id, file_path in jobs:
+                self.backend.submit(self._run, doc_id, file_path, request_id)
+            return None
+
+        slots = threading.Semaphore(max_in_flight)
+        # The whole batch counts as pending for drain until it is submitted
+        self.backend.reserve(len(jobs))
+
+        def feed():
+            submitted = 0
+            try:
+                for doc_id, file_path in jobs:
+                    slots.acquire()
+                    future = self.backend.submit(self._run, doc_id, file_path, request_id, reserved=True)
+                    submitted += 1
+                    future.add_done_callback(lambda _: slots.release())
+            finally:
+                # Executor shut down: the rest stays queued for recover_stalled_jobs
+                self.backend.unreserve(len(jobs) - submitted)
+
+        feeder = threading.Thread(target=feed, name="batch-feeder", daemon=True)
+        feeder.start()
+        return feeder
+
+    def _run(self, doc_id, file_path, request_id="-"):
+        with self.app.app_context():
+            # Upstream calls of one job give up once JOB_DEADLINE has passed;
+            # its log lines carry the id of the request that queued it
+            token = set_deadline(self.app.config.get('JOB_DEADLINE', 300))
+            id_token = set_request_id(request_id)
+            try:
+                process_document(doc_id, file_path)
+            finally:
+                reset_request_id(id_token)
+                reset_deadline(token)
+
+    def drain(self, timeout=None):
+        """
+        Let accepted jobs finish before the process exits (graceful worker
+        shutdown). Jobs still unfinished after timeout stay in their current
+        status and are logged.
+        """
+        left = self.backend.drain(timeout)
+        if left:
+            self.app.logger.warning(f"Stopping with {left} ingestion job(s) unfinished")
+        return left
+
+    def shutdown(self, wait=True):
+        self.backend.shutdown(wait=wait)
+
+
+def init_job_queue(app):
+    """Create the ingestion queue configured for this app"""
+    backend_name = app.config.get('JOB_BACKEND', 'local')
+    if backend_name not in ('local', 'eager'):
+        raise ValueError(f"Unknown JOB_BACKEND: {backend_name}")
+
+    backend = LocalJobBackend(
+        max_workers=app.config.get('JOB_WORKERS', 4),
+        eager=backend_name == 'eager'
+    )
+    queue = IngestionQueue(app, backend)
+    app.extensions['ingestion_queue'] = queue
+    return queue
+
+
+def get_job_queue():
+    return current_app.extensions['ingestion_queue']
+
+
+def recover_stalled_jobs(queue, stale_after, max_recoveries=3):
+    """
+    Requeue documents left in an active status by a process that crashed,
+    restarted or stopped before its jobs drained: those whose job has not
+    been updated for stale_after seconds. The compare-and-set on the job's
+    update time is the claim, so sweeps in several workers requeue a
+    document once. Returns (requeued, failed).
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    stalled = documents_collection.find(
+        {"status": {"$in": list(ACTIVE_STATUSES)}, "job.updated_at": {"$lt": cutoff}},
+        {"file_path": 1, "status": 1, "job.updated_at": 1, "job.recoveries": 1}
+    )
+    requeued = failed = 0
+    for document in stalled:
+        job = document.get('job', {})
+        recoveries = job.get('recoveries', 0) + 1
+        now = datetime.utcnow()
+        if recoveries > max_recoveries:
+            # Probably the document itself brings the process down
+            update = {
+                "status": "failed",
+                "job.stage": "failed",
+                "job.progress": 1.0,
+                "job.failed_at": now,
+                "job.error": f"Abandoned after {max_recoveries} interrupted attempts"
+            }
+        else:
+            update = {
+                "status": "queued",
+                "job.stage": "queued",
+                "job.progress": 0.0,
+                "job.requeued_at": now,
+                "job.recoveries": recoveries
+            }
+        update["job.updated_at"] = now
+        result = documents_collection.update_one(
+            {"_id": document['_id'], "status": document['status'], "job.updated_at": job.get('updated_at')},
+            {"$set": update}
+        )
+        if not result.matched_count:
+            # Another sweep claimed it, or its job moved on meanwhile
+            continue
+        if recoveries > max_recoveries:
+            failed += 1
+            DOCUMENTS_PROCESSED.inc(status="failed")
+        else:
+            queue.enqueue(document['_id'], document['file_path'])
+            requeued += 1
+    return requeued, failed
+
+
+def _run_recovery(app):
+    with app.app_context():
+        try:
+            requeued, failed = recover_stalled_jobs(
+                app.extensions['ingestion_queue'],
+                app.config.get('JOB_STALE_AFTER', 900),
+                app.config.get('JOB_MAX_RECOVERIES', 3)
+            )
+            if requeued or failed:
+                app.logger.info(f"Recovered stalled ingestion jobs: {requeued} requeued, {failed} failed")
+        except Exception as e:
+            app.logger.error(f"Ingestion job recovery failed: {e}")
+
+
+def schedule_recovery(app):
+    """
+    Sweep for stalled jobs in a background thread when a server process
+    starts (JOB_RECOVERY=auto). Not run by create_app itself, so CLI
+    commands never pick up jobs they would not live to finish.
+    """
+    queue = app.extensions['ingestion_queue']
+    if app.config.get('JOB_RECOVERY', 'auto') != 'auto' or queue.backend.eager:
+        return False
+    threading.Thread(target=_run_recovery, args=(app,), name="job-recovery", daemon=True).start()
+    return True
+
+
+def new_job_state():
+    """Initial job sub-document stored alongside a queued document"""
+    now = datetime.utcnow()
+    return {
+        "stage": "queued",
+        "progress": 0.0,
+        "queued_at": now,
+        "updated_at": now,
+        "error": None
+    }
+
+
+def _update_stage(doc_id, status, progress, **fields):
+    now = datetime.utcnow()
+    update = {
+        "status": status,
+        "job.stage": status,
+        "job.progress": progress,
+        "job.updated_at": now,
+        f"job.{status}_at": now
+    }
+    update.update(fields)
+    with span("mongo_write"):
+        documents_collection.update_one({"_id": ObjectId(doc_id)}, {"$set": update})
+
+
+def _report_progress(doc_id, progress):
+    documents_collection.update_one(
+        {"_id": ObjectId(doc_id)},
+        {"$set": {"job.progress": progress, "job.updated_at": datetime.utcnow()}}
+    )
+
+
+def _claim(doc_id):
+    # Atomically move queued -> extracting so a document is never processed twice
+    now = datetime.utcnow()
+    return documents_collection.find_one_and_update(
+        {"_id": ObjectId(doc_id), "status": "queued"},
+        {"$set": {
+            "status": "extracting",
+            "job.stage": "extracting",
+            "job.progress": 0.05,
+            "job.updated_at": now,
+            "job.extracting_at": now
+        }},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _reuse_text(content_hash, normalization):
+    # An identical upload was processed before with the same normalization:
+    # reuse its extracted text and offset map
+    if not content_hash:
+        return None
+    text_hash = get_analysis_cache().text_hash_for(content_hash)
+    if not text_hash:
+        return None
+    return documents_collection.find_one(
+        {"text_hash": text_hash, "status": "processed", "normalization": normalization},
+        dict(TEXT_FIELDS, page_offsets=1, raw_text_blob=1, offset_map=1, segment_index=1)
+    )
+
+
+def _record_version_delta(document, text, analysis):
+    # New revisions of a contract store what changed since the previous one
+    previous = previous_version(document, DELTA_FIELDS)
+    if previous is None:
+        return
+    delta = compute_delta(previous, load_text(previous), document, text, analysis)
+    documents_collection.update_one(
+        {"_id": document['_id']},
+        {"$set": {"previous_id": previous['_id'], "version_delta": delta}}
+    )
+
+
+def process_document(doc_id, file_path):
+    """Drive a queued document through extraction and analysis"""
+    document = _claim(doc_id)
+    if document is None:
+        current_app.logger.warning(f"Job {doc_id} is not queued; skipping")
+        return
+
+    try:
+        content_hash = document.get('content_hash')
+        profile = current_app.config.get('NORMALIZATION_PROFILE', 'legal')
+        keep = current_app.config.get('NORMALIZATION_KEEP', '')
+        normalization = f"{profile}+{keep}" if keep else profile
+        previous = _reuse_text(content_hash, normalization)
+
+        if previous is not None and (previous.get('text_blob') or previous.get('text')):
+            text = load_text(previous)
+            page_offsets = previous.get('page_offsets', [0])
+            source = {k: previous[k] for k in ('raw_text_blob', 'offset_map') if previous.get(k)}
+            segment_index = load_segment_index(previous)
+            if segment_index is not None:
+                source["segment_index"] = previous["segment_index"]
+        else:
+            # Pages are normalized one by one so page offsets stay valid
+            # in the normalized text
+            extracted = extract_document(file_path)
+            if extracted is None or not extracted.text.strip():
+                raise DocumentProcessingError("Text extraction failed", 500)
+
+            with span("preprocess"):
+                normalized, offset_map = normalize_document(extracted, profile)
+            text = normalized.text
+            page_offsets = normalized.page_offsets
+            # The raw text and the offset map let entity spans be shown in
+            # the original text without normalizing it again
+            with span("blob_write"):
+                source = {
+                    "raw_text_blob": store_text(extracted.text),
+                    "offset_map": store_offset_map(offset_map)
+                }
+            segment_index = None
+
+        # Sentences, clauses and pages are found once here; the analysis
+        # stages and the clause API read the stored index
+        if segment_index is None:
+            segment_index = segment_text(text, page_offsets)
+            with span("blob_write"):
+                source["segment_index"] = store_segment_index(segment_index)
+
+        # The text goes to the blob store; the record only keeps a reference
+        with span("blob_write"):
+            text_blob = store_text(text)
+        BYTES_PROCESSED.inc(text_blob["size"], kind="text")
+        _update_stage(doc_id, "analyzing", 0.3, text_blob=text_blob, page_offsets=page_offsets,
+                      normalization=normalization, **source)
+
+        # Entities, summary and risks run concurrently; each finished
+        # stage advances the progress towards 0.9
+        progress = {"done": 0}
+
+        def stage_complete(stage_name):
+            progress["done"] += 1
+            _report_progress(doc_id, round(0.3 + 0.2 * progress["done"], 2))
+
+        analysis = run_document_analysis(
+            text,
+            content_hash=content_hash,
+            on_stage_complete=stage_complete,
+            segment_index=segment_index
+        )
+
+        # Rule fingerprints let a later rule change re-evaluate only the
+        # rules that changed (see risk_rules.backfill_risk_rules)
+        assessment = analysis["risks"]
+        risks = assessment["messages"]
+        _update_stage(
+            doc_id, "processed", 1.0,
+            text_hash=analysis["text_hash"],
+            entity_index=pack_payload(with_pages(analysis["entities"], page_offsets)),
+            summary=analysis["summary"],
+            risks=pack_payload(risks),
+            risk_findings=pack_payload(assessment["findings"]),
+            risk_rules=assessment["rules"],
+            risk_ruleset=assessment["ruleset"],
+            analysis_versions=analysis["versions"],
+            analysis_errors=analysis["errors"],
+            analysis_degraded=analysis["degraded"]
+        )
+        DOCUMENTS_PROCESSED.inc(status="degraded" if analysis["degraded"] else "processed")
+
+        try:
+            _record_version_delta(document, text, dict(analysis, risks=risks))
+        except Exception as e:
+            current_app.logger.warning(f"Version delta of {doc_id} failed: {e}")
+
+        # A stale search index is recoverable (flask search-reindex), so an
+        # indexing failure does not fail the document
+        try:
+            index_document(document, text, analysis["entities"], risks)
+        except Exception as e:
+            current_app.logger.warning(f"Search indexing of {doc_id} failed: {e}")
+    except Exception as e:
+        message = e.message if isinstance(e, DocumentProcessingError) else str(e)
+        current_app.logger.error(f"Ingestion job {doc_id} failed: {message}")
+        _update_stage(doc_id, "failed", 1.0, **{"job.error": message})
+        DOCUMENTS_PROCESSED.inc(status="failed")
@@ -1,5 +1,6 @@
 import logging
 from logging.handlers import RotatingFileHandler
+from app.services.metrics import RequestIdFilter
 
 def configure_logging(app):
     handler = RotatingFileHandler(
@@ -8,8 +9,10 @@ def configure_logging(app):
         backupCount=10
     )
     formatter = logging.Formatter(
-        '%(asctime)s %(levelname)s [%(filename)s:%(lineno)d] %(message)s'
+        '%(asctime)s %(levelname)s [%(request_id)s] [%(filename)s:%(lineno)d] %(message)s'
     )
     handler.setFormatter(formatter)
+    # Request id of the HTTP request (or of the request that queued the job)
+    handler.addFilter(RequestIdFilter())
     app.logger.addHandler(handler)
     app.logger.setLevel(logging.INFO)
\ No newline at end of file
@@ -0,0 +1,289 @@
+from flask import current_app, g, request
+from collections import Counter
+from contextlib import contextmanager
+import contextvars
+import logging
+import sys
+import threading
+import time
+import traceback
+import uuid
+
+# In-process metrics rendered in the Prometheus text format on /metrics.
+# Values are per process; with several workers, scrape each of them or
+# aggregate with sum() in the queries.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_request_id = contextvars.ContextVar("request_id", default="-")
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class CounterMetric:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class HistogramMetric:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {round(series['sum'], 6)}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text):
+        with self._lock:
+            return self._metrics.setdefault(name, CounterMetric(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        with self._lock:
+            return self._metrics.setdefault(name, HistogramMetric(name, help_text, buckets))
+
+    def add_collector(self, collector):
+        """collector() returns extra exposition lines at scrape time"""
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"Metrics collector failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+SPAN_SECONDS = registry.histogram(
+    "legalmate_span_seconds", "Time spent in instrumented processing steps")
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "legalmate_http_request_seconds", "HTTP request latency by endpoint")
+HTTP_REQUESTS = registry.counter(
+    "legalmate_http_requests_total", "HTTP requests by endpoint, method and status")
+DOCUMENTS_PROCESSED = registry.counter(
+    "legalmate_documents_processed_total", "Ingestion jobs finished, by outcome")
+BYTES_PROCESSED = registry.counter(
+    "legalmate_bytes_processed_total", "Bytes handled, by kind (upload, text)")
+ANALYSIS_CACHE = registry.counter(
+    "legalmate_analysis_cache_total", "Analysis stage results served from the cache (hit) or computed (miss)")
+
+
+@contextmanager
+def span(name, **labels):
+    """Time the block into legalmate_span_seconds{span=name}"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPAN_SECONDS.observe(time.perf_counter() - started, span=name, **labels)
+
+
+# --------------------------------------------------
+# Request ids
+# --------------------------------------------------
+def current_request_id():
+    return _request_id.get()
+
+
+def set_request_id(value):
+    """Set the id carried by log records from this context; returns a reset token"""
+    return _request_id.set(value)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds %(request_id)s to every record (propagated to worker threads via contextvars)"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+# --------------------------------------------------
+# Slow-request profiler
+# --------------------------------------------------
+class SlowRequestProfiler:
+    """
+    Samples thread stacks while a request is running for longer than
+    `threshold` seconds and logs the hottest stacks when it finishes.
+
+    Analysis stages run on pool threads, so every busy thread of the process
+    is sampled during the slow window, not only the request's own thread.
+    """
+
+    def __init__(self, threshold, interval=0.01, top=5, depth=12):
+        self.threshold = threshold
+        self.interval = interval
+        self.top = top
+        self.depth = depth
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Begin watching a request; returns the key to pass to finish()"""
+        key = object()
+        with self._lock:
+            self._active[key] = {"started": time.monotonic(), "samples": Counter()}
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._sample_loop, name="slow-profiler", daemon=True)
+                self._thread.start()
+        return key
+
+    def finish(self, key):
+        """Hot stacks [(stack, samples)] of a slow request, or None"""
+        with self._lock:
+            state = self._active.pop(key, None)
+        if state is None or not state["samples"]:
+            return None
+        return state["samples"].most_common(self.top)
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                slow = [state for state in self._active.values() if now - state["started"] >= self.threshold]
+            if not slow:
+                continue
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = tuple(
+                    f"{entry.name} ({entry.filename.rsplit('/', 1)[-1]}:{entry.lineno})"
+                    for entry in traceback.extract_stack(frame)[-self.depth:]
+                )
+                # Idle pool threads and servers waiting on sockets are noise
+                if stack and not stack[-1].startswith(("wait ", "_wait_for_tstate_lock", "select ", "accept ")):
+                    stacks.append(stack)
+            with self._lock:
+                for state in slow:
+                    state["samples"].update(stacks)
+
+
+def _before_request():
+    request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+    g.request_id = request_id
+    g.request_id_token = set_request_id(request_id)
+    g.request_started = time.perf_counter()
+    profiler = current_app.extensions.get('slow_profiler')
+    if profiler is not None:
+        g.profile_key = profiler.start()
+
+
+def _after_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or "unmatched"
+        HTTP_REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+
+        profiler = current_app.extensions.get('slow_profiler')
+        hot = profiler.finish(g.pop('profile_key', None)) if profiler is not None else None
+        if hot and elapsed >= profiler.threshold:
+            report = "\n".join(f"  {count} samples: " + " > ".join(stack) for stack, count in hot)
+            current_app.logger.warning(
+                f"Slow request {request.method} {request.path} took {elapsed:.2f}s; hot stacks:\n{report}"
+            )
+    if g.get('request_id'):
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
+def _teardown_request(exc=None):
+    profiler = current_app.extensions.get('slow_profiler')
+    # Requests that raised never reach after_request
+    if profiler is not None and g.get('profile_key') is not None:
+        profiler.finish(g.pop('profile_key'))
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        try:
+            reset_request_id(token)
+        except (ValueError, RuntimeError):
+            pass
+
+
+def init_metrics(app):
+    """Request ids, request timings and the optional slow-request profiler"""
+    threshold = app.config.get('PROFILE_SLOW_REQUESTS', 0)
+    if threshold > 0:
+        app.extensions['slow_profiler'] = SlowRequestProfiler(
+            threshold,
+            interval=app.config.get('PROFILE_SAMPLE_INTERVAL', 0.01)
+        )
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
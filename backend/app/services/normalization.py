@@ -0,0 +1,197 @@
+from array import array
+from bisect import bisect_right
+import re
+import struct
+import sys
+import threading
+from app.services.pdf_extraction import PAGE_SEPARATOR, ExtractedText, PageText
+
+# Normalization keeps letters and digits plus a profile's punctuation,
+# deletes every other character and collapses whitespace runs to a single
+# space. 'alnum' is the historical behaviour; 'legal' keeps the symbols
+# contracts depend on (amounts, percentages, section references, brackets).
+PROFILES = {
+    "alnum": ".,",
+    "legal": ".,;:!?'\"()[]$%§¶&@#/*+=-–—‘’“”€£¥",
+}
+
+MAP_MAGIC = b'LMO1'
+_HEADER = struct.Struct('<4sIII')
+_WHITESPACE = re.compile(r'\s')
+# Up to this many distinct deleted characters are removed with str.replace
+_REPLACE_LIMIT = 16
+
+
+def pack_int_arrays(arrays):
+    """Concatenated little-endian int64 bytes of several arrays"""
+    if sys.byteorder == 'big':
+        arrays = [array('q', a) for a in arrays]
+        for a in arrays:
+            a.byteswap()
+    return b''.join(a.tobytes() if isinstance(a, array) else array('q', a).tobytes() for a in arrays)
+
+
+def unpack_int_arrays(data, offset, counts):
+    """Inverse of pack_int_arrays: arrays of the given lengths from data[offset:]"""
+    arrays = []
+    for count in counts:
+        a = array('q')
+        a.frombytes(data[offset:offset + count * a.itemsize])
+        if sys.byteorder == 'big':
+            a.byteswap()
+        arrays.append(a)
+        offset += count * a.itemsize
+    return arrays
+
+
+class OffsetMap:
+    """
+    Positions in a normalized text -> positions in the raw extracted text.
+
+    Stored as segments: segment i starts at norm_starts[i] in the normalized
+    text and at raw_starts[i] in the raw text, and runs unchanged until the
+    next segment. Only breaks (collapsed whitespace, deleted characters)
+    start a segment, so the map is a small fraction of the text size.
+    page_starts/page_numbers give the page of a normalized position.
+    """
+
+    def __init__(self, norm_starts, raw_starts, page_starts, page_numbers, length):
+        self.norm_starts = norm_starts
+        self.raw_starts = raw_starts
+        self.page_starts = page_starts
+        self.page_numbers = page_numbers
+        self.length = length
+
+    def __len__(self):
+        return len(self.norm_starts)
+
+    def to_raw(self, pos):
+        """Raw offset of the character at normalized offset pos"""
+        index = bisect_right(self.norm_starts, pos) - 1
+        if index < 0:
+            return pos
+        return self.raw_starts[index] + pos - self.norm_starts[index]
+
+    def raw_span(self, start, end):
+        """Raw [start, end) covering the normalized [start, end)"""
+        if end <= start:
+            raw = self.to_raw(start)
+            return raw, raw
+        return self.to_raw(start), self.to_raw(end - 1) + 1
+
+    def page_for(self, pos):
+        """1-based page number containing normalized offset pos"""
+        if not self.page_starts:
+            return None
+        index = max(bisect_right(self.page_starts, pos) - 1, 0)
+        return self.page_numbers[index]
+
+    def to_bytes(self):
+        header = _HEADER.pack(MAP_MAGIC, len(self.norm_starts), len(self.page_starts), self.length)
+        return header + pack_int_arrays(
+            [self.norm_starts, self.raw_starts, self.page_starts, self.page_numbers]
+        )
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, segments, pages, length = _HEADER.unpack_from(data)
+        if magic != MAP_MAGIC:
+            raise ValueError("Not an offset map")
+        arrays = unpack_int_arrays(data, _HEADER.size, (segments, segments, pages, pages))
+        return cls(*arrays, length)
+
+
+class Normalizer:
+    """Normalization for one set of kept characters"""
+
+    def __init__(self, keep=PROFILES["legal"]):
+        # Whitespace is never kept: it only ever separates words
+        self.keep = frozenset(c for c in keep if not c.isspace())
+
+    def _deleted(self, text):
+        # The distinct characters of a document are few, so the keep/delete
+        # decision is made once per character rather than once per position
+        return "".join(sorted(
+            c for c in set(text) if not (c.isalnum() or c.isspace() or c in self.keep)
+        ))
+
+    def normalize(self, text):
+        """Normalized text, without an offset map"""
+        deleted = self._deleted(text)
+        if len(deleted) > _REPLACE_LIMIT:
+            text = re.sub(f"[{re.escape(deleted)}]+", "", text)
+        else:
+            # A few str.replace passes beat one pass of a character class
+            for c in deleted:
+                text = text.replace(c, "")
+        return " ".join(text.split())
+
+    def _scan(self, text, raw_base, norm_base, norm_starts, raw_starts):
+        # Adds the segments of text to the map and returns its normalized
+        # form. Words of kept characters joined by single spaces are copied to the
+        # output unchanged, so each such run is one segment
+        word = f"[^\\s{re.escape(self._deleted(text))}]+"
+        runs = re.compile(f"{word}(?: {word})*")
+        pieces, norm, previous_end = [], norm_base, None
+        for match in runs.finditer(text):
+            start = match.start()
+            contiguous = False
+            if previous_end is not None:
+                space = _WHITESPACE.search(text, previous_end, start)
+                if space is not None:
+                    norm_starts.append(norm)
+                    raw_starts.append(raw_base + space.start())
+                    pieces.append(" ")
+                    norm += 1
+                    contiguous = space.start() == start - 1
+            if not contiguous:
+                norm_starts.append(norm)
+                raw_starts.append(raw_base + start)
+            piece = match.group()
+            pieces.append(piece)
+            norm += len(piece)
+            previous_end = match.end()
+        return "".join(pieces)
+
+    def normalize_with_map(self, text):
+        """(normalized text, OffsetMap) of a single-page text"""
+        normalized, offset_map = self.normalize_pages(ExtractedText([PageText(1, text)]))
+        return normalized.text, offset_map
+
+    def normalize_pages(self, extracted):
+        """
+        Normalize an ExtractedText page by page; returns the normalized
+        ExtractedText (page offsets valid in its text) and the OffsetMap back
+        to extracted.text.
+        """
+        norm_starts, raw_starts = array('q'), array('q')
+        page_starts, page_numbers = array('q'), array('q')
+        pages, norm = [], 0
+        for page, raw_base in zip(extracted.pages, extracted.page_offsets):
+            if pages:
+                # The page separator maps onto the raw one
+                norm_starts.append(norm)
+                raw_starts.append(raw_base - len(PAGE_SEPARATOR))
+                norm += len(PAGE_SEPARATOR)
+            page_starts.append(norm)
+            page_numbers.append(page.page_number)
+            page_text = self._scan(page.text, raw_base, norm, norm_starts, raw_starts)
+            pages.append(PageText(page.page_number, page_text))
+            norm += len(page_text)
+        normalized = ExtractedText(pages, truncated=extracted.truncated, page_count=extracted.page_count)
+        return normalized, OffsetMap(norm_starts, raw_starts, page_starts, page_numbers, norm)
+
+
+_normalizers = {}
+_normalizers_lock = threading.Lock()
+
+
+def get_normalizer(profile="legal", extra=""):
+    """Shared Normalizer for a profile name plus extra kept characters"""
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown normalization profile: {profile}")
+    key = (profile, extra)
+    with _normalizers_lock:
+        if key not in _normalizers:
+            _normalizers[key] = Normalizer(PROFILES[profile] + extra)
+        return _normalizers[key]
@@ -0,0 +1,127 @@
+from bisect import bisect_right
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import threading
+import PyPDF2
+
+PageText = namedtuple('PageText', ['page_number', 'text'])
+
+# Pages are joined with a newline so words never run across a page break
+PAGE_SEPARATOR = "\n"
+
+
+class ExtractedText:
+    """Document text plus the offset at which each page starts"""
+
+    def __init__(self, pages, truncated=False, page_count=None):
+        self.pages = pages
+        self.truncated = truncated
+        self.page_count = page_count if page_count is not None else len(pages)
+        self.page_offsets = []
+        offset = 0
+        for page in pages:
+            self.page_offsets.append(offset)
+            offset += len(page.text) + len(PAGE_SEPARATOR)
+        self.text = PAGE_SEPARATOR.join(page.text for page in pages)
+
+    def page_for_offset(self, offset):
+        """1-based page number containing a character offset"""
+        if not self.pages:
+            return None
+        index = max(bisect_right(self.page_offsets, offset) - 1, 0)
+        return self.pages[index].page_number
+
+    def map_pages(self, func):
+        """Apply a per-page transform (e.g. preprocess_text) keeping page offsets aligned"""
+        return ExtractedText(
+            [PageText(page.page_number, func(page.text)) for page in self.pages],
+            truncated=self.truncated,
+            page_count=self.page_count
+        )
+
+
+def iter_pdf_pages(file_path, start=0, stop=None):
+    """Yield PageText for pages [start, stop) without holding the whole text"""
+    with open(file_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+        for index in range(start, stop):
+            yield PageText(index + 1, reader.pages[index].extract_text() or "")
+
+
+def count_pdf_pages(file_path):
+    with open(file_path, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def _extract_range(file_path, start, stop):
+    # Runs in a worker process: each worker opens its own reader
+    return list(iter_pdf_pages(file_path, start, stop))
+
+
+# One pool per size, so a caller asking for more processes gets them
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def _get_pool(processes):
+    with _pool_lock:
+        pool = _pools.get(processes)
+        if pool is None:
+            pool = _pools[processes] = ProcessPoolExecutor(max_workers=processes)
+        return pool
+
+
+def _pooled_pages(pool, file_path, ranges, ahead):
+    """Pages of ranges in order, with at most `ahead` ranges submitted and not yet read"""
+    remaining, futures = deque(ranges), deque()
+    try:
+        while remaining or futures:
+            while remaining and len(futures) < ahead:
+                start, stop = remaining.popleft()
+                futures.append(pool.submit(_extract_range, file_path, start, stop))
+            yield from futures.popleft().result()
+    finally:
+        # Closed early (max_chars reached): ranges not started yet are dropped
+        for future in futures:
+            future.cancel()
+
+
+def _page_ranges(page_count, parts):
+    size = max(1, -(-page_count // parts))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def extract_pdf(file_path, processes=1, max_pages=None, max_chars=None, parallel_min_pages=32):
+    """
+    Extract page texts, stopping at max_pages pages or max_chars characters.
+
+    With processes > 1 and at least parallel_min_pages pages, page ranges are
+    split across a process pool; otherwise pages are streamed one at a time.
+    """
+    page_count = count_pdf_pages(file_path)
+    limit = min(page_count, max_pages) if max_pages else page_count
+
+    if processes > 1 and limit >= parallel_min_pages:
+        pool = _get_pool(processes)
+        # A few ranges per worker keeps cores busy when page costs are uneven
+        ranges = _page_ranges(limit, processes * 4)
+        # Ranges are submitted as pages are read, so none are extracted
+        # after max_chars is reached
+        page_iter = _pooled_pages(pool, file_path, ranges, ahead=processes * 2)
+    else:
+        page_iter = iter_pdf_pages(file_path, 0, limit)
+
+    pages, chars = [], 0
+    truncated = limit < page_count
+    try:
+        for page in page_iter:
+            if max_chars and chars + len(page.text) > max_chars:
+                pages.append(PageText(page.page_number, page.text[:max(0, max_chars - chars)]))
+                truncated = True
+                break
+            pages.append(page)
+            chars += len(page.text) + len(PAGE_SEPARATOR)
+    finally:
+        page_iter.close()
+    return ExtractedText(pages, truncated=truncated, page_count=page_count)
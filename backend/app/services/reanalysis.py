@@ -0,0 +1,355 @@
+from flask import current_app
+from bson import json_util
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+import click
+import hashlib
+import json
+import multiprocessing
+import time
+from pymongo import UpdateOne
+from app.config import documents_collection, reanalysis_runs_collection
+from app.services.analysis_orchestrator import default_stages, run_document_analysis
+from app.services.call_governor import reset_deadline, set_deadline
+from app.services.document_store import (
+    TEXT_FIELDS,
+    document_entities,
+    load_segment_index,
+    load_text,
+    pack_payload,
+    store_segment_index,
+    unpack_payload
+)
+from app.services.entity_model import with_pages
+from app.services.result_cache import stage_versions
+from app.services.risk_rules import RuleSet, get_rule_set
+from app.services.search_index import index_document
+from app.services.segmentation import SEGMENTATION_VERSION, SegmentIndex, build_segment_index
+from app.services.text_analysis import AnalysisContext
+
+# Stages that can be re-run over stored documents. "segments" and "risks"
+# are CPU-bound and run in a process pool; "entities" and "summary" call
+# GCP and run on threads, limited by the call governor.
+STAGES = ("segments", "entities", "summary", "risks")
+CPU_STAGES = ("segments", "risks")
+GCP_STAGES = ("entities", "summary")
+
+# Where a document records the version each stage last ran at
+VERSION_FIELDS = {
+    "segments": "segment_index.version",
+    "risks": "risk_ruleset",
+    "entities": "analysis_versions.entities",
+    "summary": "analysis_versions.summary"
+}
+
+REANALYSIS_FIELDS = dict(TEXT_FIELDS, filename=1, upload_time=1, text_hash=1, page_offsets=1,
+                         segment_index=1, entity_index=1, entities=1, risks=1,
+                         analysis_versions=1, risk_ruleset=1)
+
+
+def target_versions(stages):
+    """{stage: version} a document must have for each of stages to be current"""
+    versions = stage_versions()
+    targets = {}
+    for stage in stages:
+        if stage == "segments":
+            targets[stage] = SEGMENTATION_VERSION
+        elif stage == "risks":
+            targets[stage] = get_rule_set().version
+        else:
+            targets[stage] = versions[stage]
+    return targets
+
+
+def _field_value(document, path):
+    value = document
+    for part in path.split('.'):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def stale_stages(document, targets):
+    return [stage for stage, version in targets.items()
+            if _field_value(document, VERSION_FIELDS[stage]) != version]
+
+
+def build_query(targets, query=None, everything=False, after=None):
+    """Processed documents matching query with at least one stale stage (every one with everything)"""
+    clauses = [{"status": "processed"}]
+    if query:
+        clauses.append(query)
+    if not everything:
+        clauses.append({"$or": [{VERSION_FIELDS[stage]: {"$ne": version}}
+                                for stage, version in targets.items()]})
+    if after is not None:
+        clauses.append({"_id": {"$gt": after}})
+    return {"$and": clauses}
+
+
+# --------------------------------------------------
+# CPU stages (pool processes)
+# --------------------------------------------------
+_worker_rules = None
+
+
+def _init_cpu_worker(rule_specs):
+    # Pool processes compile the parent's rules: a rules file edited during
+    # the run cannot mix two rule sets within one run
+    global _worker_rules
+    _worker_rules = RuleSet.from_specs(rule_specs)
+
+
+def _cpu_stages(text, page_offsets, segment_bytes, evaluate_risks):
+    """
+    Rebuild the segment index (when segment_bytes is None) and evaluate the
+    risk rules. Returns (new segment index bytes or None, findings or None).
+    """
+    rebuilt = None
+    if segment_bytes is None:
+        segment_index = build_segment_index(text, AnalysisContext(text).sentence_spans, page_offsets)
+        rebuilt = segment_index.to_bytes()
+    else:
+        segment_index = SegmentIndex.from_bytes(segment_bytes)
+    findings = _worker_rules.evaluate(text, segment_index) if evaluate_risks else None
+    return rebuilt, findings
+
+
+class Reanalysis:
+    """One run of `flask reanalyze`: selection, pools and per-batch writes"""
+
+    def __init__(self, app, stages, query=None, everything=False, batch_size=100,
+                 processes=0, concurrency=8):
+        self.app = app
+        self.stages = [stage for stage in STAGES if stage in stages]
+        self.query = query
+        self.everything = everything
+        self.batch_size = batch_size
+        self.processes = processes
+        self.concurrency = concurrency
+        self.rule_set = get_rule_set()
+        self.targets = target_versions(self.stages)
+        self.pool = None
+
+    def __enter__(self):
+        specs = [rule.spec for rule in self.rule_set.rules]
+        if any(stage in CPU_STAGES for stage in self.stages) and self.processes > 0:
+            # Spawned, not forked: this process already runs Mongo and gRPC
+            # threads that a fork would copy mid-operation
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_cpu_worker,
+                initargs=(specs,)
+            )
+        else:
+            _init_cpu_worker(specs)
+        self.threads = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="reanalysis")
+        return self
+
+    def __exit__(self, *exc):
+        self.threads.shutdown(wait=True)
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+
+    def next_batch(self, after):
+        return list(
+            documents_collection.find(build_query(self.targets, self.query, self.everything, after),
+                                      REANALYSIS_FIELDS)
+            .sort('_id', 1)
+            .limit(self.batch_size)
+        )
+
+    def _run_cpu(self, *args):
+        if self.pool is None:
+            return _cpu_stages(*args)
+        return self.pool.submit(_cpu_stages, *args).result()
+
+    def analyze(self, document):
+        """
+        Re-run the stale (or, with everything, all) selected stages of one
+        document. Returns ($set fields, {stage: error}, text).
+        """
+        with self.app.app_context():
+            token = set_deadline(self.app.config.get('JOB_DEADLINE', 300))
+            try:
+                return self._analyze(document)
+            finally:
+                reset_deadline(token)
+
+    def _analyze(self, document):
+        stages = self.stages if self.everything else stale_stages(document, self.targets)
+        update, errors = {}, {}
+        text = load_text(document)
+        page_offsets = document.get('page_offsets') or [0]
+        segment_index = None if "segments" in stages else load_segment_index(document)
+
+        # A missing or outdated index is rebuilt whenever a stage needs one
+        if segment_index is None or "risks" in stages:
+            try:
+                segment_bytes = segment_index.to_bytes() if segment_index is not None else None
+                rebuilt, findings = self._run_cpu(text, page_offsets, segment_bytes, "risks" in stages)
+                if rebuilt is not None:
+                    segment_index = SegmentIndex.from_bytes(rebuilt)
+                    update["segment_index"] = store_segment_index(segment_index)
+                if findings is not None:
+                    update.update(
+                        risks=pack_payload(self.rule_set.messages(findings)),
+                        risk_findings=pack_payload(findings),
+                        risk_rules=self.rule_set.fingerprints(),
+                        risk_ruleset=self.rule_set.version
+                    )
+            except Exception as e:
+                errors["segments" if "segments" in stages else "risks"] = str(e) or e.__class__.__name__
+
+        gcp = [stage for stage in default_stages() if stage.name in stages and stage.name in GCP_STAGES]
+        if gcp:
+            analysis = run_document_analysis(text, stages=gcp, segment_index=segment_index)
+            errors.update(analysis["errors"])
+            for name, version in analysis["versions"].items():
+                update[f"analysis_versions.{name}"] = version
+            if "entities" in analysis["versions"]:
+                update["entity_index"] = pack_payload(with_pages(analysis["entities"], page_offsets))
+            if "summary" in analysis["versions"]:
+                update["summary"] = analysis["summary"]
+        return update, errors, text
+
+    def write(self, results):
+        """Apply one batch of results with a single bulk_write; returns documents updated"""
+        operations = [
+            # The text hash guards against a document re-processed meanwhile
+            UpdateOne({"_id": document['_id'], "text_hash": document.get('text_hash')}, {"$set": update})
+            for document, update, _, _ in results if update
+        ]
+        if not operations:
+            return 0
+        result = documents_collection.bulk_write(operations, ordered=False)
+
+        # Search entries follow new entities or risks
+        for document, update, _, text in results:
+            if "entity_index" not in update and "risks" not in update:
+                continue
+            try:
+                entities = unpack_payload(update["entity_index"]) if "entity_index" in update \
+                    else document_entities(document)
+                risks = unpack_payload(update.get('risks', document.get('risks')) or [])
+                index_document(document, text, entities, risks)
+            except Exception as e:
+                current_app.logger.warning(f"Search indexing of {document['_id']} failed: {e}")
+        return result.modified_count
+
+    def run_batch(self, documents):
+        """(updated, failed) after re-analysing and writing one batch"""
+        futures = [(document, self.threads.submit(self.analyze, document)) for document in documents]
+        results, failed = [], 0
+        for document, future in futures:
+            try:
+                update, errors, text = future.result()
+            except Exception as e:
+                update, errors, text = {}, {"document": str(e)}, None
+            if errors:
+                failed += 1
+                current_app.logger.warning(f"Re-analysis of {document['_id']}: {errors}")
+            results.append((document, update, errors, text))
+        return self.write(results), failed
+
+
+def run_id_for(stages, query, everything):
+    """Checkpoint name of a selection, so re-running the same command resumes it"""
+    key = json.dumps({"stages": sorted(stages), "query": json_util.dumps(query or {}),
+                      "all": everything}, sort_keys=True)
+    return "reanalyze-" + hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+def _checkpoint(run_id, **fields):
+    reanalysis_runs_collection.update_one(
+        {"_id": run_id},
+        {"$set": dict(fields, updated_at=datetime.utcnow())},
+        upsert=True
+    )
+
+
+@click.command('reanalyze')
+@click.option('--stages', default=",".join(STAGES), show_default=True,
+              help='Comma-separated stages to re-run')
+@click.option('--query', 'raw_query', default=None, help='Extended JSON filter on documents')
+@click.option('--all', 'everything', is_flag=True, help='Re-run the stages even where they are current')
+@click.option('--dry-run', is_flag=True, help='Only report what would be re-analysed')
+@click.option('--batch-size', type=int, default=None)
+@click.option('--processes', type=int, default=None, help='Pool processes for the CPU stages')
+@click.option('--concurrency', type=int, default=None, help='Documents analysed at once')
+@click.option('--run', 'run_id', default=None, help='Checkpoint name (default: derived from the selection)')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and start from the beginning')
+def reanalyze_command(stages, raw_query, everything, dry_run, batch_size, processes, concurrency,
+                      run_id, restart):
+    """Re-run analysis stages over stored documents, resuming from the last checkpoint"""
+    config = current_app.config
+    stages = [stage.strip() for stage in stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown or not stages:
+        raise click.BadParameter(f"choose from {', '.join(STAGES)}", param_hint='--stages')
+    try:
+        query = json_util.loads(raw_query) if raw_query else None
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--query')
+
+    job = Reanalysis(
+        current_app._get_current_object(), stages, query, everything,
+        batch_size=batch_size or config.get('REANALYSIS_BATCH_SIZE', 100),
+        processes=config.get('REANALYSIS_PROCESSES', 1) if processes is None else processes,
+        concurrency=concurrency or config.get('REANALYSIS_CONCURRENCY', 8)
+    )
+    run_id = run_id or run_id_for(stages, query, everything)
+    checkpoint = None if restart else reanalysis_runs_collection.find_one({"_id": run_id})
+    if checkpoint is not None and checkpoint.get('status') == 'finished':
+        checkpoint = None
+    after = checkpoint.get('last_id') if checkpoint else None
+
+    if dry_run:
+        selection = build_query(job.targets, query, everything, after)
+        total = documents_collection.count_documents(selection)
+        click.echo(f"{total} documents to re-analyse ({', '.join(job.stages)})"
+                   + (f", resuming {run_id} after {after}" if after else ""))
+        for document in job.next_batch(after)[:10]:
+            todo = job.stages if everything else stale_stages(document, job.targets)
+            click.echo(f"  {document['_id']}  {document.get('filename', '')}  {', '.join(todo)}")
+        return
+
+    counts = {key: checkpoint.get(key, 0) for key in ('processed', 'updated', 'failed')} if checkpoint \
+        else {"processed": 0, "updated": 0, "failed": 0}
+    if checkpoint:
+        click.echo(f"Resuming {run_id} after {after} ({counts['processed']} documents done)")
+    else:
+        _checkpoint(run_id, status="running", stages=job.stages, query=json_util.dumps(query or {}),
+                    everything=everything, last_id=None, started_at=datetime.utcnow(), **counts)
+
+    started, done = time.monotonic(), 0
+    try:
+        with job:
+            while True:
+                documents = job.next_batch(after)
+                if not documents:
+                    break
+                updated, failed = job.run_batch(documents)
+                # Written before the checkpoint moves: a crash repeats at
+                # most the batch in progress
+                after = documents[-1]['_id']
+                done += len(documents)
+                counts["processed"] += len(documents)
+                counts["updated"] += updated
+                counts["failed"] += failed
+                _checkpoint(run_id, status="running", last_id=after, **counts)
+                rate = done / max(time.monotonic() - started, 1e-9)
+                click.echo(f"{counts['processed']} documents ({counts['updated']} updated, "
+                           f"{counts['failed']} with errors), {rate:.2f} docs/s")
+    except BaseException:
+        _checkpoint(run_id, status="interrupted", **counts)
+        raise
+
+    elapsed = time.monotonic() - started
+    _checkpoint(run_id, status="finished", finished_at=datetime.utcnow(), **counts)
+    click.echo(f"Done: {done} documents in {elapsed:.1f}s ({done / max(elapsed, 1e-9):.2f} docs/s); "
+               f"{counts['updated']} updated, {counts['failed']} with errors")
+
+
+def init_reanalysis(app):
+    app.cli.add_command(reanalyze_command)
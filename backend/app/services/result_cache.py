@@ -0,0 +1,185 @@
+from flask import current_app
+from collections import OrderedDict
+from datetime import datetime
+import hashlib
+import threading
+from app.config import analysis_cache_collection
+from app.utils.keyword_engine import get_keyword_engine
+from app.services.entity_backends import get_entity_backend
+from app.services.entity_model import ENTITY_MODEL_VERSION
+from app.services.risk_rules import get_rule_set
+
+# Cache keys are "<kind>:<sha256>" where kind is "bytes" (raw upload) or
+# "text" (normalized extracted text). Each entry holds per-stage results:
+#   {"_id": "text:ab12…", "stages": {"summary": {"value": …, "version": …}}}
+KIND_BYTES = "bytes"
+KIND_TEXT = "text"
+
+def hash_text(text):
+    # Whitespace-insensitive so re-extractions of the same document collide
+    return hashlib.sha256(" ".join(text.split()).encode('utf-8')).hexdigest()
+
+
+def stage_versions():
+    """
+    Model/version each stage's result depends on. A cached stage is only
+    reused when its recorded version matches the current one.
+    """
+    # Imported here: the summarization engine caches its chunks through this module
+    from app.services.summarization import get_summarization_engine
+
+    config = current_app.config
+    prefix = config.get('ANALYSIS_CACHE_VERSION', '1')
+    keywords = get_keyword_engine().version
+    return {
+        "entities": f"{prefix}|ner-{get_entity_backend().version}|kw-{keywords}|m{ENTITY_MODEL_VERSION}",
+        # The backend ("fake" or the Vertex model), prompts and chunking
+        "summary": f"{prefix}|{get_summarization_engine().version}",
+        "risks": f"{prefix}|rules-{get_rule_set().version}",
+        "clauses": f"{prefix}|documentai-{config.get('DOC_AI_PROCESSOR_ID')}"
+    }
+
+
+class LRUCache:
+    """Thread-safe in-process LRU map"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class AnalysisCache:
+    """Content-addressed analysis results: in-process LRU in front of Mongo"""
+
+    def __init__(self, collection, maxsize=1024):
+        self.collection = collection
+        self.memory = LRUCache(maxsize)
+        self._stats = {"memory_hits": 0, "store_hits": 0, "misses": 0, "writes": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _load(self, key):
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry, "memory_hits"
+        entry = self.collection.find_one({"_id": key}, {"stages": 1, "text_hash": 1})
+        if entry is not None:
+            self.memory.set(key, entry)
+            return entry, "store_hits"
+        return None, "misses"
+
+    def lookup(self, versions, content_hash=None, text_hash=None):
+        """Return {stage: value} for stages cached under either hash at the current version"""
+        found = {}
+        for kind, digest in ((KIND_BYTES, content_hash), (KIND_TEXT, text_hash)):
+            if not digest:
+                continue
+            entry, outcome = self._load(f"{kind}:{digest}")
+            stages = entry.get("stages", {}) if entry else {}
+            fresh = {
+                name: stage["value"]
+                for name, stage in stages.items()
+                if name in versions and stage.get("version") == versions[name]
+            }
+            self._count(outcome if fresh else "misses")
+            for name, value in fresh.items():
+                found.setdefault(name, value)
+            if set(versions) <= set(found):
+                break
+        return found
+
+    def store(self, versions, results, content_hash=None, text_hash=None):
+        """Record successful stage results under both hashes"""
+        if not results:
+            return
+        now = datetime.utcnow()
+        fields = {
+            f"stages.{name}": {"value": value, "version": versions[name], "stored_at": now}
+            for name, value in results.items()
+        }
+        for kind, digest in ((KIND_BYTES, content_hash), (KIND_TEXT, text_hash)):
+            if not digest:
+                continue
+            key = f"{kind}:{digest}"
+            update = dict(fields)
+            if kind == KIND_BYTES and text_hash:
+                update["text_hash"] = text_hash
+            self.collection.update_one({"_id": key}, {"$set": update}, upsert=True)
+            # Drop the memory copy; the next lookup reloads the merged entry
+            self.memory.pop(key)
+            self._count("writes")
+
+    def get_value(self, kind, digest, version):
+        """Single cached value (e.g. a chunk summary) stored at a version"""
+        key = f"{kind}:{digest}"
+        outcome = "memory_hits"
+        entry = self.memory.get(key)
+        if entry is None:
+            outcome = "store_hits"
+            entry = self.collection.find_one({"_id": key}, {"value": 1, "version": 1})
+            if entry is not None:
+                self.memory.set(key, entry)
+        if entry is None or entry.get("version") != version:
+            self._count("misses")
+            return None
+        self._count(outcome)
+        return entry.get("value")
+
+    def set_value(self, kind, digest, version, value):
+        entry = {"value": value, "version": version, "stored_at": datetime.utcnow()}
+        self.collection.update_one({"_id": f"{kind}:{digest}"}, {"$set": entry}, upsert=True)
+        self.memory.set(f"{kind}:{digest}", entry)
+        self._count("writes")
+
+    def text_hash_for(self, content_hash):
+        """Text hash previously recorded for an upload, if any"""
+        entry, _ = self._load(f"{KIND_BYTES}:{content_hash}")
+        return entry.get("text_hash") if entry else None
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["store_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["store_hits"]) / lookups, 4) if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnalysisCache(
+                analysis_cache_collection,
+                maxsize=current_app.config.get('ANALYSIS_CACHE_SIZE', 1024)
+            )
+        return _cache
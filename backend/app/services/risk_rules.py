@@ -0,0 +1,538 @@
+from flask import current_app
+from bisect import bisect_left, bisect_right
+import click
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from app.config import documents_collection
+from app.services.document_store import (
+    TEXT_FIELDS,
+    document_entities,
+    load_segment_index,
+    load_text,
+    pack_payload,
+    unpack_payload
+)
+from app.services.search_index import index_document
+from app.utils.keyword_engine import get_keyword_engine, term_pattern
+
+logger = logging.getLogger(__name__)
+
+# Risk rules, built in from the keyword dictionaries or loaded from JSON:
+#   {"include_defaults": true,
+#    "rules": [
+#      {"id": "uncapped-liability", "type": "regex", "pattern": "unlimited liability",
+#       "message": "Uncapped liability", "severity": "critical"},
+#      {"id": "auto-renewal", "type": "proximity", "terms": ["renew*"],
+#       "near": ["automatic*"], "window": 120, "severity": 0.5},
+#      {"id": "missing-notices", "type": "absence", "terms": ["notices"], "severity": "medium"},
+#      {"id": "risk:indemnification", "type": "keyword", "terms": ["indemnify"]}
+#    ]}
+# keyword   any of the terms (same syntax as the keyword dictionaries)
+# regex     a case-insensitive regular expression; (?-i:...) for exact case.
+#           Leading global flags such as (?s) apply to the whole pattern
+# proximity a term within `window` characters of a `near` term, or in the
+#           same sentence with "scope": "sentence"
+# absence   none of the terms anywhere in the document
+# All rules are compiled into one plan that scans a document once; every
+# rule pattern is tried wherever any of them starts, so one rule's phrase
+# never hides another rule's hits ("liability cap" / "liability"). A
+# rule's fingerprint is stored on the documents it ran on, so after a change
+# only new or edited rules are evaluated again over stored documents.
+RULE_TYPES = ("keyword", "regex", "proximity", "absence")
+SEVERITIES = {"low": 0.25, "medium": 0.5, "high": 0.75, "critical": 1.0}
+DEFAULT_WINDOW = 200
+
+# Seconds between modification-time checks of the rules file
+RELOAD_CHECK_INTERVAL = 2.0
+
+
+class RuleError(ValueError):
+    """A rule definition that cannot be compiled"""
+
+
+def _severity(value):
+    if isinstance(value, str):
+        if value not in SEVERITIES:
+            raise RuleError(f"Unknown severity {value!r}")
+        return SEVERITIES[value]
+    value = float(value)
+    if not 0 <= value <= 1:
+        raise RuleError(f"Severity {value} is outside 0..1")
+    return value
+
+
+def _terms(spec, key):
+    terms = spec.get(key) or []
+    if isinstance(terms, str):
+        terms = [terms]
+    terms = [t for t in terms if t.strip()]
+    if not terms:
+        raise RuleError(f"Rule {spec.get('id')!r} needs '{key}'")
+    return terms
+
+
+def _keyword_source(term):
+    return rf'(?<!\w){term_pattern(term)}(?!\w)'
+
+
+_GLOBAL_FLAGS = re.compile(r'(?<!\\)\(\?([aiLmsux]+)\)')
+
+
+def _scoped_source(rule_id, pattern):
+    """pattern with its leading global flags, e.g. (?i), turned into a scoped group"""
+    # Rule sources are combined into alternations, where global flags are
+    # only valid at the very start
+    flags = ''
+    match = _GLOBAL_FLAGS.match(pattern)
+    while match:
+        flags += match.group(1)
+        pattern = pattern[match.end():]
+        match = _GLOBAL_FLAGS.match(pattern)
+    if _GLOBAL_FLAGS.search(pattern):
+        raise RuleError(f"Rule {rule_id!r} has global flags that are not at the start of its pattern")
+    if not flags:
+        return pattern
+    # A verbose-mode comment would otherwise run into the closing parenthesis
+    return f"(?{flags}:{pattern}{chr(10) if 'x' in flags else ''})"
+
+
+def _role_pattern(sources):
+    # Longest first, so a phrase wins over a shorter term at the same place
+    ordered = sorted(set(sources), key=len, reverse=True)
+    if len(ordered) == 1:
+        return re.compile(ordered[0], re.IGNORECASE)
+    return re.compile('|'.join(f'(?:{s})' for s in ordered), re.IGNORECASE)
+
+
+class RiskRule:
+    """One compiled rule: its pattern sources by role, and how hits become findings"""
+
+    def __init__(self, spec):
+        self.id = spec.get("id")
+        # Ids are keys of the stored {rule id: fingerprint} map
+        if not isinstance(self.id, str) or not self.id or '.' in self.id or self.id.startswith('$'):
+            raise RuleError(f"Invalid rule id {self.id!r}")
+        self.type = spec.get("type", "keyword")
+        if self.type not in RULE_TYPES:
+            raise RuleError(f"Rule {self.id!r} has unknown type {self.type!r}")
+        self.message = spec.get("message") or self.id
+        self.severity = _severity(spec.get("severity", "medium"))
+        self.spec = dict(spec)
+        self.fingerprint = hashlib.sha1(
+            json.dumps(self.spec, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:12]
+
+        # (role, regex source) pairs
+        if self.type == "regex":
+            pattern = spec.get("pattern")
+            if not pattern:
+                raise RuleError(f"Rule {self.id!r} needs 'pattern'")
+            # Group numbers and names change inside the plan's alternation
+            if re.search(r'\\[1-9]|\(\?P[<=]', pattern):
+                raise RuleError(f"Rule {self.id!r} uses named groups or backreferences")
+            self.sources = [("hit", _scoped_source(self.id, pattern))]
+        elif self.type == "proximity":
+            self.sources = ([("hit", _keyword_source(t)) for t in _terms(spec, "terms")] +
+                            [("near", _keyword_source(t)) for t in _terms(spec, "near")])
+            self.window = int(spec.get("window", DEFAULT_WINDOW))
+            self.sentence_scope = spec.get("scope") == "sentence"
+        else:
+            self.sources = [("hit", _keyword_source(t)) for t in _terms(spec, "terms")]
+
+        # One compiled pattern per role, tried by the plan where a match may start
+        by_role = {}
+        for role, source in self.sources:
+            by_role.setdefault(role, []).append(source)
+        try:
+            self.patterns = {role: _role_pattern(sources) for role, sources in by_role.items()}
+        except re.error as e:
+            raise RuleError(f"Rule {self.id!r} has an invalid pattern: {e}")
+
+    def _pairs(self, hits, near, segment_index):
+        # (start, end) of each hit with a `near` hit close enough to it
+        near_starts = [start for start, _ in near]
+        found = []
+        for start, end in hits:
+            if self.sentence_scope and segment_index is not None and segment_index.sentence_count:
+                index = max(bisect_right(segment_index.sentence_starts, start) - 1, 0)
+                lo, hi = segment_index.sentence_starts[index], segment_index.sentence_ends[index]
+            else:
+                lo, hi = start - self.window, end + self.window
+            first = bisect_left(near_starts, lo)
+            last = bisect_left(near_starts, hi)
+            if first < last:
+                partner = near[first]
+                found.append((min(start, partner[0]), max(end, partner[1])))
+        return found
+
+    def findings(self, roles, segment_index):
+        """Findings from this rule's hits: one per clause it fires in"""
+        if self.type == "absence":
+            if roles.get("hit"):
+                return []
+            return [self._finding(None, None, None, 1, segment_index)]
+
+        spans = roles.get("hit", [])
+        if self.type == "proximity":
+            spans = self._pairs(spans, roles.get("near", []), segment_index)
+
+        by_clause = {}
+        for start, end in spans:
+            clause = segment_index.clause_at(start) if segment_index is not None else None
+            if clause in by_clause:
+                by_clause[clause][2] += 1
+            else:
+                by_clause[clause] = [start, end, 1]
+        return [self._finding(clause, start, end, count, segment_index)
+                for clause, (start, end, count) in by_clause.items()]
+
+    def _finding(self, clause, start, end, count, segment_index):
+        pages = []
+        if segment_index is not None and start is not None:
+            pages = segment_index.pages_for(start, end)
+        return {
+            "rule": self.id,
+            "type": self.type,
+            "message": self.message,
+            "severity": self.severity,
+            "clause": segment_index.clause_ids[clause] if clause is not None else None,
+            "start": start,
+            "end": end,
+            "pages": pages,
+            "count": count
+        }
+
+
+class RulePlan:
+    """
+    Every pattern of a rule set, found in one pass: a zero-width alternation
+    of all of them stops wherever one may start, and each pattern is then
+    matched there on its own, so overlapping hits of different rules are
+    all kept.
+    """
+
+    def __init__(self, rules):
+        tags_by_pattern = {}
+        for rule_index, rule in enumerate(rules):
+            for role, pattern in rule.patterns.items():
+                tags_by_pattern.setdefault(pattern, []).append((rule_index, role))
+        self._patterns = list(tags_by_pattern.items())
+        if self._patterns:
+            alternatives = '|'.join(f'(?:{pattern.pattern})' for pattern, _ in self._patterns)
+            self._starts = re.compile(f'(?=(?:{alternatives}))', re.IGNORECASE)
+        else:
+            self._starts = None
+
+    def scan(self, text):
+        """{rule index: {role: [(start, end), ...]}} in one pass over text"""
+        hits = {}
+        if self._starts is None:
+            return hits
+        # Like finditer per pattern: a pattern's hits do not overlap each other
+        ends = [0] * len(self._patterns)
+        search = self._starts.search
+        pos = 0
+        while True:
+            candidate = search(text, pos)
+            if candidate is None:
+                break
+            start = candidate.start()
+            for index, (pattern, tags) in enumerate(self._patterns):
+                if start < ends[index]:
+                    continue
+                match = pattern.match(text, start)
+                if match is None:
+                    continue
+                ends[index] = max(match.end(), start + 1)
+                for rule_index, role in tags:
+                    hits.setdefault(rule_index, {}).setdefault(role, []).append(match.span())
+            pos = start + 1
+        return hits
+
+
+class RuleSet:
+    """An ordered list of rules and the plan that evaluates them"""
+
+    def __init__(self, rules):
+        ids = [rule.id for rule in rules]
+        duplicates = {i for i in ids if ids.count(i) > 1}
+        if duplicates:
+            raise RuleError(f"Duplicate rule ids: {', '.join(sorted(duplicates))}")
+        self.rules = list(rules)
+        self.version = hashlib.sha1(
+            "|".join(f"{rule.id}={rule.fingerprint}" for rule in self.rules).encode('utf-8')
+        ).hexdigest()[:12]
+        self._order = {rule.id: i for i, rule in enumerate(self.rules)}
+        self._plan = None
+        self._plan_lock = threading.Lock()
+
+    @classmethod
+    def from_specs(cls, specs):
+        return cls([RiskRule(spec) for spec in specs])
+
+    @property
+    def plan(self):
+        if self._plan is None:
+            with self._plan_lock:
+                if self._plan is None:
+                    self._plan = RulePlan(self.rules)
+        return self._plan
+
+    def fingerprints(self):
+        return {rule.id: rule.fingerprint for rule in self.rules}
+
+    def subset(self, rule_ids):
+        wanted = set(rule_ids)
+        return RuleSet([rule for rule in self.rules if rule.id in wanted])
+
+    def evaluate(self, text, segment_index=None):
+        """Findings of every rule, in rule order"""
+        hits = self.plan.scan(text)
+        findings = []
+        for rule_index, rule in enumerate(self.rules):
+            findings.extend(rule.findings(hits.get(rule_index, {}), segment_index))
+        return findings
+
+    def order(self, findings):
+        """Findings sorted by rule order, then position (for merging partial runs)"""
+        last = len(self._order)
+        return sorted(findings, key=lambda f: (self._order.get(f["rule"], last), f["start"] or 0))
+
+    def messages(self, findings):
+        """One message per rule that fired, in rule order (the stored "risks")"""
+        seen, messages = set(), []
+        for finding in self.order(findings):
+            if finding["message"] not in seen:
+                seen.add(finding["message"])
+                messages.append(finding["message"])
+        return messages
+
+
+def _combined(severities):
+    # Independent risks: the chance that at least one is real
+    remaining = 1.0
+    for severity in severities:
+        remaining *= 1 - severity
+    return round(1 - remaining, 4)
+
+
+def score_findings(findings):
+    """
+    Document and per-clause risk scores in 0..1. Each rule counts once per
+    clause (and once for the document) at its severity.
+    """
+    by_clause, by_rule = {}, {}
+    for finding in findings:
+        rules = by_clause.setdefault(finding.get("clause"), {})
+        rules[finding["rule"]] = max(rules.get(finding["rule"], 0), finding["severity"])
+        by_rule[finding["rule"]] = max(by_rule.get(finding["rule"], 0), finding["severity"])
+    clauses = [
+        {"clause": clause, "score": _combined(rules.values()), "rules": sorted(rules)}
+        for clause, rules in by_clause.items()
+    ]
+    clauses.sort(key=lambda entry: entry["score"], reverse=True)
+    return {"score": _combined(by_rule.values()), "clauses": clauses}
+
+
+def default_rule_specs(keyword_engine=None):
+    """The historical checks as rules, from the keyword dictionaries"""
+    engine = keyword_engine or get_keyword_engine()
+    dictionaries = engine.dictionaries
+    specs = []
+    governing_law = dictionaries.get("clauses", {}).get("Governing Law")
+    if governing_law:
+        specs.append({"id": "missing:governing law", "type": "absence", "terms": governing_law,
+                      "message": "Missing Governing Law clause", "severity": "high"})
+    for term, terms in dictionaries.get("ambiguous", {}).items():
+        specs.append({"id": f"ambiguous:{term}", "type": "keyword", "terms": terms,
+                      "message": f"Ambiguous term: {term}", "severity": "low"})
+    for category, terms in dictionaries.get("risk", {}).items():
+        specs.append({"id": f"risk:{category}", "type": "keyword", "terms": terms,
+                      "message": f"Potential risk in {category} clause", "severity": "medium"})
+    return specs
+
+
+def load_rule_set(path=None, keyword_engine=None):
+    """RuleSet from a rules file (see the format above), or the built-in rules"""
+    if not path:
+        return RuleSet.from_specs(default_rule_specs(keyword_engine))
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    specs = data.get("rules", [])
+    if data.get("include_defaults", True):
+        own = {spec.get("id") for spec in specs}
+        # A file rule with a built-in id replaces the built-in one
+        specs = [s for s in default_rule_specs(keyword_engine) if s["id"] not in own] + specs
+    return RuleSet.from_specs(specs)
+
+
+_rule_set = None
+_source_path = None
+_source_key = None
+_last_check = 0.0
+_backfill_pending = False
+_rules_lock = threading.Lock()
+
+
+def configure_rule_source(path):
+    """Use a JSON rules file (None for the built-in rules)"""
+    global _source_path, _last_check
+    with _rules_lock:
+        _source_path = path or None
+        _last_check = 0.0
+    return reload_rule_set()
+
+
+def _current_source_key():
+    # Built-in rules come from the keyword dictionaries, so their version
+    # is part of the key as well
+    mtime = os.path.getmtime(_source_path) if _source_path else None
+    return (_source_path, mtime, get_keyword_engine().version)
+
+
+def reload_rule_set():
+    """Recompile the rules; a broken file keeps the previous rule set"""
+    global _rule_set, _source_key, _last_check, _backfill_pending
+    with _rules_lock:
+        try:
+            _source_key = _current_source_key()
+            rule_set = load_rule_set(_source_path)
+            # Built now, so a rule set that cannot be evaluated never goes live
+            rule_set.plan
+            if _rule_set is None or rule_set.version != _rule_set.version:
+                _backfill_pending = True
+                logger.info(f"Risk rules loaded ({len(rule_set.rules)} rules, version {rule_set.version})")
+            _rule_set = rule_set
+        except Exception as e:
+            logger.error(f"Risk rules reload failed: {e}")
+            if _rule_set is None:
+                _rule_set = load_rule_set(None)
+        _last_check = time.monotonic()
+        return _rule_set
+
+
+def get_rule_set():
+    """Current rule set, reloaded when the rules file or the dictionaries change"""
+    global _last_check
+    if _rule_set is None:
+        return reload_rule_set()
+    if time.monotonic() - _last_check > RELOAD_CHECK_INTERVAL:
+        try:
+            changed = _current_source_key() != _source_key
+        except OSError:
+            changed = False
+        if changed:
+            return reload_rule_set()
+        _last_check = time.monotonic()
+    return _rule_set
+
+
+# --------------------------------------------------
+# Backfill of stored documents
+# --------------------------------------------------
+BACKFILL_FIELDS = dict(TEXT_FIELDS, filename=1, upload_time=1, entity_index=1, entities=1,
+                       segment_index=1, risks=1, risk_findings=1, risk_rules=1, risk_ruleset=1)
+
+
+def refresh_document_risks(document, rule_set, rebuild=False):
+    """
+    Evaluate the rules of rule_set that have not run on document yet and
+    store the merged findings. Returns False when the document changed
+    meanwhile (another backfill got there first).
+    """
+    fingerprints = rule_set.fingerprints()
+    done = {} if rebuild else (document.get('risk_rules') or {})
+    stale = [rule_id for rule_id, fingerprint in fingerprints.items() if done.get(rule_id) != fingerprint]
+    # Findings of unchanged rules are kept; those of removed rules dropped
+    findings = [f for f in unpack_payload(document.get('risk_findings') or [])
+                if f["rule"] in fingerprints and f["rule"] not in stale]
+    text = None
+    if stale:
+        text = load_text(document)
+        findings += rule_set.subset(stale).evaluate(text, load_segment_index(document))
+    findings = rule_set.order(findings)
+    risks = rule_set.messages(findings)
+
+    result = documents_collection.update_one(
+        {"_id": document['_id'], "risk_ruleset": document.get('risk_ruleset')},
+        {"$set": {
+            "risks": pack_payload(risks),
+            "risk_findings": pack_payload(findings),
+            "risk_rules": fingerprints,
+            "risk_ruleset": rule_set.version
+        }}
+    )
+    # Not matched: another backfill stored its findings first. A rebuild that
+    # writes identical values matches without modifying
+    if not result.matched_count:
+        return False
+    if risks != unpack_payload(document.get('risks') or []):
+        # Search filters on risk tags
+        index_document(document, text if text is not None else load_text(document),
+                       document_entities(document), risks)
+    return True
+
+
+def backfill_risk_rules(rule_set=None, rebuild=False):
+    """Bring processed documents up to the current rules; returns (updated, skipped)"""
+    rule_set = rule_set or get_rule_set()
+    query = {"status": "processed"}
+    if not rebuild:
+        query["risk_ruleset"] = {"$ne": rule_set.version}
+    updated = skipped = 0
+    for document in documents_collection.find(query, BACKFILL_FIELDS):
+        try:
+            if refresh_document_risks(document, rule_set, rebuild=rebuild):
+                updated += 1
+            else:
+                skipped += 1
+        except Exception as e:
+            skipped += 1
+            current_app.logger.warning(f"Risk backfill of {document['_id']} failed: {e}")
+    return updated, skipped
+
+
+def _run_backfill(app):
+    with app.app_context():
+        started = time.monotonic()
+        try:
+            updated, skipped = backfill_risk_rules()
+            app.logger.info(
+                f"Risk backfill updated {updated} documents ({skipped} skipped) "
+                f"in {time.monotonic() - started:.1f}s"
+            )
+        except Exception as e:
+            app.logger.error(f"Risk backfill failed: {e}")
+
+
+def schedule_backfill(app, force=False):
+    """
+    Re-evaluate stored documents in a background thread after the rules
+    changed (RISK_BACKFILL=auto). Updates are compare-and-set per document,
+    so backfills running in several worker processes at once are harmless.
+    """
+    global _backfill_pending
+    get_rule_set()
+    with _rules_lock:
+        if not (_backfill_pending or force) or app.config.get('RISK_BACKFILL', 'auto') != 'auto':
+            return False
+        _backfill_pending = False
+    threading.Thread(target=_run_backfill, args=(app,), name="risk-backfill", daemon=True).start()
+    return True
+
+
+@click.command('risk-backfill')
+@click.option('--all', 'rebuild', is_flag=True, help='Re-evaluate every rule on every document')
+def backfill_command(rebuild):
+    """Evaluate new or changed risk rules on processed documents"""
+    updated, skipped = backfill_risk_rules(rebuild=rebuild)
+    click.echo(f"Updated {updated} documents ({skipped} skipped)")
+
+
+def init_risk_rules(app):
+    app.cli.add_command(backfill_command)
@@ -0,0 +1,253 @@
+from bson import ObjectId
+from datetime import datetime
+import click
+import re
+from app.config import documents_collection, search_index_collection
+from app.services.document_store import TEXT_FIELDS, document_entities, load_text, unpack_payload
+from app.utils.pagination import SORT_OPTIONS, decode_cursor, encode_cursor, keyset_filter, keyset_sort
+
+# One search_index entry per processed document, kept next to (not inside)
+# the documents collection:
+#   content       extracted text, under a Mongo text index with the entity
+#                 names and filename weighted higher
+#   entity_keys   "TYPE:normalized name" for exact entity filters
+#   risk_tags     normalized risk labels, e.g. "indemnification",
+#                 "ambiguous:reasonable efforts", "missing:governing law"
+ENTITY_TYPES = ("ORGANIZATION", "PERSON", "DATE", "LAW", "CLAUSES")
+TEXT_INDEX_WEIGHTS = {"entity_text": 5, "filename": 2, "content": 1}
+
+RISK_PATTERNS = (
+    (re.compile(r"^Potential risk in (.+) clause$"), "{0}"),
+    (re.compile(r"^Ambiguous term: (.+)$"), "ambiguous:{0}"),
+    (re.compile(r"^Missing (.+) clause$"), "missing:{0}"),
+)
+
+SNIPPET_CONTEXT = 80
+MAX_HIGHLIGHTS = 3
+
+
+def normalize_name(value):
+    return " ".join(str(value).lower().split())
+
+
+def entity_key(entity_type, name):
+    return f"{entity_type.upper()}:{normalize_name(name)}"
+
+
+def risk_tags(risks):
+    tags = set()
+    for risk in risks or []:
+        for pattern, template in RISK_PATTERNS:
+            match = pattern.match(risk)
+            if match:
+                tag = template.format(normalize_name(match.group(1)))
+                tags.add(tag)
+                if tag.startswith("ambiguous:"):
+                    tags.add("ambiguous")
+                break
+        else:
+            tags.add(normalize_name(risk))
+    return sorted(tags)
+
+
+def build_entry(document, text, entities, risks):
+    """Search entry from a document's text, entity records and risks"""
+    keys, names = set(), []
+    for record in entities or []:
+        if record["type"] not in ENTITY_TYPES:
+            continue
+        key = entity_key(record["type"], record["name"])
+        if key not in keys:
+            keys.add(key)
+            names.append(str(record["name"]))
+    return {
+        "filename": document.get('filename', ''),
+        "upload_time": document.get('upload_time'),
+        "content": text,
+        "entity_text": " ".join(names),
+        "entity_keys": sorted(keys),
+        "risk_tags": risk_tags(risks),
+        "indexed_at": datetime.utcnow()
+    }
+
+
+def index_document(document, text, entities, risks):
+    """Insert or refresh the search entry of one processed document"""
+    search_index_collection.replace_one(
+        {"_id": document['_id']},
+        build_entry(document, text, entities, risks),
+        upsert=True
+    )
+
+
+def remove_from_index(doc_id):
+    search_index_collection.delete_one({"_id": ObjectId(doc_id)})
+
+
+def reindex_documents(only_missing=True):
+    """Backfill the index from stored documents; returns how many were indexed"""
+    indexed = 0
+    existing = set()
+    if only_missing:
+        existing = {entry['_id'] for entry in search_index_collection.find({}, {"_id": 1})}
+    projection = dict(TEXT_FIELDS, filename=1, upload_time=1, entity_index=1, entities=1, risks=1)
+    for document in documents_collection.find({"status": "processed"}, projection):
+        if document['_id'] in existing:
+            continue
+        index_document(
+            document,
+            load_text(document),
+            document_entities(document),
+            unpack_payload(document.get('risks', []))
+        )
+        indexed += 1
+    return indexed
+
+
+@click.command('search-reindex')
+@click.option('--all', 'rebuild', is_flag=True, help='Re-index documents that already have an entry')
+def reindex_command(rebuild):
+    """Build search index entries for processed documents"""
+    click.echo(f"Indexed {reindex_documents(only_missing=not rebuild)} documents")
+
+
+def init_search(app):
+    app.cli.add_command(reindex_command)
+
+
+class SearchQuery:
+    """Parsed GET /documents/search parameters"""
+
+    def __init__(self, text=None, entities=(), risks=(), uploaded_after=None,
+                 uploaded_before=None, limit=10, cursor=None, sort=None):
+        self.text = (text or '').strip() or None
+        self.entities = [entity_key(t, n) for t, n in entities]
+        self.risks = [normalize_name(r) for r in risks]
+        self.uploaded_after = uploaded_after
+        self.uploaded_before = uploaded_before
+        self.limit = limit
+        self.cursor = cursor
+        # Ranked by relevance when there is text to rank, else newest first
+        self.sort = sort or ("relevance" if self.text else "-upload_time")
+
+    def filters(self):
+        query = {}
+        if self.entities:
+            query["entity_keys"] = {"$all": self.entities}
+        if self.risks:
+            query["risk_tags"] = {"$all": self.risks}
+        if self.uploaded_after or self.uploaded_before:
+            query["upload_time"] = {}
+            if self.uploaded_after:
+                query["upload_time"]["$gte"] = self.uploaded_after
+            if self.uploaded_before:
+                query["upload_time"]["$lt"] = self.uploaded_before
+        return query
+
+    def highlight_terms(self):
+        """Phrases and words of the text query, minus negated ones"""
+        if not self.text:
+            return []
+        phrases = re.findall(r'"([^"]+)"', self.text)
+        rest = re.sub(r'"[^"]*"', ' ', self.text)
+        words = [w for w in rest.split() if not w.startswith('-')]
+        return [p for p in phrases if p.strip()] + words
+
+
+def _highlights(text, terms):
+    """Up to MAX_HIGHLIGHTS snippets around the first matches of the query terms"""
+    if not terms:
+        return []
+    # Mongo stems query words, so a word also matches its longer forms
+    pattern = re.compile(
+        "|".join(r"\b" + r"\s+".join(re.escape(part) for part in term.split()) + r"\w*" for term in terms),
+        re.IGNORECASE
+    )
+    snippets = []
+    for match in pattern.finditer(text):
+        if snippets and match.start() < snippets[-1]["end"]:
+            snippets[-1]["end"] = max(snippets[-1]["end"], min(len(text), match.end() + SNIPPET_CONTEXT))
+            snippets[-1]["spans"].append((match.start(), match.end()))
+            continue
+        if len(snippets) == MAX_HIGHLIGHTS:
+            break
+        snippets.append({
+            "start": max(0, match.start() - SNIPPET_CONTEXT),
+            "end": min(len(text), match.end() + SNIPPET_CONTEXT),
+            "spans": [(match.start(), match.end())]
+        })
+    return [
+        {
+            "offset": s["start"],
+            "snippet": text[s["start"]:s["end"]],
+            "matches": [[a - s["start"], b - s["start"]] for a, b in s["spans"] if b <= s["end"]]
+        }
+        for s in snippets
+    ]
+
+
+def search_documents(query):
+    """One page of matching documents: (results, next_cursor)"""
+    filters = query.filters()
+    summary_fields = {"filename": 1, "upload_time": 1, "entity_keys": 1, "risk_tags": 1}
+
+    if query.sort == "relevance":
+        if not query.text:
+            raise ValueError("Relevance sort needs a text query")
+        pipeline = [
+            {"$match": dict(filters, **{"$text": {"$search": query.text}})},
+            {"$addFields": {"score": {"$meta": "textScore"}}}
+        ]
+        if query.cursor:
+            score, last_id = decode_cursor(query.cursor, query.sort)
+            pipeline.append({"$match": keyset_filter("score", -1, score, last_id)})
+        pipeline += [
+            {"$sort": {"score": -1, "_id": -1}},
+            {"$limit": query.limit + 1},
+            {"$project": dict(summary_fields, score=1)}
+        ]
+        entries = list(search_index_collection.aggregate(pipeline))
+        field = "score"
+    else:
+        field, direction = SORT_OPTIONS[query.sort]
+        if query.text:
+            filters["$text"] = {"$search": query.text}
+        if query.cursor:
+            value, last_id = decode_cursor(query.cursor, query.sort)
+            filters = {"$and": [filters, keyset_filter(field, direction, value, last_id)]}
+        entries = list(
+            search_index_collection.find(filters, summary_fields)
+            .sort(keyset_sort(field, direction))
+            .limit(query.limit + 1)
+        )
+
+    next_cursor = None
+    if len(entries) > query.limit:
+        entries = entries[:query.limit]
+        next_cursor = encode_cursor(query.sort, entries[-1].get(field), entries[-1]['_id'])
+
+    # Highlights only need the text of the documents on this page
+    terms = query.highlight_terms()
+    contents = {}
+    if terms and entries:
+        contents = {
+            entry['_id']: entry.get('content', '')
+            for entry in search_index_collection.find(
+                {"_id": {"$in": [e['_id'] for e in entries]}}, {"content": 1}
+            )
+        }
+
+    results = []
+    for entry in entries:
+        result = {
+            "id": str(entry['_id']),
+            "filename": entry.get('filename', ''),
+            "upload_date": entry['upload_time'].isoformat() if entry.get('upload_time') else None,
+            "risks": entry.get('risk_tags', []),
+            "matched_entities": [k for k in entry.get('entity_keys', []) if k in query.entities],
+            "highlights": _highlights(contents.get(entry['_id'], ''), terms)
+        }
+        if "score" in entry:
+            result["score"] = round(entry["score"], 4)
+        results.append(result)
+    return results, next_cursor
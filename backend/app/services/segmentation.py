@@ -0,0 +1,236 @@
+from array import array
+from bisect import bisect_left, bisect_right
+import json
+import re
+import struct
+from app.services.normalization import pack_int_arrays, unpack_int_arrays
+
+# Bumped whenever detection changes; older stored indexes are then ignored
+SEGMENTATION_VERSION = 1
+
+INDEX_MAGIC = b'LMS1'
+_HEADER = struct.Struct('<4sIIIIII')
+
+# A clause number opens the text, a page or a sentence, and is followed by a
+# capitalised word: "4.2 Payment Terms. The ...", "Section 7 TERMINATION",
+# "§ 12.1 Notices". Normalized text has no line breaks inside a page, so
+# headings are only recognisable by their numbering.
+CLAUSE_NUMBER = re.compile(
+    r'(?:^|(?<=\n)|(?<=[.;:!?] ))'
+    r'(?:(?:Section|SECTION|Article|ARTICLE|Clause|CLAUSE|§) ?)?'
+    r'(\d{1,3}(?:\.\d{1,3}){0,4})\.? (?=[A-Z(“"])'
+)
+_HEADING_WORD = r"(?:[A-Z][\w'’&/-]*|and|of|the|to|for|in|on|or|&)"
+# "Payment Terms." / "Governing Law:" after the number
+TITLE_HEADING = re.compile(rf"({_HEADING_WORD}(?: {_HEADING_WORD}){{0,7}})[.:](?= |$)")
+# "TERMINATION Either party ..." (upper-case heading without punctuation)
+CAPS_HEADING = re.compile(r"([A-Z][A-Z'’&/-]+(?: [A-Z][A-Z'’&/-]+){0,7})(?= [A-Z][a-z]| \(|[.:]|$)")
+
+# A clause may skip a few numbers (4.1 -> 4.3) and still count as the next one
+MAX_NUMBER_GAP = 3
+
+# Numbering that restarts (schedules, annexes) repeats clause numbers; later
+# occurrences of a number get its occurrence as a suffix: "4", "4~2", "4~3"
+OCCURRENCE_SEPARATOR = "~"
+
+
+def _parts(number):
+    return tuple(int(part) for part in number.split('.'))
+
+
+def _follows(parts, last):
+    """Whether numbering `parts` plausibly comes right after `last`"""
+    if last is None or parts == (1,):
+        # First clause, or numbering restarting (schedules, annexes)
+        return all(part <= MAX_NUMBER_GAP for part in parts)
+    if parts == last + (1,):
+        return True
+    for depth in range(min(len(parts), len(last))):
+        if parts[:depth] != last[:depth]:
+            break
+        if len(parts) == depth + 1 and last[depth] < parts[depth] <= last[depth] + MAX_NUMBER_GAP:
+            return True
+    return False
+
+
+def _heading(text, pos):
+    for pattern in (CAPS_HEADING, TITLE_HEADING):
+        match = pattern.match(text, pos)
+        if match:
+            return match.group(1)
+    return ""
+
+
+def detect_clauses(text):
+    """(start, number, heading) of every numbered clause, in order"""
+    clauses, last = [], None
+    for match in CLAUSE_NUMBER.finditer(text):
+        number = match.group(1)
+        parts = _parts(number)
+        # Amounts, dates and cross-references also look like numbers: only
+        # a consistent numbering sequence is taken for clauses
+        if not _follows(parts, last):
+            continue
+        clauses.append((match.start(), number, _heading(text, match.end())))
+        last = parts
+    return clauses
+
+
+def qualified_clause_ids(numbers):
+    """Unique clause identifiers: the number, qualified by its occurrence when repeated"""
+    seen, ids = {}, []
+    for number in numbers:
+        seen[number] = seen.get(number, 0) + 1
+        ids.append(number if seen[number] == 1 else f"{number}{OCCURRENCE_SEPARATOR}{seen[number]}")
+    return ids
+
+
+class SegmentIndex:
+    """
+    Structure of a normalized document: sentences, numbered clauses (with
+    their headings; level-1 clauses are the sections) and pages, as parallel
+    columns of character offsets.
+    """
+
+    def __init__(self, sentence_starts, sentence_ends, clause_starts, clause_ends, clause_levels,
+                 clause_numbers, clause_headings, page_starts, length, clause_ids=None):
+        self.sentence_starts = sentence_starts
+        self.sentence_ends = sentence_ends
+        self.clause_starts = clause_starts
+        self.clause_ends = clause_ends
+        self.clause_levels = clause_levels
+        self.clause_numbers = clause_numbers
+        # Derived from the numbers, so not stored; a window keeps its parent's ids
+        self.clause_ids = qualified_clause_ids(clause_numbers) if clause_ids is None else clause_ids
+        self.clause_headings = clause_headings
+        self.page_starts = page_starts
+        self.length = length
+
+    @property
+    def sentence_count(self):
+        return len(self.sentence_starts)
+
+    @property
+    def clause_count(self):
+        return len(self.clause_starts)
+
+    def sentence_spans(self):
+        return list(zip(self.sentence_starts, self.sentence_ends))
+
+    def page_for(self, offset):
+        """1-based page number containing a character offset"""
+        return max(bisect_right(self.page_starts, offset), 1)
+
+    def pages_for(self, start, end):
+        return list(range(self.page_for(start), self.page_for(max(start, end - 1)) + 1))
+
+    def clause_at(self, offset):
+        """Index of the innermost clause containing offset, or None"""
+        index = bisect_right(self.clause_starts, offset) - 1
+        while index >= 0 and self.clause_ends[index] <= offset:
+            index -= 1
+        return index if index >= 0 else None
+
+    def find_clause(self, clause_id):
+        """Index of the clause with this id ("4.2", or "4.2~2" for a repeated number), or None"""
+        try:
+            return self.clause_ids.index(clause_id)
+        except ValueError:
+            return None
+
+    def clause(self, index):
+        start, end = self.clause_starts[index], self.clause_ends[index]
+        return {
+            "id": self.clause_ids[index],
+            "number": self.clause_numbers[index],
+            "heading": self.clause_headings[index],
+            "level": self.clause_levels[index],
+            "start": start,
+            "end": end,
+            "pages": self.pages_for(start, end)
+        }
+
+    def children(self, index):
+        """Indices of the clauses directly below clause `index`"""
+        level, end = self.clause_levels[index], self.clause_ends[index]
+        found = []
+        for child in range(index + 1, self.clause_count):
+            if self.clause_starts[child] >= end:
+                break
+            if self.clause_levels[child] == level + 1:
+                found.append(child)
+        return found
+
+    def outline(self, max_level=None):
+        return [self.clause(i) for i in range(self.clause_count)
+                if max_level is None or self.clause_levels[i] <= max_level]
+
+    def window(self, start, end):
+        """The sentences and clauses inside [start, end), offsets relative to start"""
+        first = bisect_left(self.sentence_starts, start)
+        last = bisect_left(self.sentence_starts, end)
+        sentences = [(max(s, start) - start, min(e, end) - start)
+                     for s, e in zip(self.sentence_starts[first:last], self.sentence_ends[first:last])]
+        c_first = bisect_left(self.clause_starts, start)
+        c_last = bisect_left(self.clause_starts, end)
+        return SegmentIndex(
+            array('q', (s for s, _ in sentences)),
+            array('q', (e for _, e in sentences)),
+            array('q', (s - start for s in self.clause_starts[c_first:c_last])),
+            array('q', (min(e, end) - start for e in self.clause_ends[c_first:c_last])),
+            self.clause_levels[c_first:c_last],
+            self.clause_numbers[c_first:c_last],
+            self.clause_headings[c_first:c_last],
+            array('q', [0]),
+            end - start,
+            self.clause_ids[c_first:c_last]
+        )
+
+    def to_bytes(self):
+        meta = json.dumps(
+            {"numbers": self.clause_numbers, "headings": self.clause_headings},
+            separators=(',', ':')
+        ).encode('utf-8')
+        header = _HEADER.pack(INDEX_MAGIC, SEGMENTATION_VERSION, len(meta), self.sentence_count,
+                              self.clause_count, len(self.page_starts), self.length)
+        arrays = [self.sentence_starts, self.sentence_ends, self.clause_starts, self.clause_ends,
+                  self.clause_levels, self.page_starts]
+        return header + meta + pack_int_arrays(arrays)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, meta_size, sentences, clauses, pages, length = _HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC:
+            raise ValueError("Not a segmentation index")
+        offset = _HEADER.size
+        meta = json.loads(data[offset:offset + meta_size])
+        starts, ends, c_starts, c_ends, levels, page_starts = unpack_int_arrays(
+            data, offset + meta_size, (sentences, sentences, clauses, clauses, clauses, pages)
+        )
+        return cls(starts, ends, c_starts, c_ends, levels, meta["numbers"], meta["headings"],
+                   page_starts, length)
+
+
+def build_segment_index(text, sentence_spans, page_offsets=(0,)):
+    """SegmentIndex of text from its sentence spans and page start offsets"""
+    found = detect_clauses(text)
+    levels = [number.count('.') + 1 for _, number, _ in found]
+
+    # A clause runs until the next clause at the same or a higher level
+    ends, open_clauses = [len(text)] * len(found), []
+    for index, ((start, _, _), level) in enumerate(zip(found, levels)):
+        while open_clauses and levels[open_clauses[-1]] >= level:
+            ends[open_clauses.pop()] = start
+        open_clauses.append(index)
+
+    return SegmentIndex(
+        array('q', (start for start, _ in sentence_spans)),
+        array('q', (end for _, end in sentence_spans)),
+        array('q', (start for start, _, _ in found)),
+        array('q', ends),
+        array('q', levels),
+        [number for _, number, _ in found],
+        [heading for _, _, heading in found],
+        array('q', page_offsets or (0,)),
+        len(text)
+    )
@@ -0,0 +1,228 @@
+from flask import current_app
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import re
+import threading
+from app.config import Config
+from app.services.call_governor import get_call_governor, submit_with_context
+from app.services.result_cache import LRUCache, get_analysis_cache
+from gcp.stubs import StubTextGenerationModel
+
+# Prompts end with a blank line followed by the content to summarize
+MAP_PROMPT = "Summarize the following excerpt of a legal contract in a few sentences:\n\n"
+REDUCE_PROMPT = "Combine these partial summaries of one legal contract into a single summary:\n\n"
+
+# Bumped whenever prompts or chunking change so cached chunk summaries expire
+PROMPT_VERSION = "1"
+
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?;])\s+')
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English prose
+    return len(text) // 4 + 1
+
+
+def split_sentences(text):
+    return [s for s in _SENTENCE_BOUNDARY.split(text) if s.strip()]
+
+
+def _split_oversized(sentence, budget):
+    # A single sentence above the budget is split on word boundaries
+    words = sentence.split()
+    piece, pieces = [], []
+    for word in words:
+        piece.append(word)
+        if estimate_tokens(" ".join(piece)) >= budget:
+            pieces.append(" ".join(piece))
+            piece = []
+    if piece:
+        pieces.append(" ".join(piece))
+    return pieces
+
+
+def _content_defined_groups(pieces, token_budget, min_tokens):
+    """Indices of consecutive pieces grouped into chunks (see chunk_text)"""
+    groups, current, current_tokens = [], [], 0
+    for index, piece in enumerate(pieces):
+        tokens = estimate_tokens(piece)
+        if current and current_tokens + tokens > token_budget:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+        digest = hashlib.blake2b(piece.encode('utf-8'), digest_size=2).digest()
+        if current_tokens >= min_tokens and digest[0] % 4 == 0:
+            groups.append(current)
+            current, current_tokens = [], 0
+    if current:
+        groups.append(current)
+    return groups
+
+
+def chunk_text(text, token_budget, min_tokens=None, sentences=None):
+    """
+    Split text on sentence boundaries into chunks of at most token_budget.
+
+    Boundaries are content-defined: once a chunk holds min_tokens, it closes
+    after any sentence whose hash selects it. An edit therefore only changes
+    the chunks around it, and untouched chunks keep their cached summaries.
+    """
+    min_tokens = min_tokens or token_budget // 2
+    pieces = []
+    for sentence in (sentences if sentences is not None else split_sentences(text)):
+        if estimate_tokens(sentence) > token_budget:
+            pieces.extend(_split_oversized(sentence, token_budget))
+        else:
+            pieces.append(sentence)
+    return [" ".join(pieces[i] for i in group)
+            for group in _content_defined_groups(pieces, token_budget, min_tokens)]
+
+
+def chunk_spans(text, token_budget, min_tokens=None, sentence_spans=None):
+    """
+    (start, end) offsets of content-defined chunks of text. Unlike
+    chunk_text, each chunk is an exact slice, so offsets found inside a
+    chunk map back onto the document. sentence_spans (e.g. from the
+    segmentation index) replace the regex sentence split.
+    """
+    min_tokens = min_tokens or token_budget // 2
+    if sentence_spans is not None:
+        spans = list(sentence_spans)
+    else:
+        spans, start = [], 0
+        for match in _SENTENCE_BOUNDARY.finditer(text):
+            spans.append((start, match.start()))
+            start = match.end()
+        spans.append((start, len(text)))
+
+    pieces = []
+    for start, end in spans:
+        if not text[start:end].strip():
+            continue
+        if estimate_tokens(text[start:end]) <= token_budget:
+            pieces.append((start, end))
+            continue
+        # Oversized sentence: cut at the whitespace nearest each budget
+        limit = token_budget * 4
+        while end - start > limit:
+            cut = text.rfind(' ', start, start + limit)
+            cut = cut if cut > start else start + limit
+            pieces.append((start, cut))
+            start = cut
+        pieces.append((start, end))
+
+    groups = _content_defined_groups([text[a:b] for a, b in pieces], token_budget, min_tokens)
+    return [(pieces[group[0]][0], pieces[group[-1]][1]) for group in groups]
+
+
+class SummarizationEngine:
+    """Map-reduce summarization with bounded parallelism and per-chunk caching"""
+
+    def __init__(self, model_provider, model_name, token_budget=6000, max_parallel=4,
+                 chunk_output_tokens=256, output_tokens=150, cache=None, governor=None):
+        # Zero-argument callable returning the model, resolved on every call
+        self.model_provider = model_provider
+        self.model_name = model_name
+        self.token_budget = token_budget
+        self.max_parallel = max_parallel
+        self.chunk_output_tokens = chunk_output_tokens
+        self.output_tokens = output_tokens
+        # Without a shared cache, chunk summaries are kept in process only
+        self.cache = cache
+        self._local_cache = LRUCache(4096) if cache is None else None
+        # Rate limits, retries and the circuit breaker for model calls
+        self.governor = governor
+
+    @property
+    def version(self):
+        # Also the summary stage version: everything a summary depends on
+        return (f"{self.model_name}|p{PROMPT_VERSION}|{self.token_budget}|"
+                f"{self.chunk_output_tokens}|{self.output_tokens}")
+
+    def _predict(self, prompt, max_output_tokens, key=None):
+        def predict(timeout):
+            # TextGenerationModel.predict has no public timeout: the governor's
+            # deadline decides whether the call starts, and bounds its waits
+            response = self.model_provider().predict(
+                prompt,
+                max_output_tokens=max_output_tokens,
+                temperature=0.2
+            )
+            return response.text
+
+        if self.governor is None:
+            return predict(None)
+        # Identical prompts in flight at once (same chunk of two uploads) share one call
+        return self.governor.call("vertex", predict, key=key)
+
+    def _summarize_chunk(self, prefix, content, max_output_tokens):
+        digest = hashlib.sha256(f"{prefix}{max_output_tokens}\n{content}".encode('utf-8')).hexdigest()
+        if self.cache is not None:
+            summary = self.cache.get_value("chunk", digest, self.version)
+        else:
+            summary = self._local_cache.get((digest, self.version))
+        if summary is not None:
+            return summary
+
+        summary = self._predict(prefix + content, max_output_tokens, key=digest)
+        if self.cache is not None:
+            self.cache.set_value("chunk", digest, self.version, summary)
+        else:
+            self._local_cache.set((digest, self.version), summary)
+        return summary
+
+    def _map(self, prefix, pieces, max_output_tokens):
+        if len(pieces) == 1:
+            return [self._summarize_chunk(prefix, pieces[0], max_output_tokens)]
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel, len(pieces))) as pool:
+            futures = [
+                submit_with_context(pool, self._summarize_chunk, prefix, piece, max_output_tokens)
+                for piece in pieces
+            ]
+            return [future.result() for future in futures]
+
+    def summarize(self, text, sentences=None):
+        chunks = chunk_text(text, self.token_budget, sentences=sentences)
+        if not chunks:
+            return ""
+        if len(chunks) == 1:
+            return self._summarize_chunk(MAP_PROMPT, chunks[0], self.output_tokens)
+
+        partials = self._map(MAP_PROMPT, chunks, self.chunk_output_tokens)
+
+        # Reduce level by level until the partial summaries fit one prompt
+        while estimate_tokens(" ".join(partials)) > self.token_budget:
+            groups = chunk_text("", self.token_budget, sentences=partials)
+            if len(groups) >= len(partials):
+                break
+            partials = self._map(REDUCE_PROMPT, groups, self.chunk_output_tokens)
+
+        return self._summarize_chunk(REDUCE_PROMPT, "\n".join(partials), self.output_tokens)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_summarization_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            config = current_app.config
+            if config.get('SUMMARY_BACKEND') == 'fake':
+                fake = StubTextGenerationModel('fake')
+                provider, model_name, cache, governor = (lambda: fake), 'fake', None, None
+            else:
+                provider = lambda: Config.VERTEX_MODEL
+                model_name, cache = config.get('VERTEX_MODEL_NAME'), get_analysis_cache()
+                governor = get_call_governor()
+            _engine = SummarizationEngine(
+                provider,
+                model_name,
+                token_budget=config.get('SUMMARY_CHUNK_TOKENS', 6000),
+                max_parallel=config.get('SUMMARY_MAX_PARALLEL', 4),
+                cache=cache,
+                governor=governor
+            )
+        return _engine
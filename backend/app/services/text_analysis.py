@@ -0,0 +1,108 @@
+import threading
+from bisect import bisect_right
+from app.services.metrics import span
+from app.utils.keyword_engine import get_keyword_engine
+
+# Detectors only need sentence boundaries, so the parser, tagger, lemmatizer
+# and NER are excluded and the lightweight "senter" component is used instead
+SENTENCE_PIPELINE_EXCLUDE = ["parser", "tagger", "attribute_ruler", "lemmatizer", "ner"]
+
+# Without the parser the pipeline is cheap enough to accept long contracts
+SENTENCE_PIPELINE_MAX_LENGTH = 5_000_000
+
+
+def load_sentence_pipeline(model="en_core_web_sm"):
+    import spacy
+    nlp = spacy.load(model, exclude=SENTENCE_PIPELINE_EXCLUDE)
+    if "senter" in nlp.component_names:
+        nlp.enable_pipe("senter")
+    else:
+        nlp.add_pipe("sentencizer")
+    nlp.max_length = SENTENCE_PIPELINE_MAX_LENGTH
+    return nlp
+
+
+# Load SpaCy model once, on first use or during warm-up
+_nlp = None
+_nlp_lock = threading.Lock()
+
+
+def get_sentence_pipeline():
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                _nlp = load_sentence_pipeline()
+    return _nlp
+
+
+def sentence_pipeline_loaded():
+    return _nlp is not None
+
+
+class AnalysisContext:
+    """
+    Per-document state shared by the clause and risk detectors.
+
+    The text is scanned once by the compiled keyword engine and parsed at most
+    once, on first access, even when several detectors run concurrently.
+    With a stored segment_index (see segmentation) it is not parsed at all.
+    """
+
+    def __init__(self, text, keyword_engine=None, segment_index=None):
+        self.text = text
+        self.keyword_engine = keyword_engine or get_keyword_engine()
+        self.segment_index = segment_index
+        self._keywords = None
+        self._sentence_spans = None
+        self._sentence_starts = None
+        self._lock = threading.Lock()
+        if segment_index is not None:
+            self._sentence_starts = segment_index.sentence_starts
+            self._sentence_spans = segment_index.sentence_spans()
+
+    @property
+    def keywords(self):
+        """KeywordScan of every dictionary term in the document"""
+        if self._keywords is None:
+            with self._lock:
+                if self._keywords is None:
+                    self._keywords = self.keyword_engine.scan(self.text)
+        return self._keywords
+
+    @property
+    def sentence_spans(self):
+        """(start, end) character offsets of every sentence"""
+        if self._sentence_spans is None:
+            with self._lock:
+                if self._sentence_spans is None:
+                    with span("spacy_parse"):
+                        doc = get_sentence_pipeline()(self.text)
+                    spans = [(s.start_char, s.end_char) for s in doc.sents]
+                    self._sentence_starts = [start for start, _ in spans]
+                    self._sentence_spans = spans
+        return self._sentence_spans
+
+    def sentence_index(self, offset):
+        """Index of the sentence containing a character offset"""
+        self.sentence_spans
+        return max(bisect_right(self._sentence_starts, offset) - 1, 0)
+
+
+def clause_sentences(context):
+    """(label, sentence span) for every sentence mentioning a clause term, in order"""
+    labels = context.keyword_engine.category_order("clauses")
+    order = {label: i for i, label in enumerate(labels)}
+    matches = [m for m in context.keywords.matches if m.group == "clauses"]
+    if not matches:
+        # No clause terms anywhere: skip the sentence pass entirely
+        return []
+
+    found = {(context.sentence_index(m.start), order[m.category]) for m in matches}
+    spans = context.sentence_spans
+    return [(labels[label_index], spans[index]) for index, label_index in sorted(found)]
+
+
+def detect_clauses(context):
+    """Clause labels found sentence by sentence (one entry per matching sentence)"""
+    return [label for label, _ in clause_sentences(context)]
@@ -0,0 +1,178 @@
+from bson import ObjectId
+from difflib import SequenceMatcher
+import re
+from pymongo import DESCENDING, ReturnDocument
+from app.config import documents_collection, families_collection
+from app.services.document_store import TEXT_FIELDS, document_entities, load_text, unpack_payload
+from app.services.entity_model import entity_names
+from app.services.error_handlers import DocumentProcessingError
+
+# Every document belongs to a family (one contract across its revisions).
+# A first upload starts a family whose id is the document's own id at
+# version 1; families_collection only holds the version counter:
+#   {"_id": family_id, "latest_version": n}
+SEGMENT_BOUNDARY = re.compile(r'(?<=[.!?;])\s+|\n')
+MAX_DELTA_CHANGES = 200
+CHANGE_PREVIEW_CHARS = 200
+
+
+def family_of(document):
+    return document.get('family_id') or document['_id']
+
+
+def next_version(parent):
+    """Reserve the next version number in the parent document's family"""
+    family_id = family_of(parent)
+    # Families created before versioning have no counter yet: seed it with
+    # the parent's version before incrementing
+    families_collection.update_one(
+        {"_id": family_id},
+        {"$max": {"latest_version": parent.get('version', 1)}},
+        upsert=True
+    )
+    family = families_collection.find_one_and_update(
+        {"_id": family_id},
+        {"$inc": {"latest_version": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    return family_id, family["latest_version"]
+
+
+def previous_version(document, projection=None):
+    """Latest processed version of the same family older than document"""
+    if not document.get('family_id') or document.get('version', 1) <= 1:
+        return None
+    return documents_collection.find_one(
+        {
+            "family_id": document['family_id'],
+            "version": {"$lt": document['version']},
+            "status": "processed"
+        },
+        projection,
+        sort=[("version", DESCENDING)]
+    )
+
+
+def family_versions(document):
+    family_id = family_of(document)
+    return list(documents_collection.find(
+        {"$or": [{"family_id": family_id}, {"_id": family_id}]},
+        {"filename": 1, "upload_time": 1, "status": 1, "version": 1,
+         "previous_id": 1, "version_delta.summary": 1}
+    ).sort("version", DESCENDING))
+
+
+def _segments(text):
+    """(start, end) offsets of the sentences / page lines of text"""
+    spans, start = [], 0
+    for match in SEGMENT_BOUNDARY.finditer(text):
+        if match.start() > start:
+            spans.append((start, match.start()))
+        start = match.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+def diff_segments(old_text, new_text):
+    """Segment-level opcodes turning old_text into new_text"""
+    old_spans, new_spans = _segments(old_text), _segments(new_text)
+    old = [old_text[a:b] for a, b in old_spans]
+    new = [new_text[a:b] for a, b in new_spans]
+    matcher = SequenceMatcher(None, old, new, autojunk=False)
+
+    counts = {"unchanged": 0, "inserted": 0, "deleted": 0, "replaced": 0}
+    changes = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            counts["unchanged"] += i2 - i1
+            continue
+        counts[{"insert": "inserted", "delete": "deleted", "replace": "replaced"}[tag]] += max(i2 - i1, j2 - j1)
+        if len(changes) < MAX_DELTA_CHANGES:
+            change = {"op": tag}
+            if i2 > i1:
+                change["old"] = {"start": old_spans[i1][0], "end": old_spans[i2 - 1][1],
+                                 "preview": old_text[old_spans[i1][0]:old_spans[i2 - 1][1]][:CHANGE_PREVIEW_CHARS]}
+            if j2 > j1:
+                change["new"] = {"start": new_spans[j1][0], "end": new_spans[j2 - 1][1],
+                                 "preview": new_text[new_spans[j1][0]:new_spans[j2 - 1][1]][:CHANGE_PREVIEW_CHARS]}
+            changes.append(change)
+
+    total = max(len(old), len(new), 1)
+    counts["similarity"] = round(matcher.ratio(), 4)
+    counts["changed_fraction"] = round(1 - counts["unchanged"] / total, 4)
+    return counts, changes
+
+
+def _normalized(name):
+    return " ".join(str(name).lower().split())
+
+
+def _list_delta(old, new):
+    old_keys = {_normalized(v) for v in old}
+    new_keys = {_normalized(v) for v in new}
+    return (
+        [v for v in dict.fromkeys(new) if _normalized(v) not in old_keys],
+        [v for v in dict.fromkeys(old) if _normalized(v) not in new_keys]
+    )
+
+
+def entity_delta(old_entities, new_entities):
+    added, removed = {}, {}
+    for ent_type in sorted(set(old_entities) | set(new_entities)):
+        plus, minus = _list_delta(old_entities.get(ent_type, []), new_entities.get(ent_type, []))
+        if plus:
+            added[ent_type] = plus
+        if minus:
+            removed[ent_type] = minus
+    return {"added": added, "removed": removed}
+
+
+def compute_delta(old_doc, old_text, new_doc, new_text, new_analysis=None):
+    """
+    Segment, entity and risk differences from old_doc to new_doc. The new
+    side's analysis can be passed in when it is not stored yet.
+    """
+    new_analysis = new_analysis or {
+        "entities": document_entities(new_doc),
+        "risks": unpack_payload(new_doc.get('risks', [])),
+        "summary": new_doc.get('summary', '')
+    }
+    old_entities = entity_names(document_entities(old_doc))
+    old_risks = unpack_payload(old_doc.get('risks', []))
+
+    counts, changes = diff_segments(old_text, new_text)
+    risks_added, risks_removed = _list_delta(old_risks, new_analysis.get("risks", []))
+    entities = entity_delta(old_entities, entity_names(new_analysis.get("entities", [])))
+    return {
+        "from": {"id": str(old_doc['_id']), "version": old_doc.get('version', 1)},
+        "to": {"id": str(new_doc['_id']), "version": new_doc.get('version', 1)},
+        "summary": {
+            "segments": counts,
+            "risks_added": len(risks_added),
+            "risks_removed": len(risks_removed),
+            "entities_added": sum(len(v) for v in entities["added"].values()),
+            "entities_removed": sum(len(v) for v in entities["removed"].values()),
+            "summary_changed": old_doc.get('summary', '') != new_analysis.get("summary", '')
+        },
+        "segments": changes,
+        "risks": {"added": risks_added, "removed": risks_removed},
+        "entities": entities
+    }
+
+
+DELTA_FIELDS = dict(TEXT_FIELDS, entity_index=1, entities=1, risks=1, summary=1, version=1, family_id=1)
+
+
+def delta_between(old_id, new_id):
+    """compute_delta for two stored, processed documents"""
+    docs = {}
+    for doc_id in (old_id, new_id):
+        doc = documents_collection.find_one({"_id": ObjectId(doc_id)}, dict(DELTA_FIELDS, status=1))
+        if not doc:
+            raise DocumentProcessingError("Document not found", 404)
+        if doc.get('status', 'processed') != 'processed':
+            raise DocumentProcessingError("Document is not processed yet", 409)
+        docs[doc_id] = doc
+    old_doc, new_doc = docs[old_id], docs[new_id]
+    return compute_delta(old_doc, load_text(old_doc), new_doc, load_text(new_doc))
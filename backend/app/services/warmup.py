@@ -0,0 +1,110 @@
+import threading
+import time
+from app.config import get_database
+from app.services.text_analysis import get_sentence_pipeline, sentence_pipeline_loaded
+from app.services.entity_backends import get_entity_backend
+from app.services.risk_rules import get_rule_set, schedule_backfill
+from app.utils.keyword_engine import get_keyword_engine
+from gcp.clients import registry as gcp_clients
+
+
+class Readiness:
+    """Warm-up progress shared by the warm-up thread and the /ready endpoint"""
+
+    def __init__(self):
+        self.started_at = None
+        self.finished_at = None
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    @property
+    def complete(self):
+        return self.finished_at is not None
+
+    def record_error(self, component, error):
+        with self._lock:
+            self.errors[component] = str(error)
+
+    def to_dict(self):
+        duration = None
+        if self.started_at is not None and self.finished_at is not None:
+            duration = round(self.finished_at - self.started_at, 3)
+        return {
+            "warm_up_complete": self.complete,
+            "warm_up_seconds": duration,
+            "errors": dict(self.errors)
+        }
+
+
+def warm_up(app, fork_safe_only=False):
+    """
+    Load every heavy resource now instead of on the first request.
+
+    With fork_safe_only, only in-memory models are loaded (spaCy, keyword
+    automata): a preforking server calls this in its master so workers share
+    them copy-on-write. Mongo connections and gRPC channels are per process
+    and are opened by each worker on first use.
+    """
+    readiness = app.extensions['readiness']
+    readiness.started_at = time.monotonic()
+    steps = [
+        ("spacy", get_sentence_pipeline),
+        ("keywords", get_keyword_engine),
+        ("risk rules", lambda: get_rule_set().plan),
+        ("ner", lambda: get_entity_backend().warm_up()),
+    ]
+    if not fork_safe_only:
+        steps += [
+            # Connecting also creates the indexes
+            ("mongo", lambda: get_database().command('ping')),
+        ]
+        if app.config.get('SUMMARY_BACKEND') != 'fake':
+            steps.append(("vertex", lambda: gcp_clients.vertex_model(app.config['VERTEX_MODEL_NAME'])))
+        steps.append(("language", gcp_clients.language))
+
+    with app.app_context():
+        for component, step in steps:
+            try:
+                step()
+            except Exception as e:
+                app.logger.error(f"Warm-up of {component} failed: {e}")
+                readiness.record_error(component, e)
+
+    readiness.finished_at = time.monotonic()
+    app.logger.info(f"Warm-up finished in {readiness.finished_at - readiness.started_at:.2f}s")
+
+    if not fork_safe_only:
+        # With Mongo reachable, catch stored documents up with the rules
+        schedule_backfill(app)
+
+
+def init_warm_up(app):
+    app.extensions['readiness'] = Readiness()
+    mode = app.config.get('WARM_UP', 'background')
+    if mode == 'sync':
+        warm_up(app)
+    elif mode == 'preload':
+        warm_up(app, fork_safe_only=True)
+    elif mode == 'background':
+        threading.Thread(target=warm_up, args=(app,), name="warm-up", daemon=True).start()
+
+
+def readiness_report(app):
+    """(ready, details) for the /ready endpoint"""
+    readiness = app.extensions['readiness']
+    components = {
+        "spacy": sentence_pipeline_loaded(),
+        "mongo": True,
+        "gcp_clients": gcp_clients.loaded()
+    }
+    details = readiness.to_dict()
+    try:
+        get_database().command('ping')
+    except Exception as e:
+        components["mongo"] = False
+        details["errors"]["mongo"] = str(e)
+
+    details["components"] = components
+    mode = app.config.get('WARM_UP', 'background')
+    warmed = readiness.complete or mode == 'off'
+    return warmed and components["mongo"], details
@@ -4,18 +4,34 @@
 # File handling utilities
 from .file_utils import (
     secure_filename,
-    save_uploaded_file
+    write_upload,
+    UploadRejected
 )
 
 # NLP constants and helpers
 from .nlp_utils import (
     RISK_KEYWORDS,
-    AMBIGUOUS_TERMS
+    AMBIGUOUS_TERMS,
+    CLAUSE_KEYWORDS
+)
+
+# Compiled keyword matching
+from .keyword_engine import (
+    KeywordEngine,
+    get_keyword_engine,
+    reload_keyword_engine,
+    configure_keyword_source
 )
 
 __all__ = [
     'secure_filename',
-    'save_uploaded_file',
+    'write_upload',
+    'UploadRejected',
     'RISK_KEYWORDS',
-    'AMBIGUOUS_TERMS'
+    'AMBIGUOUS_TERMS',
+    'CLAUSE_KEYWORDS',
+    'KeywordEngine',
+    'get_keyword_engine',
+    'reload_keyword_engine',
+    'configure_keyword_source'
 ]
\ No newline at end of file
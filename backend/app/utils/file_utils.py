@@ -1,11 +1,111 @@
 from werkzeug.utils import secure_filename
+from collections import namedtuple
+import hashlib
 import os
 import time
+import uuid
+import zipfile
 
-def save_uploaded_file(file):
-    """Original file saving logic from create_document endpoint"""
-    original_filename = secure_filename(file.filename)
-    unique_filename = f"{time.time()}_{original_filename}"
-    file_path = os.path.join(os.getcwd(), 'uploads', unique_filename)  # Maintains original path logic
-    file.save(file_path)
-    return unique_filename, file_path
\ No newline at end of file
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Uploads are identified by their leading bytes, not their extension. PDF
+# allows junk before the header, so the first SNIFF_BYTES are searched; DOCX
+# is a zip container, confirmed from its member list once fully written.
+SNIFF_BYTES = 1024
+PDF_MAGIC = b'%PDF-'
+ZIP_MAGIC = b'PK\x03\x04'
+MIME_TYPES = {
+    '.pdf': 'application/pdf',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+}
+
+StoredUpload = namedtuple('StoredUpload', ['filename', 'file_path', 'content_hash', 'size', 'mime_type'])
+
+
+class UploadRejected(ValueError):
+    """An upload refused before or while it was written; carries an HTTP status"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def iter_chunks(stream, chunk_size=COPY_CHUNK_SIZE):
+    return iter(lambda: stream.read(chunk_size), b'')
+
+
+def sniff_document_type(head):
+    """Extension matching the leading bytes of a document, or None"""
+    if PDF_MAGIC in head[:SNIFF_BYTES]:
+        return '.pdf'
+    if head.startswith(ZIP_MAGIC):
+        return '.docx'
+    return None
+
+
+def is_docx(file_path):
+    # Reads only the zip central directory
+    try:
+        with zipfile.ZipFile(file_path) as bundle:
+            names = set(bundle.namelist())
+    except zipfile.BadZipFile:
+        return False
+    return '[Content_Types].xml' in names and 'word/document.xml' in names
+
+
+def unique_upload_path(folder, filename):
+    """(stored name, path) that no concurrent upload of the same file can share"""
+    unique_filename = f"{time.time()}_{uuid.uuid4().hex[:8]}_{filename}"
+    return unique_filename, os.path.join(folder, unique_filename)
+
+
+def write_upload(chunks, folder, filename, max_size=None, allowed=tuple(MIME_TYPES)):
+    """
+    Write an upload arriving as byte chunks to a new unique file in folder,
+    hashing it on the way. The type is checked against the first bytes
+    before anything is written, and the size as each chunk arrives, so
+    invalid or oversized uploads are refused without being stored.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in allowed:
+        raise UploadRejected("Unsupported file type", 400)
+
+    chunks = iter(chunks)
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= SNIFF_BYTES:
+            break
+    if not head:
+        raise UploadRejected("Empty file submission", 400)
+    detected = sniff_document_type(head)
+    if detected is None:
+        raise UploadRejected("File content is not a PDF or DOCX document", 415)
+    if detected != extension:
+        raise UploadRejected(f"File content does not match its {extension} extension", 415)
+
+    unique_filename, file_path = unique_upload_path(folder, filename)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        # 'x' refuses to replace an existing file
+        with open(file_path, 'xb') as out:
+            for chunk in _prepend(head, chunks):
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadRejected(f"File exceeds {max_size} bytes", 413)
+                digest.update(chunk)
+                out.write(chunk)
+        if detected == '.docx' and not is_docx(file_path):
+            raise UploadRejected("File content is not a DOCX document", 415)
+    except Exception:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return StoredUpload(unique_filename, file_path, digest.hexdigest(), size, MIME_TYPES[detected])
+
+
+def _prepend(head, chunks):
+    yield head
+    yield from chunks
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, namedtuple
+
+from .nlp_utils import RISK_KEYWORDS, AMBIGUOUS_TERMS, CLAUSE_KEYWORDS
+
+logger = logging.getLogger(__name__)
+
+# One hit of a dictionary term: character offsets into the scanned text, the
+# dictionary term that matched and the (group, category) it belongs to
+KeywordMatch = namedtuple('KeywordMatch', ['start', 'end', 'term', 'group', 'category'])
+
+# Seconds between modification-time checks of the dictionary file
+RELOAD_CHECK_INTERVAL = 2.0
+
+
+def default_dictionaries():
+    """Built-in term dictionaries from nlp_utils, grouped by use"""
+    return {
+        "risk": RISK_KEYWORDS,
+        "ambiguous": {term: [term] for term in AMBIGUOUS_TERMS},
+        "clauses": CLAUSE_KEYWORDS
+    }
+
+
+def term_pattern(term):
+    # Words separated by any whitespace; a trailing "*" matches any word ending
+    # ("terminat*" -> terminate, termination, terminated)
+    stem = term.strip()
+    wildcard = stem.endswith('*')
+    words = stem.rstrip('*').split()
+    pattern = r'\s+'.join(re.escape(w) for w in words)
+    return pattern + (r'\w*' if wildcard else '')
+
+
+class KeywordScan:
+    """Result of scanning one document: all matches plus per-category counts"""
+
+    def __init__(self, matches):
+        self.matches = matches
+        self._starts = [m.start for m in matches]
+        self.counts = Counter((m.group, m.category) for m in matches)
+
+    def count(self, group, category):
+        return self.counts.get((group, category), 0)
+
+    def categories(self, group):
+        return {category for g, category in self.counts if g == group}
+
+    def offsets(self, group, category):
+        return [(m.start, m.end) for m in self.matches
+                if m.group == group and m.category == category]
+
+    def in_span(self, start, end):
+        """Matches starting inside [start, end)"""
+        lo = bisect_left(self._starts, start)
+        hi = bisect_left(self._starts, end)
+        return self.matches[lo:hi]
+
+    def to_dict(self):
+        counts = {}
+        for (group, category), n in self.counts.items():
+            counts.setdefault(group, {})[category] = n
+        return counts
+
+
+class KeywordEngine:
+    """
+    Every term of every dictionary compiled into one case-insensitive regex.
+
+    Terms match on word boundaries; each document is scanned exactly once and
+    the capturing group that fired identifies the term in O(1).
+    """
+
+    def __init__(self, dictionaries):
+        self.dictionaries = {
+            group: {category: list(terms) for category, terms in categories.items()}
+            for group, categories in dictionaries.items()
+        }
+        self.version = hashlib.sha1(
+            json.dumps(self.dictionaries, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:12]
+
+        # Identical terms in several categories share one alternative
+        tags_by_term = {}
+        for group, categories in self.dictionaries.items():
+            for category, terms in categories.items():
+                for term in terms:
+                    key = term.strip().lower()
+                    if key:
+                        tags_by_term.setdefault(key, []).append((group, category))
+
+        # Longest first so "material adverse effect" wins over a shorter prefix
+        self._terms = sorted(tags_by_term, key=len, reverse=True)
+        self._tags = [tags_by_term[t] for t in self._terms]
+        if self._terms:
+            alternatives = '|'.join(f'({term_pattern(t)})' for t in self._terms)
+            self._regex = re.compile(rf'(?<!\w)(?:{alternatives})(?!\w)', re.IGNORECASE)
+        else:
+            self._regex = None
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load dictionaries from JSON:
+            {"risk": {category: [terms]}, "ambiguous": [terms], "clauses": {label: [terms]}}
+        Groups missing from the file fall back to the built-in dictionaries.
+        """
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        dictionaries = default_dictionaries()
+        for group, entries in data.items():
+            if isinstance(entries, list):
+                entries = {term: [term] for term in entries}
+            dictionaries[group] = entries
+        return cls(dictionaries)
+
+    def category_order(self, group):
+        return list(self.dictionaries.get(group, {}))
+
+    def scan(self, text):
+        if self._regex is None:
+            return KeywordScan([])
+        matches = []
+        for m in self._regex.finditer(text):
+            index = m.lastindex - 1
+            term = self._terms[index]
+            for group, category in self._tags[index]:
+                matches.append(KeywordMatch(m.start(), m.end(), term, group, category))
+        return KeywordScan(matches)
+
+
+_engine = None
+_source_path = None
+_source_mtime = None
+_last_check = 0.0
+_engine_lock = threading.Lock()
+
+
+def configure_keyword_source(path):
+    """Use a JSON dictionary file (None for the built-in lists)"""
+    global _source_path, _last_check
+    with _engine_lock:
+        _source_path = path or None
+        _last_check = 0.0
+    reload_keyword_engine()
+
+
+def reload_keyword_engine():
+    """Recompile the dictionaries; a broken file keeps the previous engine"""
+    global _engine, _source_mtime, _last_check
+    with _engine_lock:
+        try:
+            if _source_path:
+                # Record the mtime first so a broken file is reported once
+                _source_mtime = os.path.getmtime(_source_path)
+                engine = KeywordEngine.from_file(_source_path)
+            else:
+                engine = KeywordEngine(default_dictionaries())
+            _engine = engine
+            logger.info(f"Keyword engine loaded (version {engine.version})")
+        except Exception as e:
+            logger.error(f"Keyword dictionary reload failed: {e}")
+            if _engine is None:
+                _engine = KeywordEngine(default_dictionaries())
+        _last_check = time.monotonic()
+        return _engine
+
+
+def get_keyword_engine():
+    """Current engine, transparently reloaded when the dictionary file changes"""
+    global _last_check
+    if _engine is None:
+        return reload_keyword_engine()
+    if _source_path and time.monotonic() - _last_check > RELOAD_CHECK_INTERVAL:
+        try:
+            changed = os.path.getmtime(_source_path) != _source_mtime
+        except OSError:
+            changed = False
+        if changed:
+            return reload_keyword_engine()
+        _last_check = time.monotonic()
+    return _engine
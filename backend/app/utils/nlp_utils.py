@@ -11,4 +11,10 @@ AMBIGUOUS_TERMS = [
     "reasonable",
     "material adverse effect", 
     "sole discretion"
-]
\ No newline at end of file
+]
+
+# Clause labels detected sentence by sentence in extract_legal_entities()
+CLAUSE_KEYWORDS = {
+    "Governing Law": ["governing law"],
+    "Force Majeure": ["force majeure"]
+}
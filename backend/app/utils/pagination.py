@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+
+# Sort options for listings: name -> (field, direction). The _id tie-breaker
+# always follows the field's direction so (field, _id) is a total order.
+SORT_OPTIONS = {
+    "-upload_time": ("upload_time", -1),
+    "upload_time": ("upload_time", 1),
+    "-filename": ("filename", -1),
+    "filename": ("filename", 1),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def encode_cursor(sort, value, doc_id):
+    """Opaque token for the position after (value, doc_id) under a sort"""
+    payload = json.dumps({"s": sort, "v": _encode_value(value), "id": str(doc_id)},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, sort):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if payload["s"] != sort:
+            raise InvalidCursor("Cursor was issued for a different sort order")
+        return _decode_value(payload["v"]), ObjectId(payload["id"])
+    except InvalidCursor:
+        raise
+    except Exception:
+        raise InvalidCursor("Malformed cursor")
+
+
+def keyset_filter(field, direction, value, doc_id):
+    """Query selecting documents strictly after (value, doc_id) in sort order"""
+    op = "$lt" if direction < 0 else "$gt"
+    return {"$or": [
+        {field: {op: value}},
+        {field: value, "_id": {op: doc_id}}
+    ]}
+
+
+def keyset_sort(field, direction):
+    return [(field, direction), ("_id", direction)]
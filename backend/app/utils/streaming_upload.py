@@ -0,0 +1,94 @@
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, File, MultipartDecoder, NeedData
+from werkzeug.utils import secure_filename
+from .file_utils import COPY_CHUNK_SIZE, UploadRejected, write_upload
+
+# Non-file form fields are small; anything larger is refused
+MAX_FIELD_SIZE = 500 * 1024
+
+
+class MultipartFileReader:
+    """
+    Incremental multipart/form-data reader over the raw request stream.
+
+    File parts are handed out as chunks as they arrive, so an upload is never
+    buffered in memory or spooled to a temporary file by the form parser.
+    """
+
+    def __init__(self, stream, boundary, chunk_size=COPY_CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = MultipartDecoder(boundary, max_form_memory_size=MAX_FIELD_SIZE)
+        self._events = self._iter_events()
+
+    def _iter_events(self):
+        while True:
+            try:
+                event = self.decoder.next_event()
+                if isinstance(event, NeedData):
+                    data = self.stream.read(self.chunk_size)
+                    # None tells the decoder the body has ended
+                    self.decoder.receive_data(data or None)
+                    continue
+            except ValueError:
+                raise UploadRejected("Malformed multipart body", 400)
+            if isinstance(event, Epilogue):
+                return
+            yield event
+
+    def file_parts(self):
+        """
+        (field name, client filename) of each file part in turn; read the
+        part's chunks() before advancing, or its data is skipped
+        """
+        for event in self._events:
+            if isinstance(event, File):
+                yield event.name, event.filename
+
+    def find_file(self, field_name):
+        """Advance to the named file part; returns its client filename or None"""
+        for event in self._events:
+            if isinstance(event, File) and event.name == field_name:
+                return event.filename
+        return None
+
+    def chunks(self):
+        """Data of the current file part"""
+        for event in self._events:
+            if isinstance(event, Data):
+                if event.data:
+                    yield event.data
+                if not event.more_data:
+                    return
+
+
+def open_multipart(request, max_size):
+    """
+    Reader over the body of a multipart request. Must run before
+    request.files/form are touched, which would consume the body.
+    """
+    mimetype, options = parse_options_header(request.headers.get('Content-Type', ''))
+    boundary = options.get('boundary')
+    if mimetype != 'multipart/form-data' or not boundary:
+        raise UploadRejected("No file provided", 400)
+    # Refuse from the declared length before reading anything
+    if request.content_length is not None and request.content_length > max_size:
+        raise UploadRejected(f"File exceeds {max_size} bytes", 413)
+
+    return MultipartFileReader(request.stream, boundary.encode('latin-1'))
+
+
+def receive_upload(request, field_name, folder, max_size):
+    """
+    Stream the file field of a multipart request straight to a unique file
+    in folder (see write_upload).
+    """
+    reader = open_multipart(request, max_size)
+    client_filename = reader.find_file(field_name)
+    if client_filename is None:
+        raise UploadRejected("No file provided", 400)
+    filename = secure_filename(client_filename)
+    if not filename:
+        raise UploadRejected("Empty file submission", 400)
+
+    return write_upload(reader.chunks(), folder, filename, max_size=max_size)
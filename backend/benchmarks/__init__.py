@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+# Offline benchmark scripts; run from the backend directory with `python -m benchmarks.<name>`
@@ -0,0 +1,100 @@
+"""
+Per-document CPU time of the spaCy clause/risk passes, before and after the
+shared AnalysisContext.
+
+    cd backend && python -m benchmarks.bench_analysis_passes [--repeat 5] [files ...]
+
+"before" reproduces the original flow: a full en_core_web_sm parse of the
+text for clause detection, a second full parse of text.lower() for risk
+detection, and one text.lower() per keyword. "after" runs detect_clauses over
+a single AnalysisContext and evaluates the built-in risk rules with
+RuleSet.evaluate, as assess_legal_risks does.
+"""
+import argparse
+import time
+from pathlib import Path
+
+import PyPDF2
+import spacy
+
+from app.services.risk_rules import load_rule_set
+from app.services.text_analysis import AnalysisContext, detect_clauses
+from app.utils.nlp_utils import RISK_KEYWORDS, AMBIGUOUS_TERMS
+
+SAMPLE_DIR = Path(__file__).resolve().parents[2] / 'file'
+
+
+def load_text(path):
+    with open(path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        text = ''.join(p.extract_text() or "" for p in reader.pages)
+    # Same normalisation as preprocess_text at the time of this change
+    text = " ".join(text.split())
+    return "".join(c for c in text if c.isalnum() or c in [" ", ".", ",", "\n"])
+
+
+def legacy_passes(full_nlp, text):
+    clauses = []
+    for sent in full_nlp(text).sents:
+        low = sent.text.lower()
+        if "governing law" in low:
+            clauses.append("Governing Law")
+        if "force majeure" in low:
+            clauses.append("Force Majeure")
+
+    risks = []
+    doc = full_nlp(text.lower())
+    if not any("governing law" in s.text for s in doc.sents):
+        risks.append("Missing Governing Law clause")
+    risks += [f"Ambiguous term: {term}" for term in AMBIGUOUS_TERMS if term in text]
+    for cat, kws in RISK_KEYWORDS.items():
+        if any(kw in text.lower() for kw in kws):
+            risks.append(f"Potential risk in {cat} clause")
+    return clauses, risks
+
+
+def shared_context_passes(rule_set, text):
+    context = AnalysisContext(text)
+    findings = rule_set.evaluate(text)
+    return detect_clauses(context), rule_set.messages(findings)
+
+
+def cpu_time(func, *args, repeat=3):
+    # Best of N process CPU seconds
+    best = None
+    for _ in range(repeat):
+        started = time.process_time()
+        func(*args)
+        elapsed = time.process_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('files', nargs='*', type=Path)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    files = args.files or sorted(SAMPLE_DIR.glob('*.pdf'))
+    full_nlp = spacy.load("en_core_web_sm")
+    full_nlp.max_length = 5_000_000
+    # Compiled once, as the workers keep it between documents
+    rule_set = load_rule_set()
+    rule_set.plan
+
+    print(f"{'document':40} {'chars':>9} {'before s':>10} {'after s':>10} {'speedup':>8}")
+    for path in files:
+        text = load_text(path)
+        # Warm both pipelines so model loading is not measured
+        legacy_passes(full_nlp, text[:1000])
+        shared_context_passes(rule_set, text[:1000])
+
+        before = cpu_time(legacy_passes, full_nlp, text, repeat=args.repeat)
+        after = cpu_time(shared_context_passes, rule_set, text, repeat=args.repeat)
+        speedup = before / after if after else float('inf')
+        print(f"{path.name[:40]:40} {len(text):>9} {before:>10.3f} {after:>10.3f} {speedup:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Throughput and agreement of the entity backends on the sample contracts.
+
+    cd backend && python -m benchmarks.bench_entity_backends [--backends local,remote]
+        [--processes 1,4] [--batch-size 8] [--repeat 3] [--reference remote|FILE]
+        [--json results.json] [files ...]
+
+The PDFs in file/ (or the given files) are extracted, normalized and chunked
+as in ingestion and extract_legal_entities. Every backend analyses all chunks
+of all documents in each run, without the analysis cache; "local" runs once
+per --processes value. Reported per backend: documents/s, chunks/s, KB/s and
+the entities found per type.
+
+Agreement is precision / recall / F1 per entity type over the set of
+(type, canonical name) pairs of each document, against the reference:
+  remote - the Natural Language API results of the same run (needs GCP
+           credentials; GCP_TRANSPORT=stub only exercises the plumbing)
+  FILE   - JSON {"<file name>": {"ORGANIZATION": [names], ...}, ...}
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+SAMPLE_DIR = BACKEND_DIR.parent / 'file'
+
+
+def load_documents(paths):
+    """[(file name, normalized text, chunk spans)]"""
+    from flask import current_app
+    from app.services.document_processing import extract_document, normalize_document
+    from app.services.summarization import chunk_spans
+
+    documents = []
+    for path in paths:
+        extracted = extract_document(str(path))
+        if extracted is None or not extracted.text.strip():
+            print(f"skipping {path.name}: no text")
+            continue
+        normalized, _ = normalize_document(extracted)
+        text = normalized.text
+        spans = chunk_spans(text, current_app.config.get('ENTITY_CHUNK_TOKENS', 4000))
+        documents.append((path.name, text, spans))
+    return documents
+
+
+def entity_keys(records_by_document):
+    """{file name: {(type, key), ...}}"""
+    return {name: {(r["type"], r["key"]) for r in records} for name, records in records_by_document.items()}
+
+
+def run_backend(backend, documents, repeat):
+    """(stats, {file name: records}) of the best of repeat runs"""
+    from app.services.entity_model import EntityAggregator
+
+    chunks = [text[start:end] for _, text, spans in documents for start, end in spans]
+    # One untimed run loads the model or opens the client
+    backend.analyze(chunks[:1])
+    best, parts = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parts = backend.analyze(chunks)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    records, index = {}, 0
+    for name, _, spans in documents:
+        entities = EntityAggregator()
+        for start, _ in spans:
+            entities.merge(parts[index], shift=start)
+            index += 1
+        records[name] = entities.records()
+
+    size = sum(len(chunk.encode('utf-8')) for chunk in chunks)
+    found = {}
+    for document_records in records.values():
+        for record in document_records:
+            found[record["type"]] = found.get(record["type"], 0) + 1
+    stats = {
+        "seconds": round(best, 4),
+        "documents_per_second": round(len(documents) / best, 3) if best else None,
+        "chunks_per_second": round(len(chunks) / best, 3) if best else None,
+        "kb_per_second": round(size / 1024 / best, 1) if best else None,
+        "entities": found
+    }
+    return stats, records
+
+
+def agreement(found, reference, types):
+    """Micro-averaged precision / recall / F1 per type over all documents"""
+    scores = {}
+    for entity_type in types:
+        tp = fp = fn = 0
+        for name, expected in reference.items():
+            got = {key for key in found.get(name, set()) if key[0] == entity_type}
+            want = {key for key in expected if key[0] == entity_type}
+            tp += len(got & want)
+            fp += len(got - want)
+            fn += len(want - got)
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        scores[entity_type] = {"precision": round(precision, 3), "recall": round(recall, 3),
+                               "f1": round(f1, 3), "reference": tp + fn}
+    return scores
+
+
+def load_reference(path):
+    from app.services.entity_model import canonical_key
+    data = json.loads(Path(path).read_text())
+    return {
+        name: {(entity_type, canonical_key(entity)) for entity_type, names in by_type.items() for entity in names}
+        for name, by_type in data.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('files', nargs='*', type=Path)
+    parser.add_argument('--backends', default='local,remote')
+    parser.add_argument('--processes', default='1')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--model', default='en_core_web_sm')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--reference', default='remote')
+    parser.add_argument('--json', type=Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault('WARM_UP', 'off')
+    from app import create_app
+    from app.services.entity_backends import NAMED_ENTITY_TYPES, LanguageApiBackend, SpacyEntityBackend
+
+    app = create_app()
+    paths = args.files or sorted(SAMPLE_DIR.glob('*.pdf'))
+    results, keys = {}, {}
+    with app.app_context():
+        documents = load_documents(paths)
+        chunk_count = sum(len(spans) for _, _, spans in documents)
+        print(f"{len(documents)} documents, {chunk_count} chunks")
+
+        runs = []
+        for name in (b for b in args.backends.split(',') if b):
+            if name == 'local':
+                for processes in (int(p) for p in args.processes.split(',')):
+                    runs.append((f"local/{processes}p",
+                                 SpacyEntityBackend(args.model, args.batch_size, processes)))
+            elif name == 'remote':
+                runs.append(("remote", LanguageApiBackend(app.config.get('ENTITY_MAX_PARALLEL', 4))))
+            else:
+                parser.error(f"unknown backend: {name}")
+
+        for label, backend in runs:
+            try:
+                stats, records = run_backend(backend, documents, args.repeat)
+            except Exception as e:
+                print(f"{label:12} failed: {e}")
+                continue
+            results[label] = stats
+            keys[label] = entity_keys(records)
+            print(f"{label:12} {stats['documents_per_second']:>8} docs/s  {stats['chunks_per_second']:>8} chunks/s  "
+                  f"{stats['kb_per_second']:>8} KB/s  entities {stats['entities']}")
+
+        if args.reference == 'remote':
+            reference = keys.get("remote")
+        else:
+            reference = load_reference(args.reference)
+        if reference is None:
+            print("No reference results; agreement not computed")
+        else:
+            for label, found in keys.items():
+                if label == "remote" and args.reference == 'remote':
+                    continue
+                results[label]["agreement"] = agreement(found, reference, NAMED_ENTITY_TYPES)
+                print(f"{label} vs {args.reference}:")
+                for entity_type, score in results[label]["agreement"].items():
+                    print(f"  {entity_type:13} P {score['precision']:.3f}  R {score['recall']:.3f}  "
+                          f"F1 {score['f1']:.3f}  (n={score['reference']})")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+GET /documents query cost: offset pagination vs keyset pagination.
+
+    cd backend && python -m benchmarks.bench_listing [--documents 200000] [--text-kb 20]
+
+Seeds a synthetic collection in a separate database (MONGODB_URI, database
+legalmate_bench by default; pass --reseed to rebuild it) and times fetching
+pages at increasing depths with:
+  offset - count_documents({}) + find().skip().limit() returning full documents
+  keyset - estimated total + (upload_time, _id) range query with a projection
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+from app.utils.pagination import keyset_filter, keyset_sort
+
+LISTING_PROJECTION = {"filename": 1, "upload_time": 1, "status": 1}
+
+
+def seed(collection, count, text_kb):
+    collection.drop()
+    started = datetime(2020, 1, 1)
+    filler = ("The parties agree to the terms set out herein. " * (text_kb * 24))[:text_kb * 1024]
+    batch = []
+    for i in range(count):
+        batch.append({
+            "filename": f"{i}_contract.pdf",
+            "upload_time": started + timedelta(seconds=i * 17 + random.randint(0, 5)),
+            "status": "processed",
+            "text": filler,
+            "entities": {"ORGANIZATION": ["Acme Corp"] * 20},
+            "risks": ["Potential risk in liability clause"],
+            "summary": filler[:600]
+        })
+        if len(batch) == 1000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+    collection.create_index([('upload_time', -1), ('_id', -1)])
+
+
+def offset_page(collection, page, limit):
+    collection.count_documents({})
+    return list(collection.find().sort(keyset_sort('upload_time', -1)).skip((page - 1) * limit).limit(limit))
+
+
+def keyset_position(collection, page, limit):
+    # The (upload_time, _id) a client would hold in next_cursor when asking
+    # for this page; found with one untimed skip
+    if page == 1:
+        return None
+    boundary = (collection.find({}, {"upload_time": 1}).sort(keyset_sort('upload_time', -1))
+                .skip((page - 1) * limit - 1).limit(1).next())
+    return boundary['upload_time'], boundary['_id']
+
+
+def keyset_page(collection, position, limit):
+    collection.estimated_document_count()
+    query = keyset_filter('upload_time', -1, *position) if position else {}
+    return list(collection.find(query, LISTING_PROJECTION).sort(keyset_sort('upload_time', -1)).limit(limit + 1))
+
+
+def timed(func, *args, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uri', default=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--database', default='legalmate_bench')
+    parser.add_argument('--documents', type=int, default=200000)
+    parser.add_argument('--text-kb', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--reseed', action='store_true')
+    args = parser.parse_args()
+
+    collection = MongoClient(args.uri)[args.database]['documents']
+    if args.reseed or collection.estimated_document_count() != args.documents:
+        print(f"Seeding {args.documents} documents of ~{args.text_kb} KB ...")
+        seed(collection, args.documents, args.text_kb)
+
+    pages = [1, 10, 100, 1000, args.documents // args.limit // 2]
+    print(f"{'page':>8} {'offset ms':>11} {'keyset ms':>11}")
+    for page in sorted(set(p for p in pages if p >= 1)):
+        position = keyset_position(collection, page, args.limit)
+        offset_ms = timed(offset_page, collection, page, args.limit) * 1000
+        keyset_ms = timed(keyset_page, collection, position, args.limit) * 1000
+        print(f"{page:>8} {offset_ms:>11.2f} {keyset_ms:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+"""
+Offline throughput, latency and memory of the document pipeline.
+
+    cd backend && python -m benchmarks.bench_pipeline [--repeat 5] [--sizes 20,200,2000]
+        [--cases preprocess_text,...] [--save baseline.json] [--compare baseline.json]
+
+GCP calls go to the stub transport (gcp.stubs) and MongoDB to the in-memory
+stand-in in benchmarks.fakes, so no credentials, network or database are
+needed. Cases:
+  extract_text_from_pdf   - the PDFs in file/
+  extract_text_from_docx  - synthetic contracts written as DOCX
+  preprocess_text, normalize_document (with the offset map),
+  extract_legal_entities, identify_legal_risks,
+  generate_summary        - synthetic contracts of each --sizes (KB of text)
+  create_document         - POST /documents (JOB_BACKEND=eager, so the job
+                            runs inline) for the PDFs and synthetic DOCX files
+Every case runs in its own interpreter, so its peak RSS is its own. Caches
+are reset before every iteration: the numbers are cold-path costs.
+
+--save writes the results as JSON; --compare reports the change of each
+p50 against such a file and exits with status 1 when one regressed by more
+than --tolerance (0.2 = 20%).
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+SAMPLE_DIR = BACKEND_DIR.parent / 'file'
+
+CASES = (
+    "extract_text_from_pdf",
+    "extract_text_from_docx",
+    "preprocess_text",
+    "normalize_document",
+    "extract_legal_entities",
+    "identify_legal_risks",
+    "generate_summary",
+    "create_document",
+)
+DEFAULT_SIZES = (20, 200, 2000)
+
+# Building blocks of the synthetic contracts: organisations and dates for the
+# stub NL client, and clause/risk/ambiguous terms for the keyword engine
+PARTIES = ["Acme Corp", "Globex LLC", "Initech Inc", "Umbrella Corporation", "Stark Industries Ltd"]
+CLAUSES = [
+    "This Agreement shall be governed by the laws of the State of {state} (Governing Law).",
+    "Neither party shall be liable for any failure caused by force majeure events beyond its reasonable control.",
+    "{a} shall indemnify and hold harmless {b} against all claims arising from its negligence.",
+    "The total liability of {a} under this Agreement shall not exceed the fees paid in the preceding twelve months.",
+    "Either party may terminate this Agreement upon thirty days written notice to the other party.",
+    "{b} shall keep all Confidential Information of {a} strictly confidential for a period of five years.",
+    "Payment is due within a reasonable time after the invoice date of {date}.",
+    "{a} will use best efforts to deliver the Services as soon as practicable after {date}.",
+    "All intellectual property created under this Agreement shall vest in {a} on creation.",
+    "Any dispute shall be referred to binding arbitration in {state} before a single arbitrator.",
+]
+STATES = ["Delaware", "New York", "California", "Texas"]
+MONTHS = ["January", "March", "June", "September", "November"]
+
+
+def synthetic_contract(size_kb, seed=0):
+    """Contract-like text of about size_kb KB (deterministic for a seed)"""
+    rng = random.Random(seed)
+    target = size_kb * 1024
+    parts, length, section = [], 0, 1
+    while length < target:
+        a, b = rng.sample(PARTIES, 2)
+        sentence = rng.choice(CLAUSES).format(
+            a=a, b=b, state=rng.choice(STATES),
+            date=f"{rng.choice(MONTHS)} {rng.randint(1, 28)}, {rng.randint(2015, 2030)}"
+        )
+        if rng.random() < 0.1:
+            sentence = f"\n{section}. " + sentence
+            section += 1
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)
+
+
+def write_docx(text, path):
+    import docx
+    document = docx.Document()
+    for paragraph in text.split("\n"):
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize_samples(samples, size):
+    """Latency percentiles (seconds) and throughput of calls on an input of size bytes"""
+    total = sum(samples)
+    return {
+        "p50": round(statistics.median(samples), 6),
+        "p99": round(percentile(samples, 0.99), 6),
+        "mean": round(total / len(samples), 6),
+        "runs": len(samples),
+        "bytes": size,
+        "calls_per_second": round(len(samples) / total, 3) if total else None,
+        "mb_per_second": round(size * len(samples) / total / 1e6, 3) if total else None
+    }
+
+
+# --------------------------------------------------
+# Worker side (one case per interpreter)
+# --------------------------------------------------
+def _prepare_environment(workdir):
+    os.environ.update({
+        "GCP_TRANSPORT": "stub",
+        "JOB_BACKEND": "eager",
+        "WARM_UP": "off",
+        "UPLOAD_FOLDER": str(Path(workdir) / 'uploads'),
+        "BLOB_STORE_PATH": str(Path(workdir) / 'blobs'),
+    })
+    # Measure the code, not the production rate limits of the call governor
+    for api in ("LANGUAGE", "VERTEX", "DOCUMENTAI"):
+        os.environ.update({f"{api}_RATE": "1000000", f"{api}_BURST": "1000000", f"{api}_CONCURRENCY": "64"})
+
+
+def _reset_state():
+    """Fresh in-memory database and empty analysis / summary caches"""
+    from benchmarks.fakes import install_in_memory_database
+    from app.services import result_cache, summarization
+    install_in_memory_database()
+    result_cache._cache = None
+    summarization._engine = None
+
+
+def _time_calls(func, inputs, repeat):
+    """inputs: [(label, size in bytes, argument)] -> {label: stats}"""
+    results = {}
+    for label, size, argument in inputs:
+        # One untimed call loads models and clients
+        _reset_state()
+        func(argument)
+        samples = []
+        for _ in range(repeat):
+            _reset_state()
+            started = time.perf_counter()
+            func(argument)
+            samples.append(time.perf_counter() - started)
+        results[label] = summarize_samples(samples, size)
+    return results
+
+
+def run_case(case, sizes, repeat, workdir):
+    _prepare_environment(workdir)
+    from app import create_app
+    from app.services import document_processing as processing
+
+    app = create_app()
+    pdfs = sorted(SAMPLE_DIR.glob('*.pdf'))
+    texts = [(f"{size}kb", size * 1024, synthetic_contract(size, seed=size)) for size in sizes]
+
+    with app.app_context():
+        if case == "extract_text_from_pdf":
+            inputs = [(path.name, path.stat().st_size, str(path)) for path in pdfs]
+            return _time_calls(processing.extract_text_from_pdf, inputs, repeat)
+
+        if case == "extract_text_from_docx":
+            inputs = []
+            for label, _, text in texts:
+                path = Path(workdir) / f"synthetic_{label}.docx"
+                write_docx(text, path)
+                inputs.append((label, path.stat().st_size, str(path)))
+            return _time_calls(processing.extract_text_from_docx, inputs, repeat)
+
+        if case == "preprocess_text":
+            return _time_calls(processing.preprocess_text, texts, repeat)
+        if case == "normalize_document":
+            from app.services.pdf_extraction import ExtractedText, PageText
+            documents = [(label, size, ExtractedText([PageText(1, text)])) for label, size, text in texts]
+            return _time_calls(processing.normalize_document, documents, repeat)
+
+        normalized = [(label, size, processing.preprocess_text(text)) for label, size, text in texts]
+        if case == "extract_legal_entities":
+            return _time_calls(processing.extract_legal_entities, normalized, repeat)
+        if case == "identify_legal_risks":
+            return _time_calls(processing.identify_legal_risks, normalized, repeat)
+        if case == "generate_summary":
+            return _time_calls(processing.generate_summary, normalized, repeat)
+
+    if case == "create_document":
+        files = [(path.name, path.stat().st_size, path) for path in pdfs]
+        for label, _, text in texts:
+            path = Path(workdir) / f"synthetic_{label}.docx"
+            write_docx(text, path)
+            files.append((path.name, path.stat().st_size, path))
+
+        client = app.test_client()
+
+        def upload(path):
+            with open(path, 'rb') as f:
+                response = client.post('/documents/', data={"file": (f, path.name)},
+                                       content_type='multipart/form-data')
+            if response.status_code != 202:
+                raise RuntimeError(f"Upload of {path.name} failed: {response.status_code} {response.get_data(as_text=True)}")
+            return response
+
+        return _time_calls(upload, files, repeat)
+
+    raise ValueError(f"Unknown case: {case}")
+
+
+def worker_main(case, sizes, repeat):
+    with tempfile.TemporaryDirectory(prefix='legalmate-bench-') as workdir:
+        results = run_case(case, sizes, repeat, workdir)
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    print(json.dumps({"results": results, "peak_rss_mb": round(peak_mb, 1)}))
+
+
+# --------------------------------------------------
+# Driver side
+# --------------------------------------------------
+def run_in_subprocess(case, sizes, repeat):
+    command = [sys.executable, '-m', 'benchmarks.bench_pipeline', '--worker', case,
+               '--sizes', ",".join(str(size) for size in sizes), '--repeat', str(repeat)]
+    completed = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Case {case} failed:\n{completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    """Rows of (case, input, old p50, new p50, change) and whether any regressed"""
+    rows, regressed = [], False
+    for case, data in results.items():
+        old_case = baseline.get("cases", {}).get(case)
+        if not old_case:
+            continue
+        for label, stats in data["results"].items():
+            old = old_case["results"].get(label)
+            if not old or not old["p50"]:
+                continue
+            change = stats["p50"] / old["p50"] - 1
+            regressed = regressed or change > tolerance
+            rows.append((case, label, old["p50"], stats["p50"], change))
+    return rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cases', default=",".join(CASES))
+    parser.add_argument('--sizes', default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="synthetic contract sizes in KB")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', type=Path, help="write results to this JSON file")
+    parser.add_argument('--compare', type=Path, help="baseline JSON file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+
+    if args.worker:
+        worker_main(args.worker, sizes, args.repeat)
+        return
+
+    cases = [case for case in args.cases.split(',') if case]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    results = {}
+    print(f"{'case':24} {'input':28} {'p50 ms':>9} {'p99 ms':>9} {'calls/s':>9} {'MB/s':>8} {'peak MB':>8}")
+    for case in cases:
+        data = results[case] = run_in_subprocess(case, sizes, args.repeat)
+        for label, stats in data["results"].items():
+            print(f"{case:24} {label[:28]:28} {stats['p50'] * 1000:>9.2f} {stats['p99'] * 1000:>9.2f} "
+                  f"{stats['calls_per_second'] or '-':>9} {stats['mb_per_second'] or '-':>8} {data['peak_rss_mb']:>8}")
+
+    report = {
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "sizes": sizes,
+        "cases": results
+    }
+    if args.save:
+        args.save.write_text(json.dumps(report, indent=2))
+        print(f"Saved results to {args.save}")
+
+    if args.compare:
+        rows, regressed = compare(results, json.loads(args.compare.read_text()), args.tolerance)
+        print(f"\n{'case':24} {'input':28} {'base ms':>9} {'now ms':>9} {'change':>8}")
+        for case, label, old, new, change in rows:
+            flag = "  REGRESSED" if change > args.tolerance else ""
+            print(f"{case:24} {label[:28]:28} {old * 1000:>9.2f} {new * 1000:>9.2f} {change:>+8.1%}{flag}")
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
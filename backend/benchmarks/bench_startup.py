@@ -0,0 +1,64 @@
+"""
+Application startup time: importing the app and calling create_app().
+
+    cd backend && python -m benchmarks.bench_startup [--runs 5] [--warm-up]
+
+Each run is a fresh interpreter so nothing is cached between runs. With
+--warm-up, the time of a synchronous warm-up (spaCy, GCP clients, Mongo
+indexes) is measured separately.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+result = {"import": imported - started, "create_app": created - imported}
+if %(warm_up)r:
+    from app.services.warmup import warm_up
+    warm_up(app)
+    result["warm_up"] = time.perf_counter() - created
+    result["warm_up_errors"] = app.extensions['readiness'].errors
+print(json.dumps(result))
+"""
+
+
+def run_probe(warm_up):
+    env = dict(os.environ, WARM_UP='off', JOB_BACKEND='eager')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE % {"warm_up": warm_up}],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--warm-up', action='store_true')
+    args = parser.parse_args()
+
+    samples = [run_probe(args.warm_up) for _ in range(args.runs)]
+    for key in ('import', 'create_app', 'warm_up'):
+        values = [s[key] for s in samples if key in s]
+        if values:
+            print(f"{key:12} median {statistics.median(values) * 1000:8.1f} ms"
+                  f"   min {min(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms")
+    errors = samples[-1].get('warm_up_errors')
+    if errors:
+        print(f"warm-up errors: {errors}")
+
+
+if __name__ == '__main__':
+    main()
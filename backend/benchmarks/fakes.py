@@ -0,0 +1,340 @@
+"""
+In-memory stand-ins used by the offline benchmarks.
+
+InMemoryDatabase implements the subset of pymongo the ingestion flow uses
+(inserts, finds with simple filters and projections, $set/$inc/$max/$unset
+updates with upserts, find_one_and_*). It is not a general Mongo emulator:
+aggregations and text search are unsupported. GCP calls use the stub
+transport (gcp.stubs) selected with GCP_TRANSPORT=stub.
+"""
+import copy
+import threading
+
+from bson import ObjectId
+
+_MISSING = object()
+
+
+def _get_path(document, path):
+    value = document
+    for part in path.split('.'):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+
+def _set_path(document, path, value):
+    parts = path.split('.')
+    for part in parts[:-1]:
+        document = document.setdefault(part, {})
+    document[parts[-1]] = value
+
+
+def _unset_path(document, path):
+    parts = path.split('.')
+    for part in parts[:-1]:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+    document.pop(parts[-1], None)
+
+
+def _compare(value, operator, operand):
+    if operator == '$exists':
+        return (value is not _MISSING) == bool(operand)
+    if operator == '$ne':
+        return value != operand
+    if operator == '$in':
+        return value in operand
+    if operator == '$nin':
+        return value not in operand
+    if value is _MISSING or value is None:
+        return False
+    if operator == '$lt':
+        return value < operand
+    if operator == '$lte':
+        return value <= operand
+    if operator == '$gt':
+        return value > operand
+    if operator == '$gte':
+        return value >= operand
+    raise NotImplementedError(f"Unsupported query operator {operator}")
+
+
+def matches(document, query):
+    for key, condition in (query or {}).items():
+        if key == '$or':
+            if not any(matches(document, q) for q in condition):
+                return False
+            continue
+        if key == '$and':
+            if not all(matches(document, q) for q in condition):
+                return False
+            continue
+        value = _get_path(document, key)
+        if isinstance(condition, dict) and condition and all(k.startswith('$') for k in condition):
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif isinstance(value, list) and not isinstance(condition, list):
+            if condition not in value:
+                return False
+        elif (None if value is _MISSING else value) != condition:
+            return False
+    return True
+
+
+def project(document, projection):
+    if not projection:
+        return copy.deepcopy(document)
+    included = {k for k, v in projection.items() if v}
+    if not included:
+        result = copy.deepcopy(document)
+        for key in projection:
+            _unset_path(result, key)
+        return result
+    result = {}
+    if projection.get('_id', 1) and '_id' in document:
+        result['_id'] = document['_id']
+    for key in included:
+        value = _get_path(document, key)
+        if value is not _MISSING:
+            _set_path(result, key, copy.deepcopy(value))
+    return result
+
+
+def apply_update(document, update, inserting=False):
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            if operator == '$set':
+                _set_path(document, path, copy.deepcopy(value))
+            elif operator == '$setOnInsert':
+                if inserting:
+                    _set_path(document, path, copy.deepcopy(value))
+            elif operator == '$unset':
+                _unset_path(document, path)
+            elif operator == '$inc':
+                current = _get_path(document, path)
+                _set_path(document, path, (0 if current is _MISSING else current) + value)
+            elif operator == '$max':
+                current = _get_path(document, path)
+                if current is _MISSING or value > current:
+                    _set_path(document, path, value)
+            else:
+                raise NotImplementedError(f"Unsupported update operator {operator}")
+
+
+def _sorted(documents, spec):
+    # One stable sort per key, last key first, honours mixed directions;
+    # missing fields sort first, as in Mongo
+    documents = list(documents)
+    for field, direction in reversed(spec):
+        def key(document, field=field):
+            value = _get_path(document, field)
+            return (value is not _MISSING, value if value is not _MISSING else 0)
+        documents.sort(key=key, reverse=direction < 0)
+    return documents
+
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+
+
+class UpdateResult:
+    def __init__(self, matched_count, modified_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+
+class InMemoryCursor:
+    def __init__(self, documents, projection):
+        self._documents = documents
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=None):
+        self._sort = [(key, direction or 1)] if isinstance(key, str) else list(key)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def __iter__(self):
+        documents = _sorted(self._documents, self._sort) if self._sort else self._documents
+        documents = documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return (project(document, self._projection) for document in documents)
+
+    def next(self):
+        return next(iter(self))
+
+
+class InMemoryCollection:
+    def __init__(self, name):
+        self.name = name
+        self._documents = {}
+        self._lock = threading.RLock()
+
+    def _find(self, query):
+        return [doc for doc in self._documents.values() if matches(doc, query)]
+
+    def _first(self, query, sort=None):
+        found = self._find(query)
+        if sort:
+            found = _sorted(found, sort)
+        return found[0] if found else None
+
+    def insert_one(self, document):
+        with self._lock:
+            document.setdefault('_id', ObjectId())
+            if document['_id'] in self._documents:
+                raise ValueError(f"Duplicate key {document['_id']}")
+            self._documents[document['_id']] = copy.deepcopy(document)
+            return InsertOneResult(document['_id'])
+
+    def insert_many(self, documents, ordered=True):
+        return InsertManyResult([self.insert_one(document).inserted_id for document in documents])
+
+    def find_one(self, query=None, projection=None, sort=None):
+        with self._lock:
+            document = self._first(query, sort)
+            return project(document, projection) if document is not None else None
+
+    def find(self, query=None, projection=None):
+        with self._lock:
+            return InMemoryCursor(self._find(query), projection)
+
+    def count_documents(self, query, limit=None):
+        with self._lock:
+            count = len(self._find(query))
+        return min(count, limit) if limit else count
+
+    def estimated_document_count(self):
+        return len(self._documents)
+
+    def _upsert(self, query, update):
+        document = {key: value for key, value in query.items()
+                    if not key.startswith('$') and not isinstance(value, dict)}
+        document.setdefault('_id', ObjectId())
+        apply_update(document, update, inserting=True)
+        self._documents[document['_id']] = document
+        return document
+
+    def update_one(self, query, update, upsert=False):
+        with self._lock:
+            document = self._first(query)
+            if document is None:
+                if not upsert:
+                    return UpdateResult(0, 0)
+                return UpdateResult(0, 0, self._upsert(query, update)['_id'])
+            apply_update(document, update)
+            return UpdateResult(1, 1)
+
+    def update_many(self, query, update):
+        with self._lock:
+            found = self._find(query)
+            for document in found:
+                apply_update(document, update)
+            return UpdateResult(len(found), len(found))
+
+    def replace_one(self, query, replacement, upsert=False):
+        with self._lock:
+            document = self._first(query)
+            if document is None and not upsert:
+                return UpdateResult(0, 0)
+            doc_id = document['_id'] if document is not None else query.get('_id', ObjectId())
+            self._documents[doc_id] = dict(copy.deepcopy(replacement), _id=doc_id)
+            return UpdateResult(int(document is not None), int(document is not None))
+
+    def find_one_and_update(self, query, update, projection=None, sort=None, upsert=False,
+                            return_document=False):
+        with self._lock:
+            document = self._first(query, sort)
+            if document is None:
+                if not upsert:
+                    return None
+                document = self._upsert(query, update)
+                return project(document, projection) if return_document else None
+            before = copy.deepcopy(document)
+            apply_update(document, update)
+            return project(document if return_document else before, projection)
+
+    def find_one_and_delete(self, query, projection=None):
+        with self._lock:
+            document = self._first(query)
+            if document is None:
+                return None
+            del self._documents[document['_id']]
+            return project(document, projection)
+
+    def delete_one(self, query):
+        with self._lock:
+            document = self._first(query)
+            if document is not None:
+                del self._documents[document['_id']]
+            return DeleteResult(int(document is not None))
+
+    def delete_many(self, query):
+        with self._lock:
+            found = self._find(query)
+            for document in found:
+                del self._documents[document['_id']]
+            return DeleteResult(len(found))
+
+    def create_index(self, *args, **kwargs):
+        return None
+
+    def drop(self):
+        with self._lock:
+            self._documents.clear()
+
+    def aggregate(self, pipeline):
+        raise NotImplementedError("InMemoryCollection does not support aggregations")
+
+
+class InMemoryDatabase:
+    def __init__(self, name='legalmate_bench'):
+        self.name = name
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = InMemoryCollection(name)
+            return self._collections[name]
+
+    def command(self, name, *args, **kwargs):
+        if name == 'ping':
+            return {"ok": 1}
+        raise NotImplementedError(f"Unsupported command {name}")
+
+
+def install_in_memory_database():
+    """Route every LazyCollection in app.config to a fresh InMemoryDatabase"""
+    import app.config
+    database = InMemoryDatabase()
+    app.config.get_database = lambda: database
+    return database
+
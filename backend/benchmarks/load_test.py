@@ -0,0 +1,242 @@
+"""
+HTTP load test: the Flask development server vs gunicorn (gunicorn.conf.py).
+
+    cd backend && python -m benchmarks.load_test [--servers dev,gunicorn] [--clients 32]
+        [--duration 20] [--mix list=6,get=3,upload=1] [--workers 4 --threads 8]
+
+Each server is started as a subprocess with stubbed GCP clients
+(GCP_TRANSPORT=stub) against MONGODB_URI / database legalmate_bench, then
+driven by --clients keep-alive connections for --duration seconds with a
+weighted mix of requests:
+  list   - GET /documents/?limit=20
+  get    - GET /documents/<id>?fields=id,filename,status,analysis
+  upload - POST /documents/ with one of the PDFs in file/
+  health - GET /
+Reports requests/s, latency percentiles and errors per server.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+SAMPLE_DIR = BACKEND_DIR.parent / 'file'
+
+
+def server_command(name, port, args):
+    if name == 'dev':
+        # run.py's own server, on another port
+        return [sys.executable, '-c',
+                f"from run import app; app.run(host='127.0.0.1', port={port}, debug=False, threaded=True)"]
+    return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+            '--threads', str(args.threads), '--worker-class', args.worker_class, 'wsgi:app']
+
+
+def start_server(name, port, args):
+    env = dict(os.environ, GCP_TRANSPORT='stub', SUMMARY_BACKEND='fake',
+               MONGODB_DB=args.database, WEB_ACCESS_LOG='/dev/null')
+    # Server logs go to a file: an unread pipe would fill up and block the server
+    log = tempfile.TemporaryFile()
+    process = subprocess.Popen(server_command(name, port, args), cwd=BACKEND_DIR, env=env,
+                               stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    started = time.monotonic()
+    while time.monotonic() - started < args.startup_timeout:
+        if process.poll() is not None:
+            log.seek(0)
+            raise RuntimeError(f"{name} server exited:\n{log.read().decode(errors='replace')[-2000:]}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/ready')
+            if connection.getresponse().status == 200:
+                return process, time.monotonic() - started
+        except OSError:
+            pass
+        time.sleep(0.25)
+    stop_server(process)
+    raise RuntimeError(f"{name} server not ready after {args.startup_timeout}s")
+
+
+def stop_server(process):
+    # SIGTERM is gunicorn's graceful shutdown
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=120)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def multipart_body(path):
+    boundary = uuid.uuid4().hex
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{path.name}"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n').encode()
+    return boundary, head + path.read_bytes() + f'\r\n--{boundary}--\r\n'.encode()
+
+
+class Client(threading.Thread):
+    """One keep-alive connection issuing requests from the mix until stopped"""
+
+    def __init__(self, port, mix, doc_ids, uploads, stop, seed):
+        super().__init__(daemon=True)
+        self.port = port
+        self.mix = mix
+        self.doc_ids = doc_ids
+        self.uploads = uploads
+        self.stop = stop
+        self.random = random.Random(seed)
+        self.samples = {}
+        self.errors = {}
+
+    def _request(self, connection, kind):
+        if kind == 'list':
+            connection.request('GET', '/documents/?limit=20')
+        elif kind == 'get':
+            doc_id = self.random.choice(self.doc_ids)
+            connection.request('GET', f'/documents/{doc_id}?fields=id,filename,status,analysis')
+        elif kind == 'upload':
+            boundary, body = self.random.choice(self.uploads)
+            connection.request('POST', '/documents/', body=body,
+                               headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        else:
+            connection.request('GET', '/')
+        response = connection.getresponse()
+        response.read()
+        return response.status
+
+    def run(self):
+        kinds, weights = zip(*self.mix.items())
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        while not self.stop.is_set():
+            kind = self.random.choices(kinds, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = self._request(connection, kind)
+            except (OSError, http.client.HTTPException) as e:
+                self.errors[type(e).__name__] = self.errors.get(type(e).__name__, 0) + 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+                continue
+            self.samples.setdefault(kind, []).append(time.perf_counter() - started)
+            if status >= 400:
+                self.errors[str(status)] = self.errors.get(str(status), 0) + 1
+        connection.close()
+
+
+def seed_documents(port, uploads, count):
+    """Upload a few documents so GET /documents/<id> has targets"""
+    ids = []
+    for i in range(count):
+        boundary, body = uploads[i % len(uploads)]
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        connection.request('POST', '/documents/', body=body,
+                           headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        response = connection.getresponse()
+        payload = json.loads(response.read() or b'{}')
+        if response.status == 202:
+            ids.append(payload['id'])
+    return ids
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def run_load(port, args, mix, uploads):
+    doc_ids = seed_documents(port, uploads, args.seed_documents) or ['000000000000000000000000']
+    stop = threading.Event()
+    clients = [Client(port, mix, doc_ids, uploads, stop, seed=i) for i in range(args.clients)]
+    started = time.monotonic()
+    for client in clients:
+        client.start()
+    time.sleep(args.duration)
+    stop.set()
+    for client in clients:
+        client.join(timeout=60)
+    elapsed = time.monotonic() - started
+
+    samples, errors = {}, {}
+    for client in clients:
+        for kind, values in client.samples.items():
+            samples.setdefault(kind, []).extend(values)
+        for key, count in client.errors.items():
+            errors[key] = errors.get(key, 0) + count
+    every = [value for values in samples.values() for value in values]
+    report = {
+        "requests": len(every),
+        "rps": round(len(every) / elapsed, 1),
+        "errors": errors,
+        "by_kind": {}
+    }
+    for kind, values in sorted(samples.items()):
+        report["by_kind"][kind] = {
+            "count": len(values),
+            "p50_ms": round(statistics.median(values) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2)
+        }
+    if every:
+        report["p50_ms"] = round(statistics.median(every) * 1000, 2)
+        report["p99_ms"] = round(percentile(every, 0.99) * 1000, 2)
+    return report
+
+
+def parse_mix(raw):
+    mix = {}
+    for part in raw.split(','):
+        kind, _, weight = part.partition('=')
+        if kind not in ('list', 'get', 'upload', 'health'):
+            raise argparse.ArgumentTypeError(f"unknown request kind: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--servers', default='dev,gunicorn')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('list=6,get=3,upload=1'))
+    parser.add_argument('--seed-documents', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--worker-class', default='gthread')
+    parser.add_argument('--database', default='legalmate_bench')
+    parser.add_argument('--port', type=int, default=5100)
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--json', type=Path, help="also write the reports to this file")
+    args = parser.parse_args()
+
+    uploads = [multipart_body(path) for path in sorted(SAMPLE_DIR.glob('*.pdf'))]
+    reports = {}
+    for offset, name in enumerate(s for s in args.servers.split(',') if s):
+        port = args.port + offset
+        process, startup = start_server(name, port, args)
+        try:
+            report = run_load(port, args, args.mix, uploads)
+        finally:
+            stop_server(process)
+        report["startup_s"] = round(startup, 2)
+        reports[name] = report
+        print(f"{name:9} {report['rps']:>8} req/s  p50 {report.get('p50_ms', '-')} ms  "
+              f"p99 {report.get('p99_ms', '-')} ms  errors {report['errors'] or 0}  startup {report['startup_s']}s")
+        for kind, stats in report["by_kind"].items():
+            print(f"  {kind:7} n={stats['count']:<7} p50 {stats['p50_ms']:>8} ms  "
+                  f"p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms")
+
+    if args.json:
+        args.json.write_text(json.dumps(reports, indent=2))
+
+
+if __name__ == '__main__':
+    main()
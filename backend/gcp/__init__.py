@@ -1,12 +1,13 @@
 import os
+from .clients import registry, ClientRegistry
 from .gcp_client import (
     extract_clauses,
     analyze_entities,
     vertex_summarize
 )
 
-# Point Google SDK at your service account
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.path.join(
-    os.path.dirname(__file__),
-    "service-account.json"
-)
\ No newline at end of file
+# Point Google SDK at your service account when it is present; otherwise
+# Application Default Credentials are used
+_service_account = os.path.join(os.path.dirname(__file__), "service-account.json")
+if os.path.exists(_service_account):
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = _service_account
\ No newline at end of file
@@ -0,0 +1,179 @@
+import os
+import threading
+
+# GCP settings
+PROJECT_ID = os.getenv("GCP_PROJECT_ID", "practical-now-456807-u9")
+LOCATION = os.getenv("GCP_LOCATION", "us-central1")
+
+# gRPC channel options shared by every client: keep connections warm between
+# bursts and allow the large responses Document AI returns for long PDFs
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.max_send_message_length", 64 * 1024 * 1024),
+    ("grpc.max_receive_message_length", 64 * 1024 * 1024),
+]
+
+
+def _grpc_client(client_cls, channel_options):
+    transport_cls = client_cls.get_transport_class("grpc")
+    channel = transport_cls.create_channel(options=channel_options)
+    return client_cls(transport=transport_cls(channel=channel))
+
+
+def _document_ai_client(registry):
+    from google.cloud import documentai_v1 as documentai
+    return _grpc_client(documentai.DocumentProcessorServiceClient, registry.channel_options)
+
+
+def _language_client(registry):
+    from google.cloud import language_v1
+    return _grpc_client(language_v1.LanguageServiceClient, registry.channel_options)
+
+
+# Request messages and enums, imported only when the grpc transport is used
+def _document_ai_types(registry):
+    from google.cloud import documentai_v1
+    return documentai_v1
+
+
+def _language_types(registry):
+    from google.cloud import language_v1
+    return language_v1
+
+
+def _vertex_model(registry, model_name):
+    import vertexai
+    from vertexai.preview.language_models import TextGenerationModel
+    # vertexai.init is process-global; run it once per process
+    if not registry._vertex_initialized:
+        vertexai.init(project=registry.project_id, location=registry.location)
+        registry._vertex_initialized = True
+    return TextGenerationModel.from_pretrained(model_name)
+
+
+def _stub_document_ai_client(registry):
+    from .stubs import StubDocumentAIClient
+    return StubDocumentAIClient()
+
+
+def _stub_language_client(registry):
+    from .stubs import StubLanguageClient
+    return StubLanguageClient()
+
+
+def _stub_vertex_model(registry, model_name):
+    from .stubs import StubTextGenerationModel
+    return StubTextGenerationModel(model_name)
+
+
+def _stub_document_ai_types(registry):
+    from .stubs import document_ai_types
+    return document_ai_types
+
+
+def _stub_language_types(registry):
+    from .stubs import language_types
+    return language_types
+
+
+TRANSPORTS = {
+    "grpc": {
+        "document_ai": _document_ai_client,
+        "language": _language_client,
+        "vertex": _vertex_model,
+        "document_ai_types": _document_ai_types,
+        "language_types": _language_types,
+    },
+    "stub": {
+        "document_ai": _stub_document_ai_client,
+        "language": _stub_language_client,
+        "vertex": _stub_vertex_model,
+        "document_ai_types": _stub_document_ai_types,
+        "language_types": _stub_language_types,
+    },
+}
+
+
+class ClientRegistry:
+    """
+    Process-wide GCP clients, each created lazily exactly once.
+
+    Creation is guarded by a lock, and the cache is dropped in forked
+    children (gunicorn --preload) so no gRPC channel crosses a fork.
+    """
+
+    def __init__(self, transport=None, channel_options=None,
+                 project_id=PROJECT_ID, location=LOCATION):
+        self.transport = transport or os.getenv("GCP_TRANSPORT", "grpc")
+        self.channel_options = list(channel_options or CHANNEL_OPTIONS)
+        self.project_id = project_id
+        self.location = location
+        self._factories = {name: dict(factories) for name, factories in TRANSPORTS.items()}
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._vertex_initialized = False
+
+    def register_transport(self, name, factories):
+        """
+        Add a transport: {"document_ai": f(registry), "language": f(registry), "vertex": f(registry, model)},
+        optionally with "document_ai_types" / "language_types" (else those of grpc)
+        """
+        self._factories[name] = dict(factories)
+
+    def use_transport(self, name):
+        if name not in self._factories:
+            raise ValueError(f"Unknown GCP transport: {name}")
+        with self._lock:
+            self.transport = name
+            self._clients.clear()
+
+    def reset(self):
+        """Forget every client (after fork, or when credentials change)"""
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._pid = os.getpid()
+        self._vertex_initialized = False
+
+    def _get(self, key, kind, *args):
+        if self._pid != os.getpid():
+            self.reset()
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                factories = self._factories[self.transport]
+                factory = factories.get(kind) or self._factories["grpc"][kind]
+                client = factory(self, *args)
+                self._clients[key] = client
+            return client
+
+    def document_ai(self):
+        return self._get("document_ai", "document_ai")
+
+    def language(self):
+        return self._get("language", "language")
+
+    def document_ai_types(self):
+        """The documentai_v1 module, or its stand-in for the transport"""
+        return self._get("document_ai_types", "document_ai_types")
+
+    def language_types(self):
+        """The language_v1 module, or its stand-in for the transport"""
+        return self._get("language_types", "language_types")
+
+    def vertex_model(self, model_name):
+        return self._get(f"vertex:{model_name}", "vertex", model_name)
+
+    def loaded(self):
+        return sorted(key for key in self._clients if not key.endswith("_types"))
+
+
+registry = ClientRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry.reset)
@@ -0,0 +1,91 @@
+"""
+In-process stand-ins for the GCP clients, selected with GCP_TRANSPORT=stub.
+
+They mirror the attributes the application reads from real responses and
+need neither credentials nor network access.
+"""
+import re
+from enum import IntEnum
+from types import SimpleNamespace
+
+# language_v1.Entity.Type values
+ENTITY_PERSON = 1
+ENTITY_ORGANIZATION = 3
+ENTITY_DATE = 11
+
+_ORGANIZATION = re.compile(r"\b(?:[A-Z][\w&]*\s+){1,3}(?:Inc|LLC|Corp|Corporation|Ltd|LLP|Company)\b\.?")
+_DATE = re.compile(
+    r"\b(?:January|February|March|April|May|June|July|August|September|October|November|December)"
+    r"(?:\s+\d{1,2},?)?\s+\d{4}\b"
+)
+
+
+def _entity(name, entity_type, begin):
+    return SimpleNamespace(
+        name=name,
+        type_=entity_type,
+        salience=0.0,
+        mentions=[SimpleNamespace(text=SimpleNamespace(content=name, begin_offset=begin))]
+    )
+
+
+class _StubDocument(SimpleNamespace):
+    Type = IntEnum("Type", {"TYPE_UNSPECIFIED": 0, "PLAIN_TEXT": 1, "HTML": 2})
+
+
+class _StubEntity(SimpleNamespace):
+    Type = IntEnum("Type", {
+        "UNKNOWN": 0, "PERSON": ENTITY_PERSON, "LOCATION": 2, "ORGANIZATION": ENTITY_ORGANIZATION,
+        "EVENT": 4, "WORK_OF_ART": 5, "CONSUMER_GOOD": 6, "OTHER": 7, "PHONE_NUMBER": 9,
+        "ADDRESS": 10, "DATE": ENTITY_DATE, "NUMBER": 12, "PRICE": 13
+    })
+
+
+# Stand-ins for the language_v1 and documentai_v1 modules: request messages
+# and the enums the application uses
+language_types = SimpleNamespace(
+    Document=_StubDocument,
+    Entity=_StubEntity,
+    EncodingType=IntEnum("EncodingType", {"NONE": 0, "UTF8": 1, "UTF16": 2, "UTF32": 3})
+)
+document_ai_types = SimpleNamespace(ProcessRequest=SimpleNamespace, RawDocument=SimpleNamespace)
+
+
+class StubLanguageClient:
+    """Regex organisation/date detection in the shape of analyze_entities"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def analyze_entities(self, document=None, encoding_type=None, **kwargs):
+        self.calls += 1
+        text = document.content
+        entities = [_entity(m.group(0).rstrip('.'), ENTITY_ORGANIZATION, m.start())
+                    for m in _ORGANIZATION.finditer(text)]
+        entities += [_entity(m.group(0), ENTITY_DATE, m.start()) for m in _DATE.finditer(text)]
+        return SimpleNamespace(entities=entities, language="en")
+
+
+class StubDocumentAIClient:
+    """Document AI processor that reports no clause entities"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def process_document(self, request=None, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(document=SimpleNamespace(entities=[], text=""))
+
+
+class StubTextGenerationModel:
+    """Returns the leading words of the prompt, capped by max_output_tokens"""
+
+    def __init__(self, model_name="stub"):
+        self.model_name = model_name
+        self.calls = 0
+
+    def predict(self, prompt, max_output_tokens=150, temperature=0.2, **kwargs):
+        self.calls += 1
+        content = prompt.split("\n\n", 1)[-1]
+        words = content.split()[:max(1, max_output_tokens // 2)]
+        return SimpleNamespace(text=" ".join(words))
@@ -0,0 +1,91 @@
+"""
+gunicorn settings for serving LegalMate in production:
+
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:app     (or: python run.py --production)
+
+The app is imported once in the master (preload_app) with WARM_UP=preload,
+so the spaCy pipeline and keyword automata are loaded before forking and
+shared copy-on-write by every worker. Mongo clients and gRPC channels are
+opened per worker after the fork (see app.config.get_database and
+gcp.clients); each worker connects to Mongo, creating any missing indexes,
+before it serves requests. Every setting can be overridden with the WEB_* variables below.
+"""
+import gc
+import multiprocessing
+import os
+
+os.environ.setdefault('WARM_UP', 'preload')
+
+bind = os.getenv('WEB_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+# Each worker holds its own copy of whatever it allocates after the fork, so
+# workers scale with cores, not 2*cores+1; threads cover the I/O waits
+workers = int(os.getenv('WEB_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.getenv('WEB_THREADS', 8))
+
+# 'gthread' (default) or 'gevent' (pip install gevent): greenlets make the
+# long GCP waits nearly free, but CPU-bound spaCy work blocks a whole worker
+worker_class = os.getenv('WEB_WORKER_CLASS', 'gthread')
+worker_connections = int(os.getenv('WEB_WORKER_CONNECTIONS', 1000))
+
+# Recycle workers to bound slow leaks; jitter avoids restarting all at once
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('WEB_MAX_REQUESTS_JITTER', 100))
+
+# Uploads and synchronous test endpoints can be slow; graceful_timeout also
+# bounds how long a stopping worker drains its ingestion jobs
+timeout = int(os.getenv('WEB_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 90))
+keepalive = int(os.getenv('WEB_KEEPALIVE', 5))
+
+preload_app = True
+accesslog = os.getenv('WEB_ACCESS_LOG', '-')
+access_log_format = '%(h)s "%(r)s" %(s)s %(b)s %(D)sus rid=%({x-request-id}o)s'
+
+
+def when_ready(server):
+    # Objects loaded so far (models, automata) never change: move them out of
+    # the collector's reach so GC passes in workers do not touch, and thereby
+    # copy, their pages
+    gc.freeze()
+    server.log.info(f"Models preloaded; forking {workers} {worker_class} workers x {threads} threads")
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        # gRPC needs its own gevent integration once the hub is patched
+        import grpc.experimental.gevent as grpc_gevent
+        grpc_gevent.init_gevent()
+
+
+def post_worker_init(worker):
+    # The master never touches Mongo: connecting here creates the indexes
+    # (preload warm-up skips Mongo) before the first request needs them
+    from app.config import get_database
+    try:
+        get_database().command('ping')
+    except Exception as e:
+        worker.log.warning(f"Worker {worker.pid} could not reach MongoDB: {e}")
+
+    # Requeue documents that stopped or crashed workers left unfinished; the
+    # sweeps of concurrently starting workers claim each document once
+    from app.services.ingestion_jobs import schedule_recovery
+    schedule_recovery(worker.wsgi)
+
+    # Stored documents are brought up to date with changed risk rules by the
+    # first worker only
+    if worker.age == 1:
+        from app.services.risk_rules import schedule_backfill
+        schedule_backfill(worker.wsgi)
+
+
+def worker_exit(server, worker):
+    # Runs after the worker stopped accepting requests: let the documents it
+    # accepted finish extraction and analysis before the process goes away
+    app = getattr(worker, 'wsgi', None)
+    queue = app.extensions.get('ingestion_queue') if app is not None else None
+    if queue is not None:
+        # Keep JOB_DRAIN_TIMEOUT below graceful_timeout, after which the
+        # master kills the worker
+        left = queue.drain(app.config.get('JOB_DRAIN_TIMEOUT', 60))
+        server.log.info(f"Worker {worker.pid} drained ingestion jobs ({left} unfinished)")
@@ -1,11 +1,33 @@
-from app import create_app
-from dotenv import load_dotenv; load_dotenv()
+import os
+import sys
+from dotenv import load_dotenv
+
+# Before importing the app: Config reads the environment at import time
+load_dotenv()
+
+from app import create_app  # noqa: E402
+
+
+def serve_production():
+    # Replace this process with gunicorn (see gunicorn.conf.py for the
+    # worker model and its WEB_* settings)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'])
+
+
+# `python run.py --production` (or SERVER=gunicorn) starts the preforking
+# production server instead of the development server
+if __name__ == '__main__' and ('--production' in sys.argv or os.getenv('SERVER') == 'gunicorn'):
+    serve_production()
 
 app = create_app()
 
 if __name__ == '__main__':
+    # Requeue documents a previous run left unfinished
+    from app.services.ingestion_jobs import schedule_recovery
+    schedule_recovery(app)
+
     # Original startup configuration preserved:
     # - Host and port matching original app.run()
     # - Debug mode remains False
-    # - No additional middleware or hooks
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=False)
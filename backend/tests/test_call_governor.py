@@ -0,0 +1,95 @@
+"""
+Circuit breaker behaviour of the call governor.
+
+    cd backend && python -m unittest tests.test_call_governor
+"""
+import threading
+import time
+import unittest
+
+from app.services.call_governor import (
+    ApiGovernor,
+    CallDeadlineExceeded,
+    CircuitOpenError,
+    GovernorError
+)
+
+
+class ServiceUnavailable(Exception):
+    """Named like the google.api_core error, so the governor treats it as transient"""
+
+
+def failing(error):
+    def call(timeout):
+        raise error
+    return call
+
+
+def governor():
+    # Opens after two transient failures and goes half-open immediately
+    return ApiGovernor("test", rate=1000, burst=1000, concurrency=4,
+                       breaker_threshold=2, breaker_reset=0.0, retries=0)
+
+
+class CircuitBreakerTrialTest(unittest.TestCase):
+
+    def open_circuit(self, api):
+        for _ in range(2):
+            with self.assertRaises(ServiceUnavailable):
+                api.call(failing(ServiceUnavailable()))
+        self.assertEqual(api.breaker.state, "half_open")
+
+    def test_non_transient_trial_error_closes_the_circuit(self):
+        api = governor()
+        self.open_circuit(api)
+        with self.assertRaises(ValueError):
+            api.call(failing(ValueError("bad input")))
+        self.assertEqual(api.breaker.state, "closed")
+        self.assertEqual(api.call(lambda timeout: "ok"), "ok")
+
+    def test_trial_ended_by_the_governor_lets_the_next_call_probe(self):
+        api = governor()
+        self.open_circuit(api)
+        with self.assertRaises(GovernorError):
+            api.call(failing(CallDeadlineExceeded("deadline")))
+        self.assertEqual(api.breaker.state, "half_open")
+        self.assertEqual(api.call(lambda timeout: "ok"), "ok")
+        self.assertEqual(api.breaker.state, "closed")
+
+    def test_transient_trial_failure_reopens_the_circuit(self):
+        api = governor()
+        api.breaker.reset_after = 60.0
+        for _ in range(2):
+            with self.assertRaises(ServiceUnavailable):
+                api.call(failing(ServiceUnavailable()))
+        with self.assertRaises(CircuitOpenError):
+            api.call(lambda timeout: "ok")
+
+
+class ConcurrencyLimitTest(unittest.TestCase):
+
+    def test_calls_over_the_cap_wait_for_a_slot_without_a_deadline(self):
+        api = ApiGovernor("test", rate=1000, burst=1000, concurrency=1, retries=0)
+        results, errors = [], []
+
+        def slow(timeout):
+            time.sleep(0.05)
+            return "ok"
+
+        def worker():
+            try:
+                results.append(api.call(slow))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5.0)
+        self.assertEqual(errors, [])
+        self.assertEqual(results, ["ok"] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
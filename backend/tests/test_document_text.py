@@ -0,0 +1,95 @@
+"""
+GET /documents/<id>/text: byte ranges, ETag and If-Range.
+
+    cd backend && python -m unittest tests.test_document_text
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app import config as app_config
+from app import create_app
+from app.config import Config, documents_collection
+from app.services import blob_store
+from app.services.document_store import store_text
+from benchmarks.fakes import install_in_memory_database
+
+TEXT = "1. Définitions. The “Supplier” means Acme — and its affiliates."
+
+
+class DocumentTextTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.addCleanup(setattr, app_config, 'get_database', app_config.get_database)
+        self.addCleanup(setattr, blob_store, '_store', None)
+        install_in_memory_database()
+        blob_store._store = None
+
+        with mock.patch.multiple(Config, WARM_UP='off', JOB_BACKEND='eager',
+                                 UPLOAD_FOLDER=os.path.join(self.workdir.name, 'uploads'),
+                                 BLOB_STORE_PATH=os.path.join(self.workdir.name, 'blobs')):
+            self.app = create_app()
+        self.client = self.app.test_client()
+
+        self.data = TEXT.encode('utf-8')
+        with self.app.app_context():
+            self.ref = store_text(TEXT)
+        self.doc_id = str(documents_collection.insert_one({"filename": "a.pdf", "text_blob": self.ref}).inserted_id)
+        self.url = f"/documents/{self.doc_id}/text"
+
+    def test_whole_text(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(), self.data)
+        self.assertEqual(response.headers["Accept-Ranges"], "bytes")
+        self.assertEqual(response.headers["Content-Length"], str(len(self.data)))
+        self.assertEqual(response.headers["ETag"], f'"{self.ref["key"]}"')
+        self.assertEqual(response.mimetype, "text/plain")
+
+    def test_byte_range(self):
+        response = self.client.get(self.url, headers={"Range": "bytes=3-14"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.get_data(), self.data[3:15])
+        self.assertEqual(response.headers["Content-Range"], f"bytes 3-14/{len(self.data)}")
+        self.assertEqual(response.headers["Content-Length"], "12")
+
+    def test_suffix_range(self):
+        response = self.client.get(self.url, headers={"Range": "bytes=-11"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.get_data(), self.data[-11:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, headers={"Range": f"bytes={len(self.data)}-"})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers["Content-Range"], f"bytes */{len(self.data)}")
+
+    def test_several_ranges_get_the_whole_text(self):
+        response = self.client.get(self.url, headers={"Range": "bytes=0-1,4-5"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(), self.data)
+
+    def test_if_range(self):
+        etag = f'"{self.ref["key"]}"'
+        response = self.client.get(self.url, headers={"Range": "bytes=0-1", "If-Range": etag})
+        self.assertEqual((response.status_code, response.get_data()), (206, self.data[:2]))
+
+        # A stale validator means the text changed: send all of it
+        response = self.client.get(self.url, headers={"Range": "bytes=0-1", "If-Range": '"stale"'})
+        self.assertEqual((response.status_code, response.get_data()), (200, self.data))
+
+    def test_inline_text_of_older_documents(self):
+        doc_id = documents_collection.insert_one({"filename": "old.pdf", "text": TEXT}).inserted_id
+        response = self.client.get(f"/documents/{doc_id}/text", headers={"Range": "bytes=0-1"})
+        self.assertEqual((response.status_code, response.get_data()), (206, self.data[:2]))
+        self.assertNotIn("ETag", response.headers)
+
+    def test_source(self):
+        self.assertEqual(self.client.get(self.url + "?source=raw").status_code, 404)
+        self.assertEqual(self.client.get(self.url + "?source=other").status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
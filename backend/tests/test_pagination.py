@@ -0,0 +1,83 @@
+"""
+Keyset pagination: cursor encoding and paging over ties.
+
+    cd backend && python -m unittest tests.test_pagination
+"""
+import unittest
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.utils.pagination import (
+    SORT_OPTIONS,
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+    keyset_sort
+)
+from benchmarks.fakes import InMemoryCollection
+
+
+class CursorTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        doc_id = ObjectId()
+        uploaded = datetime(2024, 3, 1, 12, 30, 15, 250000)
+        token = encode_cursor("-upload_time", uploaded, doc_id)
+        self.assertNotIn("=", token)
+        self.assertEqual(decode_cursor(token, "-upload_time"), (uploaded, doc_id))
+
+        token = encode_cursor("filename", "contract.pdf", doc_id)
+        self.assertEqual(decode_cursor(token, "filename"), ("contract.pdf", doc_id))
+
+    def test_cursor_is_bound_to_its_sort(self):
+        token = encode_cursor("filename", "contract.pdf", ObjectId())
+        with self.assertRaisesRegex(InvalidCursor, "different sort"):
+            decode_cursor(token, "-filename")
+
+    def test_malformed_cursor(self):
+        for token in ("", "not-a-cursor", encode_cursor("filename", "a", "not-an-id")):
+            with self.assertRaisesRegex(InvalidCursor, "Malformed"):
+                decode_cursor(token, "filename")
+
+
+class KeysetPagingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = InMemoryCollection("documents")
+        start = datetime(2024, 1, 1)
+        # Pairs of documents share an upload time, so pages must break ties on _id
+        for i in range(11):
+            self.collection.insert_one({
+                "_id": ObjectId(),
+                "filename": f"doc{i % 4}.pdf",
+                "upload_time": start + timedelta(minutes=i // 2)
+            })
+
+    def pages(self, sort, limit):
+        field, direction = SORT_OPTIONS[sort]
+        cursor, seen = None, []
+        while True:
+            query = {}
+            if cursor:
+                query = keyset_filter(field, direction, *decode_cursor(cursor, sort))
+            page = list(self.collection.find(query).sort(keyset_sort(field, direction)).limit(limit))
+            seen.extend(page)
+            if len(page) < limit:
+                return seen
+            cursor = encode_cursor(sort, page[-1][field], page[-1]["_id"])
+
+    def test_every_document_once_in_order(self):
+        for sort in SORT_OPTIONS:
+            field, direction = SORT_OPTIONS[sort]
+            expected = sorted(self.collection.find(), key=lambda d: (d[field], d["_id"]),
+                              reverse=direction < 0)
+            for limit in (1, 2, 3, 20):
+                found = self.pages(sort, limit)
+                self.assertEqual([d["_id"] for d in found], [d["_id"] for d in expected],
+                                 f"{sort} limit {limit}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Analysis result cache: hits and misses by upload hash, text hash and stage version.
+
+    cd backend && python -m unittest tests.test_result_cache
+"""
+import unittest
+
+from app.services.result_cache import AnalysisCache, hash_text
+from benchmarks.fakes import InMemoryCollection
+
+VERSIONS = {"summary": "1|fake", "risks": "1|rules-a"}
+
+
+class AnalysisCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = InMemoryCollection("analysis_cache")
+        self.cache = AnalysisCache(self.collection, maxsize=8)
+
+    def test_miss_then_hit(self):
+        self.assertEqual(self.cache.lookup(VERSIONS, content_hash="upload"), {})
+        self.cache.store(VERSIONS, {"summary": "short", "risks": ["r"]}, content_hash="upload")
+
+        found = self.cache.lookup(VERSIONS, content_hash="upload")
+        self.assertEqual(found, {"summary": "short", "risks": ["r"]})
+        stats = self.cache.stats()
+        self.assertEqual((stats["misses"], stats["store_hits"], stats["writes"]), (1, 1, 1))
+
+        # The entry is now held in memory
+        self.cache.lookup(VERSIONS, content_hash="upload")
+        self.assertEqual(self.cache.stats()["memory_hits"], 1)
+
+    def test_stale_version_is_a_miss(self):
+        self.cache.store(VERSIONS, {"summary": "short", "risks": ["r"]}, content_hash="upload")
+        newer = dict(VERSIONS, risks="1|rules-b")
+        self.assertEqual(self.cache.lookup(newer, content_hash="upload"), {"summary": "short"})
+        self.assertEqual(self.cache.lookup({"risks": "1|rules-b"}, content_hash="upload"), {})
+
+    def test_same_text_from_different_upload_hits(self):
+        text_hash = hash_text("The  parties\nagree.")
+        self.cache.store(VERSIONS, {"summary": "short"}, content_hash="a", text_hash=text_hash)
+
+        self.assertEqual(self.cache.text_hash_for("a"), text_hash)
+        # Whitespace differences in the extracted text do not matter
+        found = self.cache.lookup(VERSIONS, content_hash="b", text_hash=hash_text("The parties agree."))
+        self.assertEqual(found, {"summary": "short"})
+
+    def test_store_merges_stages(self):
+        self.cache.store(VERSIONS, {"summary": "short"}, content_hash="upload")
+        self.cache.lookup(VERSIONS, content_hash="upload")
+        self.cache.store(VERSIONS, {"risks": ["r"]}, content_hash="upload")
+        self.assertEqual(self.cache.lookup(VERSIONS, content_hash="upload"),
+                         {"summary": "short", "risks": ["r"]})
+
+    def test_single_values(self):
+        self.assertIsNone(self.cache.get_value("chunk", "abc", "v1"))
+        self.cache.set_value("chunk", "abc", "v1", "summary of chunk")
+        self.assertEqual(self.cache.get_value("chunk", "abc", "v1"), "summary of chunk")
+        self.assertIsNone(self.cache.get_value("chunk", "abc", "v2"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Risk rule engine: matching, findings and scoring.
+
+    cd backend && python -m unittest tests.test_risk_rules
+"""
+import re
+import unittest
+
+from app.services.risk_rules import RuleSet, score_findings
+from app.services.segmentation import build_segment_index
+
+
+class RulePlanTest(unittest.TestCase):
+
+    def test_overlapping_rules_both_fire(self):
+        rules = RuleSet.from_specs([
+            {"id": "liability", "terms": ["liability"]},
+            {"id": "cap", "terms": ["liability cap"]},
+            {"id": "uncapped", "type": "regex", "pattern": "unlimited liability"},
+        ])
+        text = "The liability cap does not apply; unlimited liability for fraud."
+        found = {}
+        for finding in rules.evaluate(text):
+            found.setdefault(finding["rule"], []).append((finding["start"], finding["end"]))
+
+        self.assertEqual(found["cap"], [(4, 17)])
+        self.assertEqual(found["uncapped"], [(34, 53)])
+        # "liability" also matches inside both longer phrases
+        liability = rules.plan.scan(text)[0]["hit"]
+        self.assertEqual(liability, [(4, 13), (44, 53)])
+
+    def test_adding_a_rule_does_not_change_other_rules_hits(self):
+        specs = [{"id": "law", "type": "absence", "terms": ["governing law"]}]
+        text = "Governing law and jurisdiction: the laws of Delaware apply."
+        before = RuleSet.from_specs(specs).evaluate(text)
+        after = RuleSet.from_specs(specs + [
+            {"id": "forum", "terms": ["governing law and jurisdiction"]}
+        ]).evaluate(text)
+        self.assertEqual(before, [])
+        self.assertEqual([f["rule"] for f in after], ["forum"])
+
+
+class FindingsTest(unittest.TestCase):
+
+    TEXT = ("1. Payment. Fees are due monthly. 2. Liability. The supplier shall indemnify the client. "
+            "The supplier shall indemnify its staff. 3. Term. This agreement will renew automatically.")
+
+    def setUp(self):
+        spans = [(m.start(), m.end()) for m in re.finditer(r'\S[^.]*\.', self.TEXT)]
+        self.index = build_segment_index(self.TEXT, spans, (0, self.TEXT.index("3. Term")))
+        self.rules = RuleSet.from_specs([
+            {"id": "indemnity", "terms": ["indemnify"], "severity": "high", "message": "Indemnity"},
+            {"id": "renewal", "type": "proximity", "terms": ["renew*"], "near": ["automatic*"],
+             "window": 40, "severity": 0.5},
+            {"id": "notices", "type": "absence", "terms": ["notices"], "severity": "medium",
+             "message": "Missing Notices clause"},
+        ])
+
+    def test_findings_carry_clause_pages_and_count(self):
+        findings = {f["rule"]: f for f in self.rules.evaluate(self.TEXT, self.index)}
+        indemnity = findings["indemnity"]
+        self.assertEqual((indemnity["clause"], indemnity["pages"], indemnity["count"]), ("2", [1], 2))
+        self.assertEqual(indemnity["start"], self.TEXT.index("indemnify"))
+        self.assertEqual((findings["renewal"]["clause"], findings["renewal"]["pages"]), ("3", [2]))
+        # Absence is a document-level finding
+        self.assertEqual((findings["notices"]["clause"], findings["notices"]["start"]), (None, None))
+
+    def test_proximity_needs_both_terms_within_the_window(self):
+        text = "This agreement will renew each year. " + "x" * 60 + " Extension is automatic."
+        self.assertEqual([f["rule"] for f in self.rules.evaluate(text)], ["notices"])
+
+    def test_messages_follow_rule_order(self):
+        findings = self.rules.evaluate(self.TEXT, self.index)
+        self.assertEqual(self.rules.messages(list(reversed(findings))),
+                         ["Indemnity", "renewal", "Missing Notices clause"])
+
+    def test_scores(self):
+        scores = score_findings(self.rules.evaluate(self.TEXT, self.index))
+        # 1 - (1 - 0.75) * (1 - 0.5) * (1 - 0.5)
+        self.assertEqual(scores["score"], 0.9375)
+        self.assertEqual([(c["clause"], c["score"]) for c in scores["clauses"]],
+                         [("2", 0.75), ("3", 0.5), (None, 0.5)])
+
+    def test_a_rule_counts_once_per_clause_and_once_per_document(self):
+        findings = [
+            {"rule": "a", "severity": 0.5, "clause": "1"},
+            {"rule": "a", "severity": 0.5, "clause": "2"},
+            {"rule": "a", "severity": 0.5, "clause": "2"},
+            {"rule": "b", "severity": 0.5, "clause": "2"},
+        ]
+        scores = score_findings(findings)
+        self.assertEqual(scores["score"], 0.75)
+        self.assertEqual(scores["clauses"], [
+            {"clause": "2", "score": 0.75, "rules": ["a", "b"]},
+            {"clause": "1", "score": 0.5, "rules": ["a"]},
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
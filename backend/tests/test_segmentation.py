@@ -0,0 +1,70 @@
+"""
+Segmentation: clause numbering, clause ids and page mapping.
+
+    cd backend && python -m unittest tests.test_segmentation
+"""
+import re
+import unittest
+
+from app.services.segmentation import SegmentIndex, build_segment_index
+
+TEXT = ("1. Scope. The supplier provides the services. 2. Fees. Invoices are paid monthly. "
+        "45 Days notice applies. 2.1 Late Fees. Interest accrues. Annex A. 1. Services. "
+        "Support is included. 2. Service Levels. Uptime is measured.")
+
+
+def segment(text, page_offsets=(0,)):
+    spans = [(m.start(), m.end()) for m in re.finditer(r'\S[^.]*\.', text)]
+    return build_segment_index(text, spans, page_offsets)
+
+
+class ClauseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = segment(TEXT)
+
+    def test_numbering_that_restarts_gets_qualified_ids(self):
+        self.assertEqual(self.index.clause_ids, ["1", "2", "2.1", "1~2", "2~2"])
+        self.assertEqual(self.index.clause_numbers, ["1", "2", "2.1", "1", "2"])
+        self.assertEqual(self.index.find_clause("2~2"), 4)
+        self.assertIsNone(self.index.find_clause("3"))
+
+    def test_headings_levels_and_extent(self):
+        fees = self.index.clause(1)
+        self.assertEqual((fees["heading"], fees["level"]), ("Fees", 1))
+        self.assertEqual(fees["end"], TEXT.index("1. Services"))
+        self.assertEqual(self.index.clause(2)["heading"], "Late Fees")
+        self.assertEqual(self.index.children(1), [2])
+
+    def test_numbers_out_of_sequence_are_not_clauses(self):
+        # "45 Days" follows a sentence end but does not continue the numbering
+        self.assertEqual(self.index.clause_at(TEXT.index("45 Days")), 1)
+        self.assertEqual(self.index.clause_at(TEXT.index("Interest")), 2)
+
+    def test_ids_survive_serialization(self):
+        restored = SegmentIndex.from_bytes(self.index.to_bytes())
+        self.assertEqual(restored.clause_ids, self.index.clause_ids)
+        self.assertEqual(restored.outline(), self.index.outline())
+
+
+class PageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.page_two = TEXT.index("Annex")
+        self.index = segment(TEXT, (0, self.page_two))
+
+    def test_page_for_offset(self):
+        self.assertEqual(self.index.page_for(0), 1)
+        self.assertEqual(self.index.page_for(self.page_two - 1), 1)
+        self.assertEqual(self.index.page_for(self.page_two), 2)
+        self.assertEqual(self.index.page_for(len(TEXT) - 1), 2)
+
+    def test_clause_pages(self):
+        pages = [clause["pages"] for clause in self.index.outline()]
+        self.assertEqual(pages, [[1], [1, 2], [1, 2], [2], [2]])
+        # The end offset is exclusive
+        self.assertEqual(self.index.pages_for(0, self.page_two), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
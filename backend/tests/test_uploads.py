@@ -0,0 +1,118 @@
+"""
+Upload checks: type sniffed from the leading bytes and the size limit.
+
+    cd backend && python -m unittest tests.test_uploads
+"""
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+from app.utils.file_utils import MIME_TYPES, UploadRejected, write_upload
+from app.utils.streaming_upload import receive_upload
+
+PDF = b'%PDF-1.7\n' + b'0' * 4000
+
+
+def docx_bytes(members=('[Content_Types].xml', 'word/document.xml')):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as bundle:
+        for name in members:
+            bundle.writestr(name, '<xml/>')
+    return buffer.getvalue()
+
+
+def chunked(data, size=1000):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class WriteUploadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.folder = self.workdir.name
+
+    def assertRejected(self, data, filename, status, max_size=None):
+        with self.assertRaises(UploadRejected) as caught:
+            write_upload(chunked(data), self.folder, filename, max_size=max_size)
+        self.assertEqual(caught.exception.status_code, status)
+        # Nothing is left behind
+        self.assertEqual(os.listdir(self.folder), [])
+
+    def test_pdf_is_stored_and_hashed(self):
+        upload = write_upload(chunked(PDF), self.folder, 'contract.pdf')
+        self.assertEqual(upload.mime_type, 'application/pdf')
+        self.assertEqual(upload.size, len(PDF))
+        self.assertEqual(upload.content_hash, hashlib.sha256(PDF).hexdigest())
+        self.assertTrue(upload.filename.endswith('_contract.pdf'))
+        with open(upload.file_path, 'rb') as f:
+            self.assertEqual(f.read(), PDF)
+
+    def test_pdf_header_after_leading_junk(self):
+        upload = write_upload([b'\x00' * 100, PDF], self.folder, 'scan.pdf')
+        self.assertEqual(upload.size, 100 + len(PDF))
+
+    def test_docx(self):
+        upload = write_upload(chunked(docx_bytes()), self.folder, 'contract.docx')
+        self.assertEqual(upload.mime_type, MIME_TYPES['.docx'])
+
+    def test_content_decides_not_the_extension(self):
+        self.assertRejected(b'just some text', 'notes.pdf', 415)
+        self.assertRejected(PDF, 'contract.docx', 415)
+        self.assertRejected(docx_bytes(), 'contract.pdf', 415)
+        # A zip that is not a Word document is removed once its members are known
+        self.assertRejected(docx_bytes(['data.csv']), 'archive.docx', 415)
+
+    def test_unsupported_extension_and_empty_upload(self):
+        self.assertRejected(PDF, 'contract.txt', 400)
+        self.assertRejected(b'', 'contract.pdf', 400)
+
+    def test_size_limit(self):
+        self.assertRejected(PDF, 'contract.pdf', 413, max_size=len(PDF) - 1)
+        upload = write_upload(chunked(PDF), self.folder, 'contract.pdf', max_size=len(PDF))
+        self.assertEqual(upload.size, len(PDF))
+
+
+class ReceiveUploadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.folder = self.workdir.name
+
+    def request(self, data, **kwargs):
+        builder = EnvironBuilder(method='POST', data=data, **kwargs)
+        self.addCleanup(builder.close)
+        return Request(builder.get_environ())
+
+    def test_file_field_is_streamed_to_disk(self):
+        request = self.request({'note': 'x', 'file': (io.BytesIO(PDF), '../contract.pdf')})
+        upload = receive_upload(request, 'file', self.folder, max_size=1024 * 1024)
+        self.assertEqual(upload.size, len(PDF))
+        self.assertEqual(os.path.dirname(upload.file_path), self.folder)
+        self.assertTrue(upload.filename.endswith('_contract.pdf'))
+
+    def test_declared_length_over_the_limit(self):
+        request = self.request({'file': (io.BytesIO(PDF), 'contract.pdf')})
+        with self.assertRaises(UploadRejected) as caught:
+            receive_upload(request, 'file', self.folder, max_size=len(PDF) // 2)
+        self.assertEqual(caught.exception.status_code, 413)
+        self.assertEqual(os.listdir(self.folder), [])
+
+    def test_missing_file(self):
+        for request in (self.request({'other': (io.BytesIO(PDF), 'contract.pdf')}),
+                        self.request('{}', content_type='application/json')):
+            with self.assertRaises(UploadRejected) as caught:
+                receive_upload(request, 'file', self.folder, max_size=1024 * 1024)
+            self.assertEqual((caught.exception.message, caught.exception.status_code),
+                             ("No file provided", 400))
+
+
+if __name__ == '__main__':
+    unittest.main()
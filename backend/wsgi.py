@@ -0,0 +1,15 @@
+"""
+WSGI entry point for production servers:
+
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+
+Environment variables from .env are loaded before the app (and its Config)
+is imported, so they take effect.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import create_app  # noqa: E402
+
+app = create_app()
@@ -0,0 +1,57 @@
+import React, { useState } from 'react';
+import { fetchDocumentClause } from '../../services/Api';
+
+// Clause list from the segmentation index; a clause's text is only fetched
+// when it is opened. Clauses are keyed by id: numbers repeat when numbering
+// restarts (schedules, annexes)
+export default function ClauseOutline({ documentId, clauses }) {
+  const [open, setOpen] = useState(null);
+  const [texts, setTexts] = useState({});
+
+  const toggle = async (clauseId) => {
+    if (open === clauseId) {
+      setOpen(null);
+      return;
+    }
+    setOpen(clauseId);
+    if (texts[clauseId] === undefined) {
+      try {
+        const response = await fetchDocumentClause(documentId, clauseId);
+        setTexts(prev => ({ ...prev, [clauseId]: response.data?.clause?.text || '' }));
+      } catch (error) {
+        setTexts(prev => ({ ...prev, [clauseId]: null }));
+      }
+    }
+  };
+
+  const pages = (clause) => {
+    const [first, last] = [clause.pages[0], clause.pages[clause.pages.length - 1]];
+    return first === last ? `p. ${first}` : `pp. ${first}–${last}`;
+  };
+
+  return (
+    <ul className="h-full overflow-y-auto divide-y divide-gray-100">
+      {clauses.map(clause => (
+        <li key={clause.id} style={{ paddingLeft: `${clause.level - 1}rem` }}>
+          <button
+            className="w-full flex justify-between items-baseline py-2 text-left hover:text-purple-600"
+            onClick={() => toggle(clause.id)}
+          >
+            <span>
+              <span className="font-medium mr-2">{clause.number}</span>
+              {clause.heading || <span className="text-gray-400">Untitled</span>}
+            </span>
+            <span className="text-xs text-gray-500 ml-2">{pages(clause)}</span>
+          </button>
+          {open === clause.id && (
+            <p className="pb-2 text-sm text-gray-600 whitespace-pre-wrap">
+              {texts[clause.id] === undefined
+                ? 'Loading…'
+                : texts[clause.id] ?? 'Clause text unavailable'}
+            </p>
+          )}
+        </li>
+      ))}
+    </ul>
+  );
+}
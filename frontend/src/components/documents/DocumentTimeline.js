@@ -1,7 +1,23 @@
 import React from 'react';
-import { FiUploadCloud, FiSettings, FiCheckCircle } from 'react-icons/fi';
+import { FiUploadCloud, FiSettings, FiCheckCircle, FiGitCommit } from 'react-icons/fi';
 
-export default function DocumentTimeline({ document }) {
+// One line per change count of a version delta, e.g. "+2 risks, -1 entities"
+const describeChanges = (changes) => {
+  if (!changes) return 'First version';
+  const parts = [];
+  const { segments } = changes;
+  if (segments) {
+    const edited = segments.inserted + segments.deleted + segments.replaced;
+    parts.push(`${edited} segment${edited === 1 ? '' : 's'} changed`);
+  }
+  if (changes.risks_added) parts.push(`+${changes.risks_added} risks`);
+  if (changes.risks_removed) parts.push(`-${changes.risks_removed} risks`);
+  if (changes.entities_added) parts.push(`+${changes.entities_added} entities`);
+  if (changes.entities_removed) parts.push(`-${changes.entities_removed} entities`);
+  return parts.join(', ');
+};
+
+export default function DocumentTimeline({ document, versions = [] }) {
   const timeline = [
     {
       title: 'Document Uploaded',
@@ -23,11 +39,20 @@ export default function DocumentTimeline({ document }) {
     }
   ];
 
+  // Earlier and later revisions of the same contract, oldest first
+  const versionItems = [...versions].reverse().map(version => ({
+    title: `Version ${version.version}${version.id === document.id ? ' (this document)' : ''}`,
+    date: version.upload_date,
+    detail: describeChanges(version.changes),
+    icon: <FiGitCommit className="w-4 h-4" />,
+    color: version.id === document.id ? 'bg-indigo-500' : 'bg-gray-400'
+  }));
+
   return (
     <div className="bg-white rounded-xl p-6 shadow-sm">
       <h3 className="text-xl font-semibold mb-4">Processing Timeline</h3>
       <div className="space-y-4">
-        {timeline.map((item, index) => (
+        {[...timeline, ...(versionItems.length > 1 ? versionItems : [])].map((item, index) => (
           <div key={index} className="flex items-start">
             <div className={`w-8 h-8 rounded-full ${item.color} text-white flex items-center justify-center mr-4`}>
               {item.icon}
@@ -37,6 +62,9 @@ export default function DocumentTimeline({ document }) {
               <p className="text-sm text-gray-500">
                 {new Date(item.date).toLocaleString()}
               </p>
+              {item.detail && (
+                <p className="text-sm text-gray-600">{item.detail}</p>
+              )}
             </div>
           </div>
         ))}
@@ -1,11 +1,17 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { FiTrash2, FiFileText, FiAlertTriangle } from 'react-icons/fi';
+import { FiTrash2, FiFileText, FiAlertTriangle, FiList } from 'react-icons/fi';
 import { ThreeDots } from 'react-loader-spinner';
-import { fetchDocument, deleteDocument } from '../services/Api';
+import { fetchDocument, fetchDocumentJob, fetchDocumentVersions, fetchDocumentClauses, deleteDocument } from '../services/Api';
 import AnalysisSection from '../components/common/AnalysisSection';
 import RiskChart from '../components/documents/RiskChart';
 import EntityVisualization from '../components/documents/EntityVisualization';
+import DocumentTimeline from '../components/documents/DocumentTimeline';
+import ClauseOutline from '../components/documents/ClauseOutline';
+
+// Job states after which the document no longer changes
+const FINAL_JOB_STATES = ['processed', 'failed'];
+const JOB_POLL_INTERVAL = 1500; // ms
 
 class ErrorBoundary extends React.Component {
   state = { hasError: false, error: null };
@@ -36,12 +42,30 @@ export default function DocumentDetail() {
   const navigate = useNavigate();
   const [document, setDocument] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [versions, setVersions] = useState([]);
+  const [clauses, setClauses] = useState([]);
+  const [job, setJob] = useState(null);
 
   useEffect(() => {
     if (!id) return;
+    let cancelled = false;
+
+    // Uploads are analysed in the background: wait for the job to finish
+    const waitForJob = async () => {
+      while (!cancelled) {
+        const { data } = await fetchDocumentJob(id);
+        if (cancelled) return;
+        setJob(data);
+        if (FINAL_JOB_STATES.includes(data?.status)) return;
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+      }
+    };
 
     const loadDocument = async () => {
       try {
+        await waitForJob();
+        if (cancelled) return;
+
         console.log('Fetching document ID:', id);
         const response = await fetchDocument(id);
         console.log('API Response:', response);
@@ -65,18 +89,29 @@ export default function DocumentDetail() {
         }
 
         setDocument(documentData);
+
+        // Versions are optional: a failure only hides the revision history
+        fetchDocumentVersions(id)
+          .then(res => setVersions(res.data?.versions || []))
+          .catch(() => setVersions([]));
+
+        // Older documents have no clause index; the section then says so
+        fetchDocumentClauses(id)
+          .then(res => setClauses(res.data?.clauses || []))
+          .catch(() => setClauses([]));
       } catch (error) {
         console.error('Document load error:', {
           message: error.message,
           response: error.response?.data
         });
-        navigate('/documents');
+        if (!cancelled) navigate('/documents');
       } finally {
-        setLoading(false);
+        if (!cancelled) setLoading(false);
       }
     };
 
     loadDocument();
+    return () => { cancelled = true; };
   }, [id, navigate]);
 
   const handleDeleteDocument = async () => {
@@ -105,8 +140,13 @@ export default function DocumentDetail() {
 
   if (loading) {
     return (
-      <div className="pt-24 flex justify-center">
+      <div className="pt-24 flex flex-col items-center">
         <ThreeDots color="#4F46E5" height={50} width={50} />
+        {job && !FINAL_JOB_STATES.includes(job.status) && (
+          <p className="text-gray-500 mt-4">
+            Analysing document ({job.status}, {Math.round((job.progress || 0) * 100)}%)
+          </p>
+        )}
       </div>
     );
   }
@@ -130,6 +170,11 @@ export default function DocumentDetail() {
             <p className="text-gray-500 mt-2">
               Uploaded: {new Date(document.upload_date).toLocaleDateString()}
             </p>
+            {job?.status === 'failed' && (
+              <p className="text-red-600 mt-2">
+                Analysis failed{job.error ? `: ${job.error}` : ''}
+              </p>
+            )}
           </div>
           <button 
             className="bg-red-100 text-red-600 px-4 py-2 rounded-lg hover:bg-red-200 flex items-center"
@@ -159,12 +204,28 @@ export default function DocumentDetail() {
             />
           </ErrorBoundary>
 
+          <ErrorBoundary>
+            <AnalysisSection
+              title="Clauses"
+              icon={<FiList />}
+              content={
+                clauses.length > 0 ? (
+                  <ClauseOutline documentId={document.id} clauses={clauses} />
+                ) : 'No numbered clauses found'
+              }
+            />
+          </ErrorBoundary>
+
           {document.analysis?.entities && (
             <ErrorBoundary>
               <EntityVisualization entities={document.analysis.entities} />
             </ErrorBoundary>
           )}
 
+          <ErrorBoundary>
+            <DocumentTimeline document={document} versions={versions} />
+          </ErrorBoundary>
+
           <div className="bg-white rounded-xl p-6 shadow-sm">
             <h3 className="text-xl font-semibold mb-4">Full Text</h3>
             <div className="prose max-h-96 overflow-y-auto whitespace-pre-wrap">
@@ -29,7 +29,8 @@ const Home = () => {
         }
       });
       
-      if (response.status === 201) {
+      // 202: the document is queued and analysed in the background
+      if (response.status === 201 || response.status === 202) {
         window.location.href = `/documents/${response.data.id}`;
       }
     } catch (error) {
@@ -35,6 +35,10 @@ export const fetchDocuments = (page = 1, limit = 10) =>
 export const fetchDocument = (id) => 
   api.get(`/documents/${id}`);
 
+// Ingestion progress of an uploaded document: { status, progress, error }
+export const fetchDocumentJob = (id) => 
+  api.get(`/documents/${id}/job`);
+
 export const uploadDocument = (file, onUploadProgress) => {
   const formData = new FormData();
   formData.append('file', file);
@@ -49,6 +53,63 @@ export const uploadDocument = (file, onUploadProgress) => {
   });
 };
 
+// Upload a new revision of an existing document (joins its version family)
+export const uploadDocumentVersion = (id, file, onUploadProgress) => {
+  const formData = new FormData();
+  formData.append('file', file);
+
+  return api.post(`/documents/${id}/versions`, formData, {
+    onUploadProgress,
+    headers: {
+      'Content-Type': 'multipart/form-data',
+      'X-Requested-With': 'XMLHttpRequest'
+    },
+    transformRequest: data => data
+  });
+};
+
+// Deduplicated entities with counts: params { type, top, group: 'type', offsets }
+export const fetchDocumentEntities = (id, params) => 
+  api.get(`/documents/${id}/entities`, { params });
+
+// Numbered clauses from the document's segmentation index: params { level }
+export const fetchDocumentClauses = (id, params) => 
+  api.get(`/documents/${id}/clauses`, { params });
+
+// One clause by id with its text: its number (e.g. '4.2'), or '4.2~2' for
+// the second clause numbered 4.2
+export const fetchDocumentClause = (id, number) => 
+  api.get(`/documents/${id}/clauses/${encodeURIComponent(number)}`);
+
+export const fetchDocumentVersions = (id) => 
+  api.get(`/documents/${id}/versions`);
+
+export const fetchDocumentDelta = (id, against) => 
+  api.get(`/documents/${id}/delta`, { params: against ? { against } : {} });
+
+// Upload many files in one request; the response carries a batch id to poll
+export const uploadDocumentBatch = (files, onUploadProgress) => {
+  const formData = new FormData();
+  files.forEach(file => formData.append('files', file));
+
+  return api.post('/documents/batch', formData, {
+    onUploadProgress,
+    timeout: 0, // Large batches can take longer than the default timeout
+    headers: {
+      'Content-Type': 'multipart/form-data',
+      'X-Requested-With': 'XMLHttpRequest'
+    },
+    transformRequest: data => data
+  });
+};
+
+export const fetchBatch = (batchId) => 
+  api.get(`/documents/batch/${batchId}`);
+
+// params: { q, organization, person, law, risk, cursor, limit, ... }
+export const searchDocuments = (params) => 
+  api.get('/documents/search', { params });
+
 export const deleteDocument = (id) => 
   api.delete(`/documents/${id}`);
 